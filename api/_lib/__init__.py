@@ -0,0 +1,4 @@
+"""
+Shared helpers for the WhineAboutAI serverless functions.
+The leading underscore keeps Vercel from exposing this package as a route.
+"""
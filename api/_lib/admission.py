@@ -0,0 +1,185 @@
+"""
+Admission control in front of the provider call sites.
+
+Every upstream completion takes a slot from one process-wide pool of
+WHINE_ADMISSION_LIMIT. When the pool is full, callers wait in a short
+priority queue: interactive endpoints (chat, complaint submission) go
+first, the generators next and batch work (tournament commentary) last.
+Each class has a queue-wait budget. A caller whose expected wait (callers
+ahead of it times the average slot hold time, spread over the pool)
+already exceeds its budget, or whose budget runs out while queued, gets
+Shed instead, and the handler answers from its get_fallback_* function
+as it would for any provider error. When the queue is full a newcomer
+evicts the lowest-priority waiter, or is shed itself if nobody queued
+ranks below it.
+
+On Vercel each instance serves one request at a time, so this matters on
+the self-hosted server and for fan-out inside one request (tournaments).
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from . import metrics
+
+# Concurrent provider calls per process; 0 disables admission control
+LIMIT = int(os.getenv('WHINE_ADMISSION_LIMIT', '16'))
+# Callers allowed to wait for a slot
+MAX_QUEUE = int(os.getenv('WHINE_ADMISSION_QUEUE', '64'))
+
+# class -> (priority, lower runs first; seconds a caller may wait for a slot)
+CLASSES = {
+    'interactive': (0, 2.0),
+    'standard': (1, 1.0),
+    'batch': (2, 0.25)
+}
+ENDPOINT_CLASSES = {
+    'chat': 'interactive',
+    'submit-complaint': 'interactive',
+    'create-meme': 'standard',
+    'generate-comeback': 'standard',
+    'predict-fail': 'standard',
+    'enhance-complaint': 'standard',
+    'battle-commentary': 'standard',
+    'battle-tournament': 'batch'
+}
+
+# Starting guess for how long a provider call holds its slot
+INITIAL_SERVICE_SECONDS = 1.0
+SERVICE_SMOOTHING = 0.1
+
+class Shed(Exception):
+    """The provider call was not admitted; answer from the local fallback"""
+
+class _Waiter:
+    __slots__ = ('priority', 'class_name', 'state', 'event')
+
+    def __init__(self, priority: int, class_name: str):
+        self.priority = priority
+        self.class_name = class_name
+        self.state = 'waiting'
+        self.event = threading.Event()
+
+class AdmissionController:
+    """Bounded concurrency with a deadline-aware priority queue"""
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._queue = []
+        self._order = itertools.count()
+        self._waiting = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.service_seconds = INITIAL_SERVICE_SECONDS
+        self.counts = {name: {"admitted": 0, "queued": 0, "shed": 0, "evicted": 0} for name in CLASSES}
+
+    def _expected_wait(self, priority: int) -> float:
+        ahead = sum(1 for _, _, waiter in self._queue if waiter.state == 'waiting' and waiter.priority <= priority)
+        return (ahead + 1) * self.service_seconds / self.limit
+
+    def _evict_for(self, priority: int) -> bool:
+        """Shed the lowest-priority, most recent waiter if it ranks below priority"""
+        victim = None
+        for rank, order, waiter in self._queue:
+            if waiter.state == 'waiting' and (victim is None or (rank, order) > victim[:2]):
+                victim = (rank, order, waiter)
+        if victim is None or victim[0] <= priority:
+            return False
+        waiter = victim[2]
+        waiter.state = 'shed'
+        self._waiting -= 1
+        self.counts[waiter.class_name]["evicted"] += 1
+        waiter.event.set()
+        return True
+
+    def _shed(self, class_name: str, reason: str):
+        self.counts[class_name]["shed"] += 1
+        return Shed(f"{class_name} call shed: {reason}")
+
+    def acquire(self, endpoint: str):
+        class_name = ENDPOINT_CLASSES.get(endpoint, 'standard')
+        priority, budget = CLASSES[class_name]
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiting:
+                self.in_flight += 1
+                self.counts[class_name]["admitted"] += 1
+                return
+            expected = self._expected_wait(priority)
+            if expected > budget:
+                raise self._shed(class_name, f"expected wait {expected * 1000:.0f}ms over {budget * 1000:.0f}ms budget")
+            if self._waiting >= self.max_queue and not self._evict_for(priority):
+                raise self._shed(class_name, "queue full")
+            waiter = _Waiter(priority, class_name)
+            heapq.heappush(self._queue, (priority, next(self._order), waiter))
+            self._waiting += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._waiting)
+            self.counts[class_name]["queued"] += 1
+
+        waiter.event.wait(budget)
+        with self._lock:
+            if waiter.state == 'granted':
+                self.counts[class_name]["admitted"] += 1
+                return
+            if waiter.state == 'waiting':
+                waiter.state = 'shed'
+                self._waiting -= 1
+                raise self._shed(class_name, f"waited {budget * 1000:.0f}ms without a slot")
+        raise Shed(f"{class_name} call shed: evicted by higher-priority work")
+
+    def release(self, held_seconds: float):
+        with self._lock:
+            self.in_flight -= 1
+            self.service_seconds += SERVICE_SMOOTHING * (held_seconds - self.service_seconds)
+            while self._queue:
+                _, _, waiter = heapq.heappop(self._queue)
+                if waiter.state != 'waiting':
+                    continue
+                waiter.state = 'granted'
+                self._waiting -= 1
+                self.in_flight += 1
+                waiter.event.set()
+                break
+
+    @contextmanager
+    def slot(self, endpoint: str):
+        """Hold a provider slot for the body; raises Shed instead of waiting past the budget"""
+        if self.limit <= 0:
+            yield
+            return
+        self.acquire(endpoint)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queue_depth": self._waiting,
+                "max_queue_depth": self.max_queue_depth,
+                "service_ms": round(self.service_seconds * 1000, 1),
+                "shed": sum(counts["shed"] + counts["evicted"] for counts in self.counts.values()),
+                "classes": {name: dict(counts) for name, counts in self.counts.items()}
+            }
+
+_controller = AdmissionController(LIMIT, MAX_QUEUE)
+
+def slot(endpoint: str):
+    """Context manager around one provider call for endpoint"""
+    return _controller.slot(endpoint)
+
+def call(endpoint: str, fn, *args, **kwargs):
+    """fn(*args, **kwargs) holding a provider slot for endpoint; raises Shed when not admitted"""
+    with _controller.slot(endpoint):
+        return fn(*args, **kwargs)
+
+metrics.register('admission', _controller.stats)
@@ -0,0 +1,341 @@
+"""
+Rolling anger-level analytics per complaint category.
+
+Submissions are never stored individually. Each one is added to three
+array-backed ring buffers:
+
+- minutes: the last 24 hours, one bucket per minute
+- hours: the last 7 days, one bucket per hour
+- days: the last year, holding running totals since the process started
+
+Every bucket holds, per category, a count, the sum of anger levels and a
+10-bin histogram. Because the daily tier is cumulative, the totals for
+"the last N days" are the difference of two buckets, so that query costs
+the same whether N is 1 or 365.
+
+The same per-minute, per-hour and per-day rollups (not the submissions)
+are upserted into a local SQLite database (WHINE_ANGER_DB, default: a
+file in the temp directory). The rings are rebuilt from it on first use,
+so history survives restarts, and again before a read whenever another
+process has written to it since, so every process sharing the file (the
+pre-forked server's workers) answers with the same totals.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from array import array
+
+from . import metrics
+
+DB_PATH = os.getenv('WHINE_ANGER_DB', os.path.join(tempfile.gettempdir(), 'whine-anger.sqlite3'))
+
+CATEGORIES = (
+    'Smart Home Fails',
+    'Chatbot Chaos',
+    'Autocorrect Anarchy',
+    'Navigation Nightmares',
+    'Work AI Woes',
+    'General AI Grief'
+)
+CATEGORY_INDEX = {category.lower(): index for index, category in enumerate(CATEGORIES)}
+DEFAULT_CATEGORY = CATEGORY_INDEX['general ai grief']
+
+LEVELS = 10
+# count, sum of levels, then one histogram bin per level
+FIELDS = 2 + LEVELS
+
+MINUTE_SLOTS = 24 * 60
+HOUR_SLOTS = 7 * 24
+DAY_SLOTS = 366
+
+_level_columns = [f"level{level}" for level in range(1, LEVELS + 1)]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS anger_rollups (
+    tier TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    level_sum INTEGER NOT NULL,
+    {', '.join(f'{column} INTEGER NOT NULL DEFAULT 0' for column in _level_columns)},
+    PRIMARY KEY (tier, bucket, category)
+);
+CREATE TABLE IF NOT EXISTS anger_version (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO anger_version (id, version) VALUES (0, 0);
+"""
+
+def category_index(category: str) -> int:
+    """Map free-form category text onto CATEGORIES; unknown text counts as general"""
+    return CATEGORY_INDEX.get((category or '').strip().lower(), DEFAULT_CATEGORY)
+
+def clamp_level(anger_level) -> int:
+    try:
+        level = int(anger_level)
+    except (TypeError, ValueError):
+        level = 5
+    return max(1, min(LEVELS, level))
+
+class RingTier:
+    """Fixed number of time buckets; a slot is reset when a newer bucket claims it"""
+
+    def __init__(self, bucket_seconds: int, slots: int):
+        self.bucket_seconds = bucket_seconds
+        self.slots = slots
+        self.stride = len(CATEGORIES) * FIELDS
+        self.values = array('q', bytes(8 * slots * self.stride))
+        self.buckets = array('q', [-1]) * slots
+
+    def bucket(self, now: float) -> int:
+        return int(now // self.bucket_seconds)
+
+    def _claim(self, bucket: int) -> int:
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            start = slot * self.stride
+            self.values[start:start + self.stride] = array('q', bytes(8 * self.stride))
+            self.buckets[slot] = bucket
+        return slot
+
+    def add(self, bucket: int, category: int, level: int):
+        base = self._claim(bucket) * self.stride + category * FIELDS
+        self.values[base] += 1
+        self.values[base + 1] += level
+        self.values[base + 1 + level] += 1
+
+    def read(self, bucket: int, category: int) -> array:
+        slot = bucket % self.slots
+        if self.buckets[slot] != bucket:
+            return array('q', bytes(8 * FIELDS))
+        base = slot * self.stride + category * FIELDS
+        return self.values[base:base + FIELDS]
+
+class CumulativeTier(RingTier):
+    """Daily buckets holding running totals, so any range is one subtraction"""
+
+    def __init__(self, bucket_seconds: int, slots: int):
+        super().__init__(bucket_seconds, slots)
+        self.current = None
+
+    def advance(self, bucket: int):
+        """Carry the running totals forward into every day up to bucket"""
+        if self.current is None:
+            self._claim(bucket)
+            self.current = bucket
+            return
+        if bucket <= self.current:
+            return
+        # Only the last `slots` days are kept, so longer gaps copy less
+        previous = max(self.current, bucket - self.slots)
+        start = (self.current % self.slots) * self.stride
+        totals = self.values[start:start + self.stride]
+        for day in range(previous + 1, bucket + 1):
+            start = self._claim(day) * self.stride
+            self.values[start:start + self.stride] = totals
+        self.current = bucket
+
+    def add(self, bucket: int, category: int, level: int):
+        self.advance(bucket)
+        # A late event still counts toward today's running totals
+        super().add(max(bucket, self.current), category, level)
+
+class RollupStore:
+    """SQLite-backed rollup rows; one connection per thread, WAL for concurrent writers"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def add(self, buckets: dict, category: str, level: int) -> int:
+        """Count one submission in the minute, hour and day rows; buckets maps tier -> bucket. Returns the new version"""
+        column = _level_columns[level - 1]
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for tier, bucket in buckets.items():
+                connection.execute(
+                    f"INSERT INTO anger_rollups (tier, bucket, category, count, level_sum, {column}) "
+                    f"VALUES (?, ?, ?, 1, ?, 1) ON CONFLICT (tier, bucket, category) DO UPDATE SET "
+                    f"count = count + 1, level_sum = level_sum + excluded.level_sum, {column} = {column} + 1",
+                    (tier, bucket, category, level)
+                )
+            connection.execute('UPDATE anger_version SET version = version + 1 WHERE id = 0')
+            version = connection.execute('SELECT version FROM anger_version WHERE id = 0').fetchone()[0]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return version
+
+    def rows(self, tier: str, first_bucket: int) -> list:
+        """(bucket, category, count, level_sum, level1..level10) from first_bucket on, oldest first"""
+        return self.connection().execute(
+            f"SELECT bucket, category, count, level_sum, {', '.join(_level_columns)} FROM anger_rollups "
+            "WHERE tier = ? AND bucket >= ? ORDER BY bucket",
+            (tier, first_bucket)
+        ).fetchall()
+
+    def prune(self, oldest: dict):
+        """Drop rows older than any tier keeps; oldest maps tier -> first bucket to keep"""
+        connection = self.connection()
+        for tier, bucket in oldest.items():
+            connection.execute('DELETE FROM anger_rollups WHERE tier = ? AND bucket < ?', (tier, bucket))
+
+    def version(self) -> int:
+        """Bumped by every add, so readers can tell whether their copy is stale"""
+        return self.connection().execute('SELECT version FROM anger_version WHERE id = 0').fetchone()[0]
+
+class AngerStats:
+    def __init__(self, store: RollupStore = None):
+        self.minutes = RingTier(60, MINUTE_SLOTS)
+        self.hours = RingTier(3600, HOUR_SLOTS)
+        self.days = CumulativeTier(86400, DAY_SLOTS)
+        self.lock = threading.Lock()
+        self.recorded = 0
+        self.store = store
+        self.store_errors = 0
+        self._loaded_version = None
+        self._pruned_hour = None
+
+    def _tiers(self) -> dict:
+        return {'minute': self.minutes, 'hour': self.hours, 'day': self.days}
+
+    def _load(self, now: float):
+        """Rebuild the rings from the store's rollup rows"""
+        minutes = RingTier(60, MINUTE_SLOTS)
+        hours = RingTier(3600, HOUR_SLOTS)
+        days = CumulativeTier(86400, DAY_SLOTS)
+        for name, tier in (('minute', minutes), ('hour', hours)):
+            for row in self.store.rows(name, tier.bucket(now) - tier.slots + 1):
+                _add_row(tier, row[0], row)
+        # Daily rows are per day; the ring holds running totals
+        today = days.bucket(now)
+        days.advance(today - days.slots + 1)
+        for row in self.store.rows('day', today - days.slots + 1):
+            days.advance(row[0])
+            _add_row(days, days.current, row)
+        days.advance(today)
+        self.minutes, self.hours, self.days = minutes, hours, days
+
+    def refresh(self, now: float = None):
+        """Reload from the store when another process has written since the last load"""
+        if self.store is None:
+            return
+        now = time.time() if now is None else now
+        with self.lock:
+            try:
+                version = self.store.version()
+                if version != self._loaded_version:
+                    self._load(now)
+                    self._loaded_version = version
+            except (sqlite3.Error, OSError) as e:
+                # Keep answering from what this process has seen
+                print(f"Anger store unavailable: {e}")
+                self.store_errors += 1
+
+    def record(self, category: str, anger_level, now: float = None):
+        """Add one submission to every tier"""
+        now = time.time() if now is None else now
+        index = category_index(category)
+        level = clamp_level(anger_level)
+        if self._loaded_version is None:
+            self.refresh(now)
+        with self.lock:
+            self.recorded += 1
+            tiers = self._tiers()
+            for tier in tiers.values():
+                tier.add(tier.bucket(now), index, level)
+            if self.store is None:
+                return
+            try:
+                version = self.store.add({name: tier.bucket(now) for name, tier in tiers.items()}, CATEGORIES[index], level)
+                # Still current unless another process wrote in between
+                if self._loaded_version == version - 1:
+                    self._loaded_version = version
+                hour = self.hours.bucket(now)
+                if hour != self._pruned_hour:
+                    self.store.prune({name: tier.bucket(now) - tier.slots + 1 for name, tier in tiers.items()})
+                    self._pruned_hour = hour
+            except (sqlite3.Error, OSError) as e:
+                print(f"Anger store write failed: {e}")
+                self.store_errors += 1
+
+    def totals_for_days(self, days: int, now: float = None) -> dict:
+        """Per-category totals for the last `days` UTC days, today included"""
+        now = time.time() if now is None else now
+        days = max(1, min(DAY_SLOTS - 1, days))
+        self.refresh(now)
+        with self.lock:
+            today = self.days.bucket(now)
+            self.days.advance(today)
+            return {
+                category: _summarize([
+                    upper - lower for upper, lower in zip(
+                        self.days.read(today, index), self.days.read(today - days, index)
+                    )
+                ])
+                for index, category in enumerate(CATEGORIES)
+            }
+
+    def series(self, tier_name: str, periods: int, now: float = None) -> list:
+        """Per-bucket totals, oldest first, from the minute or hour tier"""
+        now = time.time() if now is None else now
+        self.refresh(now)
+        tier = self.minutes if tier_name == 'minute' else self.hours
+        periods = max(1, min(tier.slots, periods))
+        with self.lock:
+            latest = tier.bucket(now)
+            return [
+                {
+                    "start": bucket * tier.bucket_seconds,
+                    "categories": {
+                        category: _summarize(tier.read(bucket, index))
+                        for index, category in enumerate(CATEGORIES)
+                    }
+                }
+                for bucket in range(latest - periods + 1, latest + 1)
+            ]
+
+def _add_row(tier: RingTier, bucket: int, row: tuple):
+    """Add a stored rollup row (bucket, category, count, level_sum, level1..level10) into a ring bucket"""
+    base = tier._claim(bucket) * tier.stride + category_index(row[1]) * FIELDS
+    for offset, value in enumerate(row[2:]):
+        tier.values[base + offset] += value
+
+def _summarize(fields) -> dict:
+    count, total = fields[0], fields[1]
+    return {
+        "count": count,
+        "average": round(total / count, 2) if count else None,
+        "histogram": list(fields[2:])
+    }
+
+stats = AngerStats(RollupStore())
+
+def record(category: str, anger_level):
+    stats.record(category, anger_level)
+
+metrics.register('anger', lambda: {"recorded": stats.recorded, "store_errors": stats.store_errors})
@@ -0,0 +1,178 @@
+"""
+Spend governor for the OpenAI call sites.
+
+Spend comes from the usage store (usage.py), so every process that shares
+WHINE_USAGE_DB sees the same totals. Two targets apply:
+
+    WHINE_BUDGET_MONTHLY_USD  hard cap for the calendar month (UTC)
+    WHINE_BUDGET_DAILY_USD    cap for the day; without it the month's
+                              remainder is spread evenly over its
+                              remaining days, which also tightens a set
+                              daily cap once the month runs ahead
+
+Pressure is the larger of today's spend over today's allowance and the
+month's spend over the monthly cap. Below SOFT_LIMIT every call is
+allowed. Between SOFT_LIMIT and 1.0 each endpoint's allowed fraction
+ramps linearly from 1 to 0 over its own overlapping window, lowest value
+endpoints (VALUE_ORDER) first, so batch tournament commentary is gone
+before chat is touched. At 1.0 everything is answered from caches and
+fallbacks. Handlers ask allow(endpoint) in the same guard as the spam
+screen; a denied call takes the fallback path as if no key were set.
+
+Without either target the governor is off and allow() is one check.
+If the usage store fails, the last spend read is kept. Until the first
+read succeeds, pressure is UNREAD_LEVEL: the lowest-value endpoints are
+shed and chat is untouched.
+
+The caps hold per usage store, not globally. On Vercel (VERCEL set) every
+instance has its own temp directory and therefore its own store, so each
+instance governs only its own spend and the total can be the cap times
+the number of instances; the governor warns about that when it starts.
+"""
+
+import calendar
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from . import metrics, usage
+
+MONTHLY_USD = float(os.getenv('WHINE_BUDGET_MONTHLY_USD', '0'))
+DAILY_USD = float(os.getenv('WHINE_BUDGET_DAILY_USD', '0'))
+# Pressure at which the lowest-value endpoint starts being shed
+SOFT_LIMIT = float(os.getenv('WHINE_BUDGET_SOFT_LIMIT', '0.6'))
+# Seconds between spend queries against the usage store
+REFRESH_SECONDS = float(os.getenv('WHINE_BUDGET_REFRESH_SECONDS', '5'))
+# Pressure assumed while the usage store has never been read: halfway up the ramp
+UNREAD_LEVEL = (SOFT_LIMIT + 1.0) / 2
+# Vercel instances cannot share the SQLite usage store
+PER_INSTANCE = bool(os.getenv('VERCEL'))
+
+# Lowest value first: the first endpoints shed as the budget runs down
+VALUE_ORDER = (
+    'battle-tournament',
+    'battle-commentary',
+    'create-meme',
+    'predict-fail',
+    'generate-comeback',
+    'enhance-complaint',
+    'submit-complaint',
+    'chat'
+)
+
+def _period_starts(now: float) -> tuple:
+    """(start of today, start of this month, days left in the month including today), all UTC"""
+    moment = datetime.fromtimestamp(now, timezone.utc)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    month = day.replace(day=1)
+    days_left = calendar.monthrange(moment.year, moment.month)[1] - moment.day + 1
+    return day.timestamp(), month.timestamp(), days_left
+
+def pressure(day_spend: float, month_spend: float, days_left: int,
+             daily: float = DAILY_USD, monthly: float = MONTHLY_USD) -> tuple:
+    """(pressure, today's allowance in USD); pressure 1.0 means the budget is used up"""
+    allowance = daily if daily > 0 else None
+    levels = []
+    if monthly > 0:
+        # What is left at the start of today, spread over the days that remain
+        spread = max(0.0, monthly - (month_spend - day_spend)) / max(1, days_left)
+        allowance = spread if allowance is None else min(allowance, spread)
+        levels.append(month_spend / monthly)
+    if allowance is not None:
+        levels.append(day_spend / allowance if allowance > 0 else float('inf'))
+    return (max(levels) if levels else 0.0), allowance
+
+def allowed_fraction(endpoint: str, level: float, soft_limit: float = SOFT_LIMIT) -> float:
+    """Share of endpoint's calls to send upstream at this pressure"""
+    if level <= soft_limit:
+        return 1.0
+    if level >= 1.0:
+        return 0.0
+    # Unknown endpoints rank just above the lowest-value one
+    rank = VALUE_ORDER.index(endpoint) if endpoint in VALUE_ORDER else 1
+    step = (1.0 - soft_limit) / (len(VALUE_ORDER) + 1)
+    start = soft_limit + rank * step
+    return min(1.0, max(0.0, 1.0 - (level - start) / (2 * step)))
+
+class Governor:
+    """Cached view of the shared spend, and the allow/deny decision per call"""
+
+    def __init__(self, daily: float, monthly: float):
+        self.daily = daily
+        self.monthly = monthly
+        self.enabled = daily > 0 or monthly > 0
+        if self.enabled and PER_INSTANCE:
+            print(f"WARNING: spend budget is per instance: {usage.DB_PATH} is not shared between Vercel "
+                  f"instances, so total spend can reach the cap times the number of running instances",
+                  file=sys.stderr)
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._spend = (0.0, 0.0)
+        self._spend_read = False
+        self._level = 0.0
+        self._allowance = None
+        self.store_errors = 0
+        self.counts = {}
+
+    def level(self) -> float:
+        now = time.time()
+        if now - self._checked < REFRESH_SECONDS:
+            return self._level
+        with self._lock:
+            if now - self._checked < REFRESH_SECONDS:
+                return self._level
+            self._checked = now
+            day_start, month_start, days_left = _period_starts(now)
+            try:
+                self._spend = (usage.store.spend_since(day_start), usage.store.spend_since(month_start))
+                self._spend_read = True
+            except (sqlite3.Error, OSError) as e:
+                # Keep the last known spend rather than opening the floodgates
+                print(f"Budget spend unavailable: {e}")
+                self.store_errors += 1
+            self._level, self._allowance = pressure(*self._spend, days_left, self.daily, self.monthly)
+            if not self._spend_read:
+                # (0, 0) is not a spend we saw; fail closed for the low-value endpoints
+                self._level = max(self._level, UNREAD_LEVEL)
+            return self._level
+
+    def allow(self, endpoint: str) -> bool:
+        fraction = allowed_fraction(endpoint, self.level())
+        allowed = fraction >= 1.0 or random.random() < fraction
+        with self._lock:
+            counts = self.counts.setdefault(endpoint, {"allowed": 0, "denied": 0})
+            counts["allowed" if allowed else "denied"] += 1
+        return allowed
+
+    def stats(self) -> dict:
+        level = self.level() if self.enabled else 0.0
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "per_instance": PER_INSTANCE,
+                "usage_db": usage.DB_PATH,
+                "daily_usd": self.daily,
+                "monthly_usd": self.monthly,
+                "today_allowance_usd": round(self._allowance, 4) if self._allowance is not None else None,
+                "spent_today_usd": round(self._spend[0], 4),
+                "spent_month_usd": round(self._spend[1], 4),
+                "spend_read": self._spend_read,
+                "pressure": round(level, 4),
+                "fractions": {endpoint: round(allowed_fraction(endpoint, level), 3) for endpoint in VALUE_ORDER},
+                "store_errors": self.store_errors,
+                "calls": {endpoint: dict(counts) for endpoint, counts in self.counts.items()}
+            }
+
+_governor = Governor(DAILY_USD, MONTHLY_USD)
+
+def allow(endpoint: str) -> bool:
+    """True when this call to endpoint may go upstream under the current spend"""
+    if not _governor.enabled:
+        return True
+    return _governor.allow(endpoint)
+
+metrics.register('budget', _governor.stats)
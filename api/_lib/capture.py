@@ -0,0 +1,124 @@
+"""
+Sampled traffic capture for replay testing.
+
+When WHINE_CAPTURE_DIR is set, handlers append anonymized request/response
+records to <dir>/requests.jsonl, one JSON object per line. The file rotates
+to requests.jsonl.1, .2, ... once it grows past WHINE_CAPTURE_MAX_BYTES.
+
+Environment:
+- WHINE_CAPTURE_DIR: capture directory (capture is off when unset)
+- WHINE_CAPTURE_SAMPLE: fraction of requests to keep, 0.0-1.0 (default 1.0)
+- WHINE_CAPTURE_MAX_BYTES: rotate after this many bytes (default 64 MiB)
+- WHINE_CAPTURE_BACKUPS: rotated files to keep (default 10)
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+CAPTURE_FILE = 'requests.jsonl'
+
+_email = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+_url = re.compile(r'(https?://|www\.)\S+', re.IGNORECASE)
+_phone = re.compile(r'(?<!\w)\+?\d[\d\s().-]{7,}\d(?!\w)')
+
+# Fields that identify a person rather than describe an AI failure
+_redacted_fields = {'name': '<name>', 'email': '<email>'}
+_hashed_fields = ('conversation_id',)
+
+# Large binary payloads (rendered images) are not worth replaying
+_omitted_fields = ('data_url',)
+
+_lock = threading.Lock()
+_state = {'file': None, 'path': None, 'size': 0}
+
+def scrub(text: str) -> str:
+    """Replace emails, URLs and phone numbers in free text"""
+    text = _email.sub('<email>', text)
+    text = _url.sub('<url>', text)
+    return _phone.sub('<phone>', text)
+
+def anonymize(value):
+    """Recursively scrub a request or response payload"""
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in _omitted_fields:
+                result[key] = '<omitted>'
+            elif key in _redacted_fields:
+                result[key] = _redacted_fields[key]
+            elif key in _hashed_fields and isinstance(item, str):
+                result[key] = hashlib.sha256(item.encode('utf-8')).hexdigest()[:16]
+            else:
+                result[key] = anonymize(item)
+        return result
+    if isinstance(value, list):
+        return [anonymize(item) for item in value]
+    if isinstance(value, str):
+        return scrub(value)
+    return value
+
+def enabled() -> bool:
+    return bool(os.getenv('WHINE_CAPTURE_DIR'))
+
+def _open(directory: str):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, CAPTURE_FILE)
+    handle = open(path, 'a', encoding='utf-8')
+    _state.update(file=handle, path=path, size=handle.tell())
+
+def _rotate(backups: int):
+    _state['file'].close()
+    path = _state['path']
+    for index in range(backups - 1, 0, -1):
+        source = f"{path}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index + 1}")
+    if backups > 0:
+        os.replace(path, f"{path}.1")
+    else:
+        os.remove(path)
+    _open(os.path.dirname(path))
+
+def record(endpoint: str, request: dict, response: dict, latency: float,
+           method: str = 'POST', status: int = 200) -> None:
+    """Append one sampled, anonymized exchange; never raises into the handler"""
+    directory = os.getenv('WHINE_CAPTURE_DIR')
+    if not directory:
+        return
+
+    try:
+        sample = float(os.getenv('WHINE_CAPTURE_SAMPLE', '1.0'))
+        if sample < 1.0 and random.random() >= sample:
+            return
+
+        line = json.dumps({
+            "ts": round(time.time() - latency, 6),
+            "endpoint": endpoint,
+            "method": method,
+            "status": status,
+            "latency_ms": round(latency * 1000, 3),
+            "request": anonymize(request or {}),
+            "response": anonymize(response or {})
+        }, ensure_ascii=False) + '\n'
+
+        max_bytes = int(os.getenv('WHINE_CAPTURE_MAX_BYTES', str(64 * 1024 * 1024)))
+        backups = int(os.getenv('WHINE_CAPTURE_BACKUPS', '10'))
+        encoded_size = len(line.encode('utf-8'))
+
+        with _lock:
+            if _state['file'] is None or os.path.dirname(_state['path']) != directory:
+                if _state['file'] is not None:
+                    _state['file'].close()
+                _open(directory)
+            if _state['size'] and _state['size'] + encoded_size > max_bytes:
+                _rotate(backups)
+            _state['file'].write(line)
+            _state['file'].flush()
+            _state['size'] += encoded_size
+    except Exception as e:
+        print(f"Traffic capture error: {e}")
@@ -0,0 +1,166 @@
+"""
+Stored complaints behind the /complaint/<id> permalink pages.
+
+submit-complaint saves every complaint that passes the spam screen, with
+its witty response, to a local SQLite database (WHINE_COMPLAINT_DB,
+default: a file in the temp directory). Ids are random hex, so permalinks
+cannot be enumerated; seq orders complaints for the sitemap shards.
+
+Permalinks need every instance to read the same store, so they are a
+self-hosted server feature. On Vercel (VERCEL set) each instance has its
+own temp directory and a page saved on one would 404 on the others, so
+nothing is stored and submit-complaint returns no id or permalink.
+
+The comeback, meme and prediction on a permalink page start as the
+deterministic local fallbacks. A POST to generate-comeback, create-meme or
+predict-fail that carries "complaintId" for the same text attaches its
+answer once, and the page is re-rendered with it.
+"""
+
+import json
+import os
+import re
+import secrets
+import sqlite3
+import tempfile
+import threading
+import time
+
+from . import metrics
+
+DB_PATH = os.getenv('WHINE_COMPLAINT_DB', os.path.join(tempfile.gettempdir(), 'whine-complaints.sqlite3'))
+SITE_URL = os.getenv('WHINE_SITE_URL', 'https://whineaboutai.com').rstrip('/')
+ENABLED = not os.getenv('VERCEL')
+
+# Fields a generator endpoint may attach, stored as JSON
+ATTACHMENTS = ('comeback', 'meme', 'prediction')
+
+_valid_id = re.compile(r'^[0-9a-f]{16}$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS complaints (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    ts REAL NOT NULL,
+    updated REAL NOT NULL,
+    category TEXT NOT NULL,
+    anger_level INTEGER NOT NULL,
+    complaint TEXT NOT NULL,
+    response TEXT,
+    comeback TEXT,
+    meme TEXT,
+    prediction TEXT
+);
+"""
+
+COLUMNS = ('seq', 'id', 'ts', 'updated', 'category', 'anger_level', 'complaint', 'response') + ATTACHMENTS
+
+def valid_id(complaint_id) -> bool:
+    return isinstance(complaint_id, str) and bool(_valid_id.match(complaint_id))
+
+def permalink(complaint_id: str) -> str:
+    return f"/complaint/{complaint_id}"
+
+def _row_to_record(row) -> dict:
+    record = dict(zip(COLUMNS, row))
+    for field in ATTACHMENTS:
+        if record[field] is not None:
+            record[field] = json.loads(record[field])
+    return record
+
+class ComplaintStore:
+    """SQLite-backed complaint log; one connection per thread, WAL for concurrent writers"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def insert(self, category: str, anger_level: int, complaint: str, response: str) -> dict:
+        now = time.time()
+        complaint_id = secrets.token_hex(8)
+        cursor = self.connection().execute(
+            'INSERT INTO complaints (id, ts, updated, category, anger_level, complaint, response) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (complaint_id, now, now, category, anger_level, complaint, response)
+        )
+        return {"seq": cursor.lastrowid, "id": complaint_id, "ts": now}
+
+    def get(self, complaint_id: str):
+        row = self.connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM complaints WHERE id = ?", (complaint_id,)
+        ).fetchone()
+        return _row_to_record(row) if row else None
+
+    def attach(self, complaint_id: str, complaint: str, field: str, value) -> bool:
+        """Store value once, only for the complaint text it was generated from"""
+        cursor = self.connection().execute(
+            f"UPDATE complaints SET {field} = ?, updated = ? WHERE id = ? AND complaint = ? AND {field} IS NULL",
+            (json.dumps(value), time.time(), complaint_id, complaint)
+        )
+        return cursor.rowcount > 0
+
+    def entries(self, first_seq: int, last_seq: int) -> list:
+        """(seq, id, updated) for first_seq <= seq <= last_seq, in order"""
+        return self.connection().execute(
+            'SELECT seq, id, updated FROM complaints WHERE seq BETWEEN ? AND ? ORDER BY seq',
+            (first_seq, last_seq)
+        ).fetchall()
+
+    def last_seq(self) -> int:
+        row = self.connection().execute('SELECT COALESCE(MAX(seq), 0) FROM complaints').fetchone()
+        return row[0]
+
+store = ComplaintStore()
+_counters = {"saved": 0, "attached": 0, "store_errors": 0}
+
+def save(category: str, anger_level: int, complaint: str, response: str):
+    """Store a submission; returns {"seq", "id", "ts"} or None if the store is unavailable"""
+    if not ENABLED:
+        return None
+    try:
+        saved = store.insert(str(category), max(1, min(10, int(anger_level))), complaint, response)
+    except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+        print(f"Complaint store write failed: {e}")
+        _counters["store_errors"] += 1
+        return None
+    _counters["saved"] += 1
+    return saved
+
+def get(complaint_id: str):
+    if not ENABLED or not valid_id(complaint_id):
+        return None
+    return store.get(complaint_id)
+
+def attach(complaint_id, complaint: str, field: str, value) -> bool:
+    """Attach a generator answer to a stored complaint; False when nothing changed"""
+    if not ENABLED or field not in ATTACHMENTS or not valid_id(complaint_id) or value is None:
+        return False
+    try:
+        attached = store.attach(complaint_id, complaint, field, value)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Complaint store write failed: {e}")
+        _counters["store_errors"] += 1
+        return False
+    if attached:
+        _counters["attached"] += 1
+    return attached
+
+metrics.register('complaints', lambda: {**_counters, "enabled": ENABLED})
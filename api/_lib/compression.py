@@ -0,0 +1,222 @@
+"""
+Response compression negotiated from Accept-Encoding.
+
+gzip is always available; brotli and zstd are used when their packages
+(brotli, zstandard) are installed and the client prefers them. Bodies under
+WHINE_COMPRESS_MIN_BYTES are sent as-is: below roughly one packet the
+header and CPU cost outweigh the saving.
+
+StreamingWriter compresses incrementally and flushes after every write, so
+a client can decode each piece (tokens, NDJSON lines) as soon as it
+arrives.
+"""
+
+import os
+import threading
+import zlib
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from . import metrics
+
+MIN_BYTES = int(os.getenv('WHINE_COMPRESS_MIN_BYTES', '1024'))
+
+# Levels tuned for small dynamic responses: most of the ratio, little CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+ZSTD_LEVEL = 3
+
+def available_encodings() -> list:
+    """Encodings this process can produce, most preferred first"""
+    encodings = []
+    if brotli:
+        encodings.append('br')
+    if zstandard:
+        encodings.append('zstd')
+    encodings.append('gzip')
+    return encodings
+
+SUPPORTED = available_encodings()
+
+def parse_accept_encoding(header: str) -> dict:
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    accepted = {}
+    for part in (header or '').split(','):
+        pieces = [piece.strip() for piece in part.split(';')]
+        coding = pieces[0].lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for parameter in pieces[1:]:
+            name, _, value = parameter.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding] = quality
+    return accepted
+
+def negotiate(header: str, supported: list = None):
+    """Best supported encoding the client accepts, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    if not accepted:
+        return None
+    wildcard = accepted.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for coding in supported or SUPPORTED:
+        quality = accepted.get(coding, accepted.get('x-gzip', wildcard) if coding == 'gzip' else wildcard)
+        # Ties go to the server's preference order
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+_counters = {"responses": 0, "compressed": 0, "bytes_in": 0, "bytes_out": 0}
+_counters_lock = threading.Lock()
+
+def _count(size_in: int, size_out: int, compressed: bool):
+    with _counters_lock:
+        _counters["responses"] += 1
+        _counters["compressed"] += 1 if compressed else 0
+        _counters["bytes_in"] += size_in
+        _counters["bytes_out"] += size_out
+
+def encode_body(body: bytes, accept_encoding: str, min_bytes: int = None):
+    """(body, encoding) for the response; encoding is None when sent as-is"""
+    threshold = MIN_BYTES if min_bytes is None else min_bytes
+    encoding = negotiate(accept_encoding) if len(body) >= threshold else None
+    if encoding:
+        compressed = compress(body, encoding)
+        # Incompressible payloads (already-encoded images) go out unchanged
+        if len(compressed) < len(body):
+            _count(len(body), len(compressed), True)
+            return compressed, encoding
+    _count(len(body), len(body), False)
+    return body, None
+
+class _Compressor:
+    """Incremental compressor whose flush() makes everything so far decodable"""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        elif encoding == 'zstd':
+            self._compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        elif encoding == 'gzip':
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        else:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.process(data) + self._compressor.flush()
+        if self.encoding == 'zstd':
+            return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+class StreamingWriter:
+    """
+    Write a response body piece by piece, compressed when the client allows.
+    Uses chunked transfer encoding on HTTP/1.1 connections; on HTTP/1.0 the
+    body ends when the connection closes. Headers go out with the first
+    write, so until `started` the handler can still send another response.
+    """
+
+    def __init__(self, handler, content_type: str, status: int = 200, headers: dict = None,
+                 accept_encoding: str = None):
+        self.handler = handler
+        self.encoding = negotiate(handler.headers.get('Accept-Encoding', '') if accept_encoding is None else accept_encoding)
+        self._compressor = _Compressor(self.encoding) if self.encoding else None
+        self.chunked = handler.request_version == 'HTTP/1.1' and handler.protocol_version == 'HTTP/1.1'
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.closed = False
+        self.started = False
+        self._status = status
+        self._content_type = content_type
+        self._headers = headers or {}
+
+    def _start(self):
+        if self.started:
+            return
+        self.started = True
+        handler = self.handler
+        handler.send_response(self._status)
+        handler.send_header('Content-type', self._content_type)
+        handler.send_header('Cache-Control', 'no-store')
+        handler.send_header('Vary', 'Accept-Encoding')
+        if self.encoding:
+            handler.send_header('Content-Encoding', self.encoding)
+        if self.chunked:
+            handler.send_header('Transfer-Encoding', 'chunked')
+        else:
+            handler.close_connection = True
+        for name, value in self._headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+
+    def _send(self, data: bytes):
+        if not data:
+            return
+        self.bytes_out += len(data)
+        if self.chunked:
+            self.handler.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        else:
+            self.handler.wfile.write(data)
+        self.handler.wfile.flush()
+
+    def write(self, data: bytes):
+        self._start()
+        self.bytes_in += len(data)
+        self._send(self._compressor.compress(data) if self._compressor else data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._start()
+        if self._compressor:
+            self._send(self._compressor.finish())
+        if self.chunked:
+            self.handler.wfile.write(b'0\r\n\r\n')
+            self.handler.wfile.flush()
+        _count(self.bytes_in, self.bytes_out, bool(self.encoding))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # An error before the first write leaves the response to the handler
+        if exc_type is None or self.started:
+            self.close()
+
+def _stats() -> dict:
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["encodings"] = SUPPORTED
+    stats["min_bytes"] = MIN_BYTES
+    return stats
+
+metrics.register('compression', _stats)
@@ -0,0 +1,123 @@
+"""
+Content-addressed on-disk LRU cache.
+
+Entries are files named by their key under two-character shard directories.
+Reads refresh the file's mtime, and once the directory grows past max_bytes
+the least recently used files are deleted. Writes are atomic, so several
+processes can share one directory.
+"""
+
+import os
+import re
+import tempfile
+import threading
+
+from . import metrics
+
+_valid_key = re.compile(r'^[0-9a-f]{16,128}$')
+
+class DiskLRU:
+    def __init__(self, name: str, directory: str, max_bytes: int, suffix: str = ''):
+        self.name = name
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        metrics.register(f"disk.{name}", self.stats)
+
+    def _path(self, key: str) -> str:
+        if not _valid_key.match(key):
+            raise ValueError("Cache keys must be lowercase hex digests")
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        return self._size
+
+    def get(self, key: str):
+        """Return the cached bytes or None, marking the entry as recently used"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            # An overwrite replaces these bytes rather than adding to them
+            previous = os.stat(path).st_size
+        except OSError:
+            previous = 0
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            if self._size is None:
+                # The first walk already counts the file just written
+                self._current_size()
+            else:
+                self._size += len(data) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Delete least recently used files until the cache is back under 90% of its budget"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
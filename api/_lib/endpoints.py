@@ -0,0 +1,45 @@
+"""
+Loader for the api/*.py handler modules.
+Handler files use hyphenated names, so they are loaded by path rather than import.
+"""
+
+import importlib.util
+import os
+import sys
+import threading
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Re-entrant: a handler module may load another handler while being imported
+_lock = threading.RLock()
+_modules = {}
+
+def endpoint_names() -> list:
+    """List routable endpoints (files starting with '_' are not routes)"""
+    return sorted(
+        name[:-3] for name in os.listdir(API_DIR)
+        if name.endswith('.py') and not name.startswith('_')
+    )
+
+def load_endpoint(name: str):
+    """Import api/<name>.py once per process and return the module"""
+    with _lock:
+        module = _modules.get(name)
+        if module is not None:
+            return module
+
+        path = os.path.join(API_DIR, f"{name}.py")
+        if not os.path.isfile(path) or name.startswith('_'):
+            raise KeyError(f"Unknown endpoint: {name}")
+
+        module_name = f"whine_api_{name.replace('-', '_')}"
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[module_name]
+            raise
+        _modules[name] = module
+        return module
@@ -0,0 +1,109 @@
+"""
+HTTP caching and response helpers shared by the handlers. Every JSON
+response goes through write_json, which compresses it when the client
+accepts an encoding and the body is large enough.
+"""
+
+import hashlib
+import json
+import random
+
+from .compression import encode_body
+from .singleflight import normalize_key
+
+def strong_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True when an If-None-Match header already names this entity"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    bare = etag[2:] if etag.startswith('W/') else etag
+    return any((c[2:] if c.startswith('W/') else c) == bare for c in candidates)
+
+# Browsers revalidate every time; the CDN serves its copy for a day and
+# keeps serving it for a week while refreshing in the background
+CACHEABLE_GET = 'public, max-age=0, s-maxage=86400, stale-while-revalidate=604800'
+# Fallback answers stand in for an outage, a spam reject, a budget denial or
+# a shed call; the edge keeps them only briefly so model answers come back
+FALLBACK_GET = 'public, max-age=0, s-maxage=60'
+
+def stable_random(*parts: str) -> random.Random:
+    """Random generator seeded from the normalized input, so equal inputs pick equal answers"""
+    digest = hashlib.sha256(normalize_key(*parts).encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+def write_json(handler, status: int, body: bytes, headers: dict, allow_methods: str) -> None:
+    """Send an encoded JSON body with CORS headers, compressed when worthwhile"""
+    write_body(handler, status, body, 'application/json', headers, allow_methods)
+
+def write_body(handler, status: int, body: bytes, content_type: str, headers: dict, allow_methods: str,
+               include_body: bool = True) -> None:
+    """Send a body of any text type with CORS headers, compressed when worthwhile"""
+    body, encoding = encode_body(body, handler.headers.get('Accept-Encoding', ''))
+    handler.send_response(status)
+    handler.send_header('Content-type', content_type)
+    handler.send_header('Content-Length', str(len(body)))
+    handler.send_header('Vary', 'Accept-Encoding')
+    if encoding:
+        handler.send_header('Content-Encoding', encoding)
+    for name, value in headers.items():
+        # A compressed body is a different representation, so its ETag is weak
+        if name == 'ETag' and encoding and not value.startswith('W/'):
+            value = 'W/' + value
+        handler.send_header(name, value)
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.send_header('Access-Control-Allow-Methods', allow_methods)
+    handler.send_header('Access-Control-Allow-Headers', 'Content-Type')
+    handler.end_headers()
+    if include_body:
+        handler.wfile.write(body)
+
+def send_json(handler, payload: dict, status: int = 200, allow_methods: str = 'POST, OPTIONS',
+              cache_control: str = None) -> None:
+    """Send a JSON response; the default for POST answers and live stats"""
+    headers = {'Cache-Control': cache_control} if cache_control else {}
+    write_json(handler, status, json.dumps(payload).encode('utf-8'), headers, allow_methods)
+
+def send_not_modified(handler, etag: str, cache_control: str) -> None:
+    """Answer a matching If-None-Match without a body"""
+    handler.send_response(304)
+    handler.send_header('ETag', etag)
+    handler.send_header('Cache-Control', cache_control)
+    handler.send_header('Vary', 'Accept-Encoding')
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.end_headers()
+
+def send_cacheable_json(handler, payload: dict, allow_methods: str = 'GET, POST, OPTIONS') -> None:
+    """Send JSON with an ETag and CDN cache headers, answering If-None-Match with 304.
+
+    Only answers the provider wrote ("provider": "openai") get the long edge
+    lifetime; fallbacks get FALLBACK_GET.
+    """
+    body = json.dumps(payload, sort_keys=True).encode('utf-8')
+    etag = strong_etag(hashlib.sha256(body).hexdigest()[:32])
+    cache_control = CACHEABLE_GET if payload.get("provider") == "openai" else FALLBACK_GET
+
+    if etag_matches(handler.headers.get('If-None-Match'), etag):
+        send_not_modified(handler, etag, cache_control)
+        return
+
+    write_json(handler, 200, body, {'ETag': etag, 'Cache-Control': cache_control}, allow_methods)
+
+def send_cacheable_body(handler, body: bytes, content_type: str, etag: str, cache_control: str = CACHEABLE_GET,
+                        include_body: bool = True, allow_methods: str = 'GET, HEAD, OPTIONS') -> None:
+    """Send a page or feed under a known ETag, answering If-None-Match with 304"""
+    if etag_matches(handler.headers.get('If-None-Match'), etag):
+        send_not_modified(handler, etag, cache_control)
+        return
+
+    write_body(handler, 200, body, content_type, {'ETag': etag, 'Cache-Control': cache_control}, allow_methods,
+               include_body)
+
+def send_uncached_json(handler, status: int, payload: dict, allow_methods: str = 'GET, POST, OPTIONS') -> None:
+    """Send JSON that must never be cached, such as validation errors"""
+    send_json(handler, payload, status, allow_methods, cache_control='no-store')
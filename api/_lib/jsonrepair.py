@@ -0,0 +1,168 @@
+"""
+Tolerant incremental JSON parsing for model output.
+
+Models wrap JSON in prose or code fences, stop mid-string when they hit
+max_tokens, and stream their answer a few characters at a time.
+IncrementalParser is fed those pieces as they arrive and can return the
+best-effort value of what it has seen at any point: text before the first
+'{' or '[' and after the closing bracket is ignored, a bracketed stretch of
+prose that does not decode is skipped and scanning resumes after it,
+trailing commas before '}' or ']' are dropped, an unfinished string value
+is closed, a dangling key is dropped and open containers are closed. Each
+character is scanned once, so snapshots while streaming cost no more than
+the brackets still open.
+"""
+
+import json
+
+_CLOSERS = {'{': '}', '[': ']'}
+_WHITESPACE = ' \t\r\n'
+
+class IncrementalParser:
+    """Feed text as it arrives; value() repairs whatever has been seen so far"""
+
+    def __init__(self):
+        self._buffer = []
+        self._length = 0
+        self._reset()
+        self.repaired = False
+
+    def _reset(self):
+        """Forget the value being scanned; the text already fed is kept"""
+        self._start = None
+        self._stack = []
+        # Per open object: 'key' (expecting or inside a key), 'colon', 'value'
+        self._expect = []
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._in_scalar = False
+        # Offset just past the last complete value or opening bracket
+        self._safe = None
+        # Offset of a comma not yet followed by anything; commas dropped before a closer
+        self._comma = None
+        self._drops = []
+        self._value = None
+        self.complete = False
+
+    def feed(self, text: str):
+        if self.complete or not text:
+            return
+        offset = self._length
+        self._buffer.append(text)
+        self._length += len(text)
+        for index, char in enumerate(text, offset):
+            if self._scan(index, char) and self._close():
+                break
+
+    def _close(self) -> bool:
+        """Decode the value that just closed; if it is not JSON, forget it and keep scanning after it"""
+        text = ''.join(self._buffer)
+        self._buffer = [text]
+        try:
+            self._value = json.loads(self._json(text, self._safe))
+            return True
+        except ValueError:
+            self._reset()
+            return False
+
+    def _json(self, text: str, end: int = None) -> str:
+        """text[start:end] without the trailing commas dropped so far"""
+        pieces = []
+        position = self._start
+        for drop in self._drops:
+            if end is not None and drop >= end:
+                break
+            pieces.append(text[position:drop])
+            position = drop + 1
+        pieces.append(text[position:end])
+        return ''.join(pieces)
+
+    def _scan(self, index: int, char: str) -> bool:
+        """Advance over one character; True once the top-level value is closed"""
+        if self._start is None:
+            if char not in _CLOSERS:
+                return False
+            self._start = index
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == '\\':
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    self._expect[-1] = 'colon'
+                else:
+                    self._safe = index + 1
+            return False
+        if self._in_scalar and (char in _WHITESPACE or char in ',}]'):
+            self._in_scalar = False
+            self._safe = index
+        if char in '}]' and self._comma is not None:
+            self._drops.append(self._comma)
+        if char not in _WHITESPACE:
+            self._comma = index if char == ',' else None
+        if char == '"':
+            self._in_string = True
+            self._string_is_key = self._stack[-1] == '{' and self._expect[-1] == 'key'
+        elif char in _CLOSERS:
+            self._stack.append(char)
+            self._expect.append('key' if char == '{' else 'value')
+            self._safe = index + 1
+        elif char in '}]':
+            self._stack.pop()
+            self._expect.pop()
+            self._safe = index + 1
+            if not self._stack:
+                self.complete = True
+                return True
+        elif char == ',':
+            self._expect[-1] = 'key' if self._stack[-1] == '{' else 'value'
+        elif char == ':':
+            self._expect[-1] = 'value'
+        elif char not in _WHITESPACE:
+            self._in_scalar = True
+        return False
+
+    def text(self) -> str:
+        """The JSON text seen so far, without surrounding prose"""
+        if self._start is None:
+            return ''
+        text = ''.join(self._buffer)
+        self._buffer = [text]
+        return self._json(text, self._safe if self.complete else None)
+
+    def value(self):
+        """Best-effort value of the input so far; None when nothing usable arrived"""
+        if self._start is None:
+            return None
+        text = ''.join(self._buffer)
+        self._buffer = [text]
+        if self.complete:
+            self.repaired = bool(self._drops)
+            return self._value
+
+        closers = ''.join(_CLOSERS[opener] for opener in reversed(self._stack))
+        candidates = []
+        if self._in_string and not self._string_is_key:
+            # A truncated string value is worth keeping; drop a half-written escape
+            body = self._json(text, len(text) - 1) if self._escape else self._json(text)
+            candidates.append(body + '"' + closers)
+        elif self._in_scalar:
+            candidates.append(self._json(text) + closers)
+        candidates.append(self._json(text, self._safe) + closers)
+
+        self.repaired = True
+        for candidate in candidates:
+            try:
+                return json.loads(candidate)
+            except ValueError:
+                continue
+        return None
+
+def parse(text: str):
+    """Repair and parse a complete model answer in one go"""
+    parser = IncrementalParser()
+    parser.feed(text or '')
+    return parser.value()
@@ -0,0 +1,99 @@
+"""
+Thread-safe in-memory LRU cache with hit/miss counters.
+
+When WHINE_SHARED_CACHE_DIR is set (python -m server --workers N
+--shared-cache points it into /dev/shm), each cache is also backed by a
+DiskLRU there, so a value computed by one worker process is a hit in the
+others. Only bytes and JSON-serializable values are shared.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from . import metrics
+from .diskcache import DiskLRU
+
+SHARED_DIR = os.getenv('WHINE_SHARED_CACHE_DIR')
+SHARED_MAX_BYTES = int(os.getenv('WHINE_SHARED_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+def _shared_key(key) -> str:
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+def _encode(value):
+    if isinstance(value, bytes):
+        return b'b' + value
+    try:
+        return b'j' + json.dumps(value).encode('utf-8')
+    except (TypeError, ValueError):
+        return None
+
+def _decode(data: bytes):
+    return data[1:] if data[:1] == b'b' else json.loads(data[1:])
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, name: str, max_entries: int = 1024):
+        self.name = name
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared = DiskLRU(f"shared.{name}", os.path.join(SHARED_DIR, name), SHARED_MAX_BYTES) if SHARED_DIR else None
+        metrics.register(f"cache.{name}", self.stats)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.shared is not None:
+            data = self.shared.get(_shared_key(key))
+            if data is not None:
+                value = _decode(data)
+                self._store(key, value)
+                return value
+        return default
+
+    def _store(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key, value) -> None:
+        self._store(key, value)
+        if self.shared is not None:
+            data = _encode(value)
+            if data is not None:
+                self.shared.set(_shared_key(key), data)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,42 @@
+"""
+Process-wide registry of counters exposed by /api/metrics
+
+The counters include file paths and internal state, so /api/metrics only
+answers requests carrying WHINE_OPS_TOKEN in the X-Whine-Token header, and
+is off when no token is set.
+"""
+
+import hmac
+import os
+import threading
+
+TOKEN = os.getenv('WHINE_OPS_TOKEN', '')
+HEADER = 'X-Whine-Token'
+
+_lock = threading.Lock()
+_sources = {}
+
+def register(name: str, source) -> None:
+    """Register a zero-argument callable returning a JSON-serializable dict"""
+    with _lock:
+        _sources[name] = source
+
+def snapshot() -> dict:
+    """Collect the current value of every registered source"""
+    with _lock:
+        sources = dict(_sources)
+
+    result = {}
+    for name, source in sorted(sources.items()):
+        try:
+            result[name] = source()
+        except Exception as e:
+            result[name] = {"error": str(e)}
+    return result
+
+def authorized(handler) -> bool:
+    """True when the request carries the operator token; always False without one configured"""
+    supplied = handler.headers.get(HEADER)
+    if not TOKEN or supplied is None:
+        return False
+    return hmac.compare_digest(supplied.encode('utf-8'), TOKEN.encode('utf-8'))
@@ -0,0 +1,160 @@
+"""
+Server-rendered permalink pages for stored complaints.
+
+A page shows the complaint, the response it got on submission and a
+comeback, meme and prediction. Attached generator answers are used when
+present (see complaints.py); otherwise the local fallbacks are seeded from
+the complaint text, so a page is stable and rendering one never calls the
+provider. Pages are rendered once per (complaint, last update, PAGE_VERSION)
+and kept in an on-disk LRU shared by processes.
+"""
+
+import hashlib
+import os
+import tempfile
+from datetime import datetime, timezone
+from html import escape
+
+from . import complaints, render
+from .diskcache import DiskLRU
+from .endpoints import load_endpoint
+from .httpcache import stable_random
+
+# Bump when the markup changes so cached pages and ETags roll over
+PAGE_VERSION = 1
+
+page_cache = DiskLRU(
+    'permalinks',
+    os.getenv('WHINE_PERMALINK_DIR', os.path.join(tempfile.gettempdir(), 'whine-permalinks')),
+    int(os.getenv('WHINE_PERMALINK_MAX_BYTES', str(128 * 1024 * 1024))),
+    suffix='.html'
+)
+
+def page_key(record: dict) -> str:
+    payload = f"{PAGE_VERSION}\x1f{record['id']}\x1f{record['updated']!r}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def fill_attachments(record: dict) -> dict:
+    """comeback, meme and prediction for the page, from the record or the seeded fallbacks"""
+    complaint = record['complaint']
+    comeback = record.get('comeback')
+    if comeback is None:
+        comeback = load_endpoint('generate-comeback').get_fallback_comeback(complaint, stable_random(complaint))['comeback']
+    meme = record.get('meme')
+    if meme is None:
+        meme = load_endpoint('create-meme').get_fallback_meme(complaint, stable_random(complaint))
+    prediction = record.get('prediction')
+    if prediction is None:
+        prediction = load_endpoint('predict-fail').get_fallback_prediction(complaint, stable_random(complaint))
+    return {
+        "comeback": comeback,
+        "meme": {key: meme.get(key, '') for key in ('meme_type', 'top_text', 'bottom_text')},
+        "prediction": {"prediction": prediction.get('prediction', ''), "confidence": prediction.get('confidence')}
+    }
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <meta name="viewport" content="width=device-width, initial-scale=1.0"/>
+  <title>{title} - Whine About AI</title>
+  <meta name="description" content="{description}">
+  <meta name="robots" content="index, follow">
+  <link rel="canonical" href="{url}">
+  <meta property="og:type" content="article">
+  <meta property="og:url" content="{url}">
+  <meta property="og:title" content="{title}">
+  <meta property="og:description" content="{description}">
+  <meta property="og:image" content="{image}">
+  <meta name="twitter:card" content="summary_large_image">
+  <link rel="icon" href="/favicon.ico" type="image/x-icon"/>
+  <link href="https://cdnjs.cloudflare.com/ajax/libs/bootstrap/5.3.2/css/bootstrap.min.css" rel="stylesheet"/>
+  <link href="https://fonts.googleapis.com/css2?family=Roboto+Slab:wght@400;700&display=swap" rel="stylesheet"/>
+  <style>
+    body {{ font-family:'Roboto Slab', serif; background:#f8f9fa; color:#343a40; }}
+    .navbar {{ background:#002855; }}
+    .navbar-brand {{ color:#fff!important; font-weight:700; }}
+    .content {{ background:white; padding:2rem; border-radius:10px; margin:2rem 0; box-shadow:0 2px 10px rgba(0,0,0,0.1); }}
+    h1, h2 {{ color:#002855; }}
+    h2 {{ font-size:1.25rem; margin-top:1.5rem; }}
+    .complaint-meta {{ color:#6c757d; font-size:0.9rem; }}
+    .meme {{ background:#212529; color:#fff; text-align:center; text-transform:uppercase; padding:1.5rem; border-radius:10px; font-weight:700; }}
+  </style>
+</head>
+<body>
+  <nav class="navbar">
+    <div class="container">
+      <a href="/" class="navbar-brand mb-0 h1">WhineAboutAI</a>
+    </div>
+  </nav>
+
+  <div class="container mt-5 pt-4">
+    <article class="content">
+      <h1>{complaint}</h1>
+      <p class="complaint-meta">{category} &middot; Anger level {anger_level}/10 &middot; <time datetime="{iso_date}">{date}</time></p>
+      <p>{response}</p>
+
+      <h2>Comeback</h2>
+      <p>{comeback}</p>
+
+      <h2>Meme</h2>
+      <div class="meme" data-meme-type="{meme_type}">
+        <div>{top_text}</div>
+        <div class="mt-3">{bottom_text}</div>
+      </div>
+
+      <h2>Prediction</h2>
+      <p>{prediction}{confidence}</p>
+
+      <div class="text-center mt-4">
+        <a href="/" class="btn btn-primary">Whine about your own AI</a>
+      </div>
+    </article>
+  </div>
+
+  <footer class="bg-dark text-white mt-5 py-4">
+    <div class="container">
+      <p class="mb-0">Where AI Failures Become Features™</p>
+      <a href="/privacy-policy" class="text-white-50 me-3">Privacy Policy</a>
+      <a href="/terms-of-service" class="text-white-50">Terms of Service</a>
+    </div>
+  </footer>
+</body>
+</html>
+"""
+
+def render_page(record: dict) -> bytes:
+    """Render a complaint's permalink page as UTF-8 HTML"""
+    extras = fill_attachments(record)
+    complaint = record['complaint']
+    created = datetime.fromtimestamp(record['ts'], timezone.utc)
+    confidence = extras['prediction']['confidence']
+    html = PAGE.format(
+        title=escape(complaint[:70] + ('...' if len(complaint) > 70 else '')),
+        description=escape(extras['comeback'][:160]),
+        url=escape(complaints.SITE_URL + complaints.permalink(record['id'])),
+        image=escape(complaints.SITE_URL + render.share_card_url(complaint, 'comeback', extras['comeback'])),
+        complaint=escape(complaint),
+        category=escape(record['category']),
+        anger_level=int(record['anger_level']),
+        iso_date=created.strftime('%Y-%m-%d'),
+        date=created.strftime('%B %d, %Y'),
+        response=escape(record.get('response') or ''),
+        comeback=escape(extras['comeback']),
+        meme_type=escape(extras['meme']['meme_type']),
+        top_text=escape(extras['meme']['top_text']),
+        bottom_text=escape(extras['meme']['bottom_text']),
+        prediction=escape(extras['prediction']['prediction']),
+        confidence=f" ({int(confidence)}% confidence)" if confidence is not None else ''
+    )
+    return html.encode('utf-8')
+
+def cached_page(record: dict) -> tuple:
+    """(html bytes, 'HIT' or 'MISS'); a page is rendered at most once per key"""
+    key = page_key(record)
+    data = page_cache.get(key)
+    if data is not None:
+        return data, 'HIT'
+    data = render_page(record)
+    page_cache.set(key, data)
+    return data, 'MISS'
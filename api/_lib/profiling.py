@@ -0,0 +1,241 @@
+"""
+On-demand profiling of live handlers.
+
+Handlers decorate do_POST with @profiling.profiled('<endpoint>'). A
+request is profiled only when it is armed, in one of two ways:
+
+    per request   X-Whine-Profile: <WHINE_PROFILE_TOKEN>
+                  X-Whine-Profile-Mode: sample | cprofile | memory  (default sample)
+                  X-Whine-Profile-Requests: N  also profiles the next N-1
+                  requests to that endpoint on this instance
+    per process   WHINE_PROFILE=chat:sample:20,create-meme:memory:5
+                  profiles the next N requests to each listed endpoint
+
+Modes:
+
+    sample    a thread samples the handler's stack every
+              WHINE_PROFILE_INTERVAL_MS and writes <name>.folded
+    cprofile  deterministic cProfile; writes <name>.prof for pstats,
+              snakeviz or flameprof
+    memory    tracemalloc over the request; writes <name>.alloc.folded
+              weighted by bytes allocated under the handler's module and
+              still held when it returns
+
+.folded files are collapsed stacks ("outer;inner;leaf weight"), the input
+of flamegraph.pl, speedscope and inferno. Profiles go to
+WHINE_PROFILE_DIR. Without a token or WHINE_PROFILE, the decorator costs
+one global check per request (see bench/profiling_bench.py).
+"""
+
+import cProfile
+import functools
+import hmac
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter, deque
+
+from . import metrics
+
+HEADER = 'X-Whine-Profile'
+MODE_HEADER = 'X-Whine-Profile-Mode'
+REQUESTS_HEADER = 'X-Whine-Profile-Requests'
+MODES = ('sample', 'cprofile', 'memory')
+
+TOKEN = os.getenv('WHINE_PROFILE_TOKEN', '')
+PROFILE_DIR = os.getenv('WHINE_PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'whine-profiles')
+INTERVAL = float(os.getenv('WHINE_PROFILE_INTERVAL_MS', '2')) / 1000
+# Requests one header may arm
+MAX_REQUESTS = 100
+MEMORY_FRAMES = 64
+
+_lock = threading.Lock()
+# endpoint -> [mode, requests left]
+_armed = {}
+_enabled = False
+_sequence = itertools.count(1)
+_counters = {"profiled": 0, "rejected": 0}
+_recent = deque(maxlen=20)
+_tracing = 0
+_started_tracing = False
+
+def _parse_env(spec: str) -> dict:
+    armed = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        endpoint, _, rest = entry.partition(':')
+        mode, _, count = rest.partition(':')
+        mode = mode if mode in MODES else 'sample'
+        armed[endpoint] = [mode, int(count) if count.isdigit() else 1]
+    return armed
+
+def _refresh():
+    global _enabled
+    _enabled = bool(TOKEN) or bool(_armed)
+
+def arm(endpoint: str, mode: str = 'sample', requests: int = 1):
+    """Profile the next requests to endpoint on this instance"""
+    with _lock:
+        _armed[endpoint] = [mode if mode in MODES else 'sample', max(1, min(requests, MAX_REQUESTS))]
+        _refresh()
+
+def _take(endpoint: str):
+    """Mode for this request if endpoint is armed, consuming one request"""
+    with _lock:
+        entry = _armed.get(endpoint)
+        if entry is None:
+            return None
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _armed[endpoint]
+            _refresh()
+        return entry[0]
+
+def _requested_mode(handler, endpoint: str):
+    """Mode for this request, from its headers or the armed set; None when not profiled"""
+    supplied = handler.headers.get(HEADER) if TOKEN else None
+    if supplied is None:
+        # Unlocked peek; _take re-checks under the lock
+        return _take(endpoint) if endpoint in _armed else None
+    if not hmac.compare_digest(supplied.encode('utf-8'), TOKEN.encode('utf-8')):
+        with _lock:
+            _counters["rejected"] += 1
+        return _take(endpoint)
+    mode = handler.headers.get(MODE_HEADER, 'sample')
+    mode = mode if mode in MODES else 'sample'
+    requests = handler.headers.get(REQUESTS_HEADER, '1')
+    if requests.isdigit() and int(requests) > 1:
+        arm(endpoint, mode, int(requests) - 1)
+    return mode
+
+def _label(code) -> str:
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class StackSampler:
+    """Sample one thread's stack on a timer, below the profiled call"""
+
+    def __init__(self, thread_id: int, stop_code, interval: float = INTERVAL):
+        self.thread_id = thread_id
+        self.stop_code = stop_code
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='whine-profiler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                stack.append(_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def write_folded(path: str, samples: Counter):
+    with open(path, 'w') as f:
+        for stack, weight in sorted(samples.items()):
+            f.write(f"{stack} {weight}\n")
+
+def _output_path(endpoint: str, mode: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime())
+    return os.path.join(PROFILE_DIR, f"{endpoint}-{mode}-{stamp}-{os.getpid()}-{next(_sequence)}")
+
+def _start_tracing():
+    global _tracing, _started_tracing
+    with _lock:
+        if _tracing == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(MEMORY_FRAMES)
+            _started_tracing = True
+        _tracing += 1
+
+def _stop_tracing():
+    """Stop tracemalloc after the last memory profile, unless someone else started it"""
+    global _tracing, _started_tracing
+    with _lock:
+        _tracing -= 1
+        if _tracing == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+def _memory_folded(before, after, filename: str) -> Counter:
+    """Growth between snapshots, limited to allocations made under the handler's module"""
+    # tracemalloc is process-wide; other threads' allocations would drown the handler's
+    keep = [tracemalloc.Filter(True, filename, all_frames=True)]
+    folded = Counter()
+    for stat in after.filter_traces(keep).compare_to(before.filter_traces(keep), 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+        frames = [f"{os.path.basename(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+        folded[';'.join(frames)] += stat.size_diff
+    return folded
+
+def _profile(fn, handler, endpoint: str, mode: str):
+    base = _output_path(endpoint, mode)
+    started = time.perf_counter()
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        try:
+            result = profiler.runcall(fn, handler)
+        finally:
+            profiler.dump_stats(base + '.prof')
+        path = base + '.prof'
+    elif mode == 'memory':
+        _start_tracing()
+        try:
+            before = tracemalloc.take_snapshot()
+            result = fn(handler)
+            after = tracemalloc.take_snapshot()
+        finally:
+            _stop_tracing()
+        path = base + '.alloc.folded'
+        write_folded(path, _memory_folded(before, after, fn.__code__.co_filename))
+    else:
+        with StackSampler(threading.get_ident(), _profile.__code__) as sampler:
+            result = fn(handler)
+        path = base + '.folded'
+        write_folded(path, sampler.samples)
+    with _lock:
+        _counters["profiled"] += 1
+        _recent.append({"endpoint": endpoint, "mode": mode, "path": path,
+                        "ms": round((time.perf_counter() - started) * 1000, 3)})
+    return result
+
+def profiled(endpoint: str):
+    """Decorate a handler method so armed requests to endpoint are profiled"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(handler):
+            if not _enabled:
+                return fn(handler)
+            mode = _requested_mode(handler, endpoint)
+            if mode is None:
+                return fn(handler)
+            return _profile(fn, handler, endpoint, mode)
+        return wrapper
+    return decorate
+
+def _stats() -> dict:
+    with _lock:
+        return {
+            **_counters,
+            "armed": {endpoint: {"mode": mode, "requests": left} for endpoint, (mode, left) in _armed.items()},
+            "directory": PROFILE_DIR,
+            "recent": list(_recent)
+        }
+
+_armed.update(_parse_env(os.getenv('WHINE_PROFILE', '')))
+_refresh()
+metrics.register('profiling', _stats)
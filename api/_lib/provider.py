@@ -0,0 +1,43 @@
+"""
+Shared OpenAI client.
+
+openai.OpenAI() builds a new HTTP connection pool, so a client per request
+paid for a fresh TCP and TLS handshake on every call. get_client() keeps one
+client per API key and base URL for the life of the process, and its pool
+keeps connections to the API open between requests.
+"""
+
+import os
+import threading
+try:
+    import openai
+except ImportError:
+    openai = None
+
+from . import metrics
+
+_clients = {}
+_lock = threading.Lock()
+_counters = {"built": 0, "reused": 0}
+
+def get_client(api_key: str = None):
+    """Process-wide client for the key (default OPENAI_API_KEY), or None without a key or the openai package"""
+    api_key = api_key or os.getenv('OPENAI_API_KEY')
+    if not api_key or openai is None:
+        return None
+    base_url = os.getenv('OPENAI_BASE_URL') or None
+    key = (api_key, base_url)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = openai.OpenAI(api_key=api_key, base_url=base_url)
+            _counters["built"] += 1
+        else:
+            _counters["reused"] += 1
+    return client
+
+def _stats() -> dict:
+    with _lock:
+        return {**_counters, "clients": len(_clients)}
+
+metrics.register('provider', _stats)
@@ -0,0 +1,400 @@
+"""
+Server-side meme image rendering.
+
+Templates are looked up per meme_type in WHINE_MEME_TEMPLATE_DIR
+(<meme_type>.png/.jpg/.webp), falling back to the site share image. No
+template images ship with the repository (the meme pictures are not ours
+to redistribute), so out of the box every meme_type uses the share image.
+Decoded templates and per-font glyph atlases are cached in each process;
+finished images are cached by a hash of (template, text, format).
+Rendering is CPU bound, so it runs on a process pool sized by
+WHINE_RENDER_WORKERS (default: the CPUs divided among the server's worker
+processes, 0 renders inline). Pool processes are started by a forkserver
+(spawn where there is none), never forked from the threaded server.
+
+Pillow is optional; without it render requests report an error and the
+client falls back to drawing the meme itself.
+"""
+
+import base64
+import hashlib
+import hmac
+import io
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlencode
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = None
+
+from . import metrics
+from .lru import LRUCache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_TEMPLATE = os.path.join(ROOT_DIR, 'whine-about-ai-share.jpg')
+TEMPLATE_DIR = os.getenv('WHINE_MEME_TEMPLATE_DIR', os.path.join(ROOT_DIR, 'meme-templates'))
+TEMPLATE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp')
+
+# Bump when layout changes so cached renders are not reused
+RENDER_VERSION = 1
+CANVAS_WIDTH = 800
+FORMATS = {'png': ('PNG', 'image/png'), 'webp': ('WEBP', 'image/webp'), 'jpeg': ('JPEG', 'image/jpeg')}
+
+SHARE_CARD_SIZE = (1200, 630)
+# Share card URLs are signed so only texts this site produced get a branded card
+SHARE_CARD_SECRET = os.getenv('WHINE_SHARE_CARD_SECRET', '')
+STATIC_SHARE_IMAGE = '/whine-about-ai-share.jpg'
+SHARE_CARD_LABELS = {
+    'comeback': 'THE PERFECT COMEBACK',
+    'prediction': 'AI FAIL PREDICTION',
+    'enhanced': 'ENHANCED COMPLAINT',
+    'response': 'OFFICIAL RESPONSE',
+    'meme': 'MEME-IFIED'
+}
+
+FONT_CANDIDATES = [
+    os.getenv('WHINE_MEME_FONT', ''),
+    '/usr/share/fonts/truetype/msttcorefonts/Impact.ttf',
+    '/Library/Fonts/Impact.ttf',
+    'C:\\Windows\\Fonts\\impact.ttf',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf',
+]
+
+_slug = re.compile(r'[^a-z0-9_-]+')
+
+# Per-process caches; each pool worker warms its own
+_templates = {}
+_fonts = {}
+_atlases = {}
+_cache_lock = threading.Lock()
+
+rendered_cache = LRUCache('meme-renders', max_entries=int(os.getenv('WHINE_RENDER_CACHE_ENTRIES', '256')))
+
+_pool = None
+_pool_lock = threading.Lock()
+_counters = {'renders': 0, 'pool_renders': 0, 'inline_renders': 0, 'errors': 0}
+
+def available() -> bool:
+    return Image is not None
+
+def template_path(meme_type: str) -> str:
+    """Resolve the template image for a meme type"""
+    name = _slug.sub('_', (meme_type or '').lower()).strip('_')
+    if name:
+        for extension in TEMPLATE_EXTENSIONS:
+            path = os.path.join(TEMPLATE_DIR, name + extension)
+            if os.path.isfile(path):
+                return path
+    return DEFAULT_TEMPLATE
+
+def template_identity(path: str) -> str:
+    """Path plus modification time, so edited templates invalidate renders"""
+    try:
+        return f"{path}:{os.stat(path).st_mtime_ns}"
+    except OSError:
+        return path
+
+def load_template(path: str, width: int = CANVAS_WIDTH):
+    """Decode and resize a template once per process"""
+    identity = (template_identity(path), width)
+    with _cache_lock:
+        image = _templates.get(identity)
+    if image is None:
+        with Image.open(path) as source:
+            image = source.convert('RGB')
+        if image.width != width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        with _cache_lock:
+            _templates[identity] = image
+    return image
+
+def load_font(size: int):
+    with _cache_lock:
+        font = _fonts.get(size)
+    if font is None:
+        font = None
+        for candidate in FONT_CANDIDATES:
+            if candidate and os.path.isfile(candidate):
+                font = ImageFont.truetype(candidate, size)
+                break
+        if font is None:
+            font = ImageFont.load_default()
+        with _cache_lock:
+            _fonts[size] = font
+    return font
+
+class GlyphAtlas:
+    """Pre-rasterized fill and outline masks for each character at one font size"""
+
+    def __init__(self, size: int):
+        self.font = load_font(size)
+        self.stroke = max(2, size // 12)
+        ascent, descent = self.font.getmetrics()
+        self.line_height = ascent + descent + self.stroke * 2
+        self._glyphs = {}
+
+    def glyph(self, char: str):
+        glyph = self._glyphs.get(char)
+        if glyph is None:
+            left, top, right, bottom = self.font.getbbox(char, stroke_width=self.stroke)
+            size = (max(1, right - left), max(1, bottom - top))
+            outline = Image.new('L', size, 0)
+            ImageDraw.Draw(outline).text((-left, -top), char, font=self.font, fill=255,
+                                         stroke_width=self.stroke, stroke_fill=255)
+            fill = Image.new('L', size, 0)
+            ImageDraw.Draw(fill).text((-left, -top), char, font=self.font, fill=255)
+            glyph = (left, top, outline, fill, self.font.getlength(char))
+            self._glyphs[char] = glyph
+        return glyph
+
+    def width(self, text: str) -> float:
+        return sum(self.glyph(char)[4] for char in text)
+
+def get_atlas(size: int) -> GlyphAtlas:
+    with _cache_lock:
+        atlas = _atlases.get(size)
+    if atlas is None:
+        atlas = GlyphAtlas(size)
+        with _cache_lock:
+            _atlases[size] = atlas
+    return atlas
+
+def wrap(atlas: GlyphAtlas, text: str, max_width: float) -> list:
+    lines = []
+    current = ''
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and atlas.width(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+def fit_text(text: str, width: int, height: int, max_lines: int = 3, max_size: int = None) -> tuple:
+    """Largest font size at which the text wraps into at most max_lines lines"""
+    max_width = width * 0.92
+    for size in range(max(16, max_size or height // 8), 15, -4):
+        atlas = get_atlas(size)
+        lines = wrap(atlas, text, max_width)
+        if len(lines) <= max_lines and all(atlas.width(line) <= max_width for line in lines):
+            return atlas, lines
+    atlas = get_atlas(16)
+    return atlas, wrap(atlas, text, max_width)[:max_lines]
+
+def draw_lines(image, atlas: GlyphAtlas, lines: list, y: int):
+    for line in lines:
+        x = (image.width - atlas.width(line)) / 2
+        for char in line:
+            left, top, outline, fill, advance = atlas.glyph(char)
+            position = (int(x + left), int(y + top))
+            image.paste((0, 0, 0), position, outline)
+            image.paste((255, 255, 255), position, fill)
+            x += advance
+        y += atlas.line_height
+
+def render_meme(path: str, top_text: str, bottom_text: str, image_format: str = 'png') -> bytes:
+    """Draw classic outlined meme text onto a template and encode it"""
+    image = load_template(path).copy()
+    margin = image.height // 30
+
+    if top_text:
+        atlas, lines = fit_text(top_text.upper(), image.width, image.height)
+        draw_lines(image, atlas, lines, margin)
+    if bottom_text:
+        atlas, lines = fit_text(bottom_text.upper(), image.width, image.height)
+        draw_lines(image, atlas, lines, image.height - margin - atlas.line_height * len(lines))
+
+    return encode(image, image_format)
+
+def encode(image, image_format: str) -> bytes:
+    output = io.BytesIO()
+    pil_format = FORMATS[image_format][0]
+    if pil_format == 'WEBP':
+        image.save(output, pil_format, quality=85, method=4)
+    elif pil_format == 'JPEG':
+        image.save(output, pil_format, quality=85, progressive=True)
+    else:
+        image.save(output, pil_format, optimize=False, compress_level=6)
+    return output.getvalue()
+
+def load_card_background():
+    """Share image cropped to Open Graph proportions and dimmed for legible text"""
+    width, height = SHARE_CARD_SIZE
+    identity = ('card', template_identity(DEFAULT_TEMPLATE))
+    with _cache_lock:
+        image = _templates.get(identity)
+    if image is None:
+        image = load_template(DEFAULT_TEMPLATE, width)
+        if image.size != (width, height):
+            top = max(0, (image.height - height) // 2)
+            image = image.crop((0, top, width, top + height))
+            if image.height < height:
+                image = image.resize((width, height), Image.LANCZOS)
+        image = Image.blend(image, Image.new('RGB', image.size, (0, 0, 0)), 0.45)
+        with _cache_lock:
+            _templates[identity] = image
+    return image
+
+def render_share_card(complaint: str, kind: str, text: str, image_format: str = 'jpeg') -> bytes:
+    """Per-result Open Graph card: the complaint, a label, then the generated text"""
+    image = load_card_background().copy()
+    width, height = image.size
+    y = 50
+
+    atlas, lines = fit_text(f"\u201c{complaint}\u201d", width, height, max_lines=3, max_size=56)
+    draw_lines(image, atlas, lines, y)
+    y += atlas.line_height * len(lines) + 30
+
+    label_atlas = get_atlas(30)
+    draw_lines(image, label_atlas, [SHARE_CARD_LABELS.get(kind, 'THE VERDICT')], y)
+    y += label_atlas.line_height + 16
+
+    footer = get_atlas(28)
+    footer_top = height - footer.line_height - 20
+    if text:
+        atlas, lines = fit_text(text, width, height, max_lines=4, max_size=48)
+        room = max(1, (footer_top - 10 - y) // atlas.line_height)
+        draw_lines(image, atlas, lines[:room], y)
+
+    draw_lines(image, footer, ['whineaboutai.com'], footer_top)
+    return encode(image, image_format)
+
+def default_workers() -> int:
+    """This process's share of the CPUs; the pre-forked server sets WHINE_SERVER_WORKERS"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return max(1, cpus // max(1, int(os.getenv('WHINE_SERVER_WORKERS', '1'))))
+
+def _context():
+    # Forking copies the lock state of the request threads into the child
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+def _get_pool():
+    """Create the render pool on first use; None means render inline"""
+    global _pool
+    workers = int(os.getenv('WHINE_RENDER_WORKERS', str(default_workers())))
+    if workers <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=workers, mp_context=_context())
+            except (OSError, NotImplementedError, ImportError) as e:
+                # Some serverless sandboxes lack the semaphores a pool needs
+                print(f"Render pool unavailable, rendering inline: {e}")
+                _pool = False
+        return _pool or None
+
+def shutdown():
+    """Stop the render pool's processes; a later render starts a new pool"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def run_render(fn, *args, timeout: float = 10.0) -> bytes:
+    """Run a render function on the pool when there is one, inline otherwise"""
+    pool = _get_pool()
+    try:
+        if pool is not None:
+            data = pool.submit(fn, *args).result(timeout=timeout)
+            _counters['pool_renders'] += 1
+        else:
+            data = fn(*args)
+            _counters['inline_renders'] += 1
+    except Exception:
+        _counters['errors'] += 1
+        raise
+    _counters['renders'] += 1
+    return data
+
+def _preload() -> bool:
+    load_template(DEFAULT_TEMPLATE)
+    load_card_background()
+    return True
+
+def warm() -> str:
+    """Start the render pool and decode the default template; returns where it ran"""
+    if not available():
+        return 'unavailable'
+    pool = _get_pool()
+    if pool is None:
+        _preload()
+        return 'inline'
+    pool.submit(_preload).result(timeout=30)
+    return 'pool'
+
+def share_card_key(complaint: str, kind: str, text: str) -> str:
+    """Content address of a share card; identical inputs always render identical bytes"""
+    payload = '\x1f'.join(('card', str(RENDER_VERSION), template_identity(DEFAULT_TEMPLATE), complaint, kind, text))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def share_card_signature(complaint: str, kind: str, text: str) -> str:
+    payload = '\x1f'.join((complaint, kind, text))
+    return hmac.new(SHARE_CARD_SECRET.encode('utf-8'), payload.encode('utf-8'), hashlib.sha256).hexdigest()[:32]
+
+def valid_share_card_signature(complaint: str, kind: str, text: str, signature: str) -> bool:
+    if not SHARE_CARD_SECRET:
+        return False
+    return hmac.compare_digest(signature.encode('utf-8'), share_card_signature(complaint, kind, text).encode('utf-8'))
+
+def share_card_url(complaint: str, kind: str, text: str) -> str:
+    """Signed, versioned share card URL, safe to cache forever; the static share image without a secret"""
+    if not SHARE_CARD_SECRET:
+        return STATIC_SHARE_IMAGE
+    query = urlencode({
+        'complaint': complaint,
+        'kind': kind,
+        'text': text,
+        'v': RENDER_VERSION,
+        'sig': share_card_signature(complaint, kind, text)
+    })
+    return f"/api/share-card?{query}"
+
+def render_cache_key(path: str, top_text: str, bottom_text: str, image_format: str) -> str:
+    payload = '\x1f'.join((str(RENDER_VERSION), template_identity(path), top_text, bottom_text, image_format))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_image(meme_type: str, top_text: str, bottom_text: str, image_format: str = 'png',
+                 timeout: float = 10.0) -> dict:
+    """Render (or fetch from cache) a meme and describe it for a JSON response"""
+    if not available():
+        raise RuntimeError("Image rendering requires Pillow")
+    if image_format not in FORMATS:
+        raise ValueError(f"Unsupported image format: {image_format}")
+
+    path = template_path(meme_type)
+    key = render_cache_key(path, top_text, bottom_text, image_format)
+    data = rendered_cache.get(key)
+    cached = data is not None
+
+    if not cached:
+        data = run_render(render_meme, path, top_text, bottom_text, image_format, timeout=timeout)
+        rendered_cache.set(key, data)
+
+    mime_type = FORMATS[image_format][1]
+    return {
+        "format": image_format,
+        "mime_type": mime_type,
+        "hash": key,
+        "bytes": len(data),
+        "cached": cached,
+        "data_url": f"data:{mime_type};base64,{base64.b64encode(data).decode('ascii')}"
+    }
+
+metrics.register('render', lambda: dict(_counters, pool=bool(_pool), pillow=available()))
@@ -0,0 +1,171 @@
+"""
+Cheap local screening of user text before it is sent to OpenAI.
+
+Keyboard mashes, repeated characters, link spam and pasted novels still get
+an answer, just the free fallback one. Checks run cheapest first:
+
+- length and letter count
+- longest run of one letter or digit (punctuation runs are allowed), and word repetition
+- character entropy
+- link count and the share of the text taken by links
+- a hashed character/word n-gram logistic model (screen_weights.json,
+  trained by scripts/train_screen.py); skipped if the file is missing, and
+  for text whose letters are mostly not Latin, since it was trained on
+  English and scores any other script as noise
+
+Everything is linear in at most MAX_SCORED_CHARS characters, so a verdict
+takes well under a millisecond (see bench/screen_bench.py).
+"""
+
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from collections import Counter, namedtuple
+
+from . import metrics
+
+WEIGHTS_PATH = os.getenv('WHINE_SCREEN_WEIGHTS', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screen_weights.json'))
+
+MAX_CHARS = 2000
+MAX_SCORED_CHARS = 240
+MAX_CHAR_RUN = 10
+MIN_ENTROPY_LENGTH = 16
+MIN_ENTROPY = 2.5
+MIN_REPEAT_WORDS = 8
+MIN_UNIQUE_WORD_RATIO = 0.3
+MAX_LINKS = 2
+MAX_LINK_SHARE = 0.5
+# Rejecting a real complaint costs more than answering spam, so the model
+# only gets the final say when it is very sure
+MODEL_THRESHOLD = 0.9
+# Share of letters that must be Latin script before the model is consulted
+MIN_MODEL_LATIN_SHARE = 0.5
+
+Verdict = namedtuple('Verdict', 'allowed reason score')
+
+_links = re.compile(r'(?:https?://|www\.)\S+', re.I)
+_words = re.compile(r"[a-z0-9']+")
+# Letters and digits only: a run of '!' is how this site's users complain
+_char_run = re.compile(r'([^\W_])\1{%d,}' % (MAX_CHAR_RUN - 1))
+_spaces = re.compile(r'\s+')
+
+def char_entropy(text: str) -> float:
+    """Shannon entropy in bits per character"""
+    length = len(text)
+    return -sum(count / length * math.log2(count / length) for count in Counter(text).values())
+
+def latin_share(text: str) -> float:
+    """Share of the letters in text that are Latin script (ASCII through Latin Extended-B)"""
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return 0.0
+    return sum(1 for char in letters if char < '\u0250') / len(letters)
+
+def features(text: str, dimensions: int) -> dict:
+    """Hashed byte 3-grams and word 1/2-grams, scaled to unit length"""
+    data = f" {_spaces.sub(' ', text.lower())[:MAX_SCORED_CHARS]} ".encode('utf-8')
+    mask = dimensions - 1
+    crc32 = zlib.crc32
+    words = _words.findall(data.decode('utf-8', 'ignore'))
+    counts = Counter([crc32(data[index:index + 3]) & mask for index in range(len(data) - 2)])
+    counts.update([crc32(f'w:{word}'.encode('utf-8')) & mask for word in words])
+    counts.update([crc32(f'b:{first} {second}'.encode('utf-8')) & mask for first, second in zip([''] + words, words)])
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return {index: value / norm for index, value in counts.items()}
+
+class LinearModel:
+    """Logistic regression over hashed features; weights are stored sparsely"""
+
+    def __init__(self, dimensions: int, bias: float, weights: dict):
+        self.dimensions = dimensions
+        self.bias = bias
+        self.weights = weights
+
+    @classmethod
+    def load(cls, path: str) -> 'LinearModel':
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['dimensions'], data['bias'], {int(index): weight for index, weight in data['weights'].items()})
+
+    def save(self, path: str):
+        data = {
+            "dimensions": self.dimensions,
+            "bias": round(self.bias, 6),
+            "weights": {str(index): round(weight, 6) for index, weight in sorted(self.weights.items()) if abs(weight) >= 1e-4}
+        }
+        with open(path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+            f.write('\n')
+
+    def probability(self, text: str) -> float:
+        weights = self.weights
+        z = self.bias + sum(weights.get(index, 0.0) * value for index, value in features(text, self.dimensions).items())
+        return 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z))))
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def get_model():
+    """Model from WEIGHTS_PATH, or None when it is missing or unreadable"""
+    global _model, _model_loaded
+    if not _model_loaded:
+        with _model_lock:
+            if not _model_loaded:
+                try:
+                    _model = LinearModel.load(WEIGHTS_PATH)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Screening model unavailable, using heuristics only: {e}")
+                _model_loaded = True
+    return _model
+
+def check(text: str, use_model: bool = True) -> Verdict:
+    """Decide whether text is worth an upstream call"""
+    if len(text) > MAX_CHARS:
+        return Verdict(False, 'too_long', None)
+    if sum(map(str.isalpha, text[:MAX_SCORED_CHARS])) < 2:
+        return Verdict(False, 'no_letters', None)
+    if _char_run.search(text):
+        return Verdict(False, 'repeated_characters', None)
+
+    words = _words.findall(text.lower())
+    if len(words) >= MIN_REPEAT_WORDS and len(set(words)) / len(words) < MIN_UNIQUE_WORD_RATIO:
+        return Verdict(False, 'repetitive', None)
+    if len(text) >= MIN_ENTROPY_LENGTH and char_entropy(text[:MAX_SCORED_CHARS]) < MIN_ENTROPY:
+        return Verdict(False, 'low_entropy', None)
+
+    links = _links.findall(text)
+    if len(links) > MAX_LINKS or (links and sum(map(len, links)) / len(text) > MAX_LINK_SHARE):
+        return Verdict(False, 'links', None)
+
+    model = get_model() if use_model else None
+    if model is None or latin_share(text[:MAX_SCORED_CHARS]) < MIN_MODEL_LATIN_SHARE:
+        return Verdict(True, None, None)
+    score = model.probability(text)
+    return Verdict(score < MODEL_THRESHOLD, None if score < MODEL_THRESHOLD else 'model', round(score, 4))
+
+_counters = {"screened": 0, "rejected": 0}
+_reasons = Counter()
+_counters_lock = threading.Lock()
+
+def allow(endpoint: str, *texts: str) -> bool:
+    """True when every text passes; rejections are counted per reason"""
+    for text in texts:
+        verdict = check(text)
+        with _counters_lock:
+            _counters["screened"] += 1
+            if not verdict.allowed:
+                _counters["rejected"] += 1
+                _reasons[f"{endpoint}.{verdict.reason}"] += 1
+        if not verdict.allowed:
+            return False
+    return True
+
+def _stats() -> dict:
+    with _counters_lock:
+        return {**_counters, "reasons": dict(_reasons), "model_loaded": _model is not None}
+
+metrics.register('screen', _stats)
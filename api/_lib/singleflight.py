@@ -0,0 +1,70 @@
+"""
+Single-flight deduplication of identical in-flight upstream calls.
+Concurrent callers with the same key wait on one shared future instead
+of each making their own provider request.
+"""
+
+import re
+import threading
+from concurrent.futures import Future
+
+from . import metrics
+
+_whitespace = re.compile(r'\s+')
+
+def normalize_key(*parts: str) -> str:
+    """Build a dedup key that ignores case and whitespace differences"""
+    return '\x1f'.join(_whitespace.sub(' ', str(part)).strip().lower() for part in parts)
+
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.calls = 0
+        self.executed = 0
+        self.collapsed = 0
+        self.errors = 0
+        metrics.register(f"singleflight.{name}", self.stats)
+
+    def do(self, key: str, fn):
+        """Run fn() once per key at a time and share its result with all waiters"""
+        with self._lock:
+            self.calls += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.executed += 1
+            else:
+                self.collapsed += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self.errors += 1
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executed": self.executed,
+                "collapsed": self.collapsed,
+                "errors": self.errors,
+                "in_flight": len(self._in_flight)
+            }
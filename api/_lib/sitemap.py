@@ -0,0 +1,173 @@
+"""
+Incremental sitemap index over the stored complaints.
+
+/sitemap.xml is an index listing the hand-maintained sitemap-pages.xml and
+one shard per SHARD_SIZE complaints (/sitemaps/complaints-00001.xml, ...).
+Files live in WHINE_SITEMAP_DIR. A submission only rewrites the newest
+shard: its entry is spliced in before </urlset> when the shard's url count
+says nothing is missing, and the shard is rebuilt from the complaint store
+otherwise (first use, a lost write, a new instance). Full shards never
+change again. Writes are atomic and serialized with a file lock, so the
+pre-forked server's workers can share one directory. Where complaints are
+not stored (see complaints.ENABLED) the index lists only the static pages.
+"""
+
+import os
+import re
+import tempfile
+import threading
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import complaints, metrics
+
+SITEMAP_DIR = os.getenv('WHINE_SITEMAP_DIR', os.path.join(tempfile.gettempdir(), 'whine-sitemaps'))
+# The sitemaps.org limit per file
+SHARD_SIZE = 50000
+INDEX_NAME = 'index.xml'
+PAGES_URL = f"{complaints.SITE_URL}/sitemap-pages.xml"
+
+HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+URLSET_OPEN = '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+URLSET_CLOSE = b'</urlset>\n'
+
+_count_line = re.compile(rb'<!-- urls: (\d+) -->\n')
+_shard_name = re.compile(r'^complaints-(\d{5})\.xml$')
+
+_lock = threading.Lock()
+_counters = {"spliced": 0, "rebuilt": 0, "errors": 0}
+
+def shard_name(shard: int) -> str:
+    return f"complaints-{shard + 1:05d}.xml"
+
+def shard_url(shard: int) -> str:
+    return f"{complaints.SITE_URL}/sitemaps/{shard_name(shard)}"
+
+def _lastmod(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def _url_entry(complaint_id: str, updated: float) -> str:
+    loc = escape(complaints.SITE_URL + complaints.permalink(complaint_id))
+    return f"<url><loc>{loc}</loc><lastmod>{_lastmod(updated)}</lastmod></url>\n"
+
+def _write(name: str, data: bytes):
+    os.makedirs(SITEMAP_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=SITEMAP_DIR, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, os.path.join(SITEMAP_DIR, name))
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+def _read(name: str):
+    try:
+        with open(os.path.join(SITEMAP_DIR, name), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+class _FileLock:
+    """Thread lock plus an exclusive flock, where the platform has one"""
+
+    def __enter__(self):
+        _lock.acquire()
+        self._file = None
+        if fcntl is not None:
+            os.makedirs(SITEMAP_DIR, exist_ok=True)
+            self._file = open(os.path.join(SITEMAP_DIR, '.lock'), 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            self._file.close()
+        _lock.release()
+
+def _render_shard(entries: list) -> bytes:
+    body = ''.join(_url_entry(complaint_id, updated) for _, complaint_id, updated in entries)
+    return (HEADER + f"<!-- urls: {len(entries)} -->\n" + URLSET_OPEN + body).encode('utf-8') + URLSET_CLOSE
+
+def _rebuild_shard(shard: int) -> bytes:
+    data = _render_shard(complaints.store.entries(shard * SHARD_SIZE + 1, (shard + 1) * SHARD_SIZE))
+    _write(shard_name(shard), data)
+    _counters["rebuilt"] += 1
+    return data
+
+def _splice(data: bytes, position: int, entry: str):
+    """Shard bytes with entry appended, or None unless it holds exactly position urls"""
+    match = _count_line.search(data, 0, 256) if data else None
+    if match is None or int(match.group(1)) != position or not data.endswith(URLSET_CLOSE):
+        return None
+    head = data[:match.start()] + f"<!-- urls: {position + 1} -->\n".encode('utf-8')
+    return head + data[match.end():-len(URLSET_CLOSE)] + entry.encode('utf-8') + URLSET_CLOSE
+
+def _write_index(shards: int, newest_lastmod: float):
+    lines = [HEADER, '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n',
+             f"<sitemap><loc>{escape(PAGES_URL)}</loc></sitemap>\n"]
+    for shard in range(shards):
+        if shard == shards - 1:
+            lastmod = newest_lastmod
+        else:
+            path = os.path.join(SITEMAP_DIR, shard_name(shard))
+            if not os.path.exists(path):
+                _rebuild_shard(shard)
+            lastmod = os.path.getmtime(path)
+        lines.append(f"<sitemap><loc>{escape(shard_url(shard))}</loc><lastmod>{_lastmod(lastmod)}</lastmod></sitemap>\n")
+    lines.append('</sitemapindex>\n')
+    _write(INDEX_NAME, ''.join(lines).encode('utf-8'))
+
+def add(saved: dict):
+    """Add a just-saved complaint ({"seq", "id", "ts"}), rewriting only its shard and the index"""
+    shard, position = divmod(saved["seq"] - 1, SHARD_SIZE)
+    try:
+        with _FileLock():
+            data = _splice(_read(shard_name(shard)), position, _url_entry(saved["id"], saved["ts"]))
+            if data is None:
+                _rebuild_shard(shard)
+            else:
+                _write(shard_name(shard), data)
+                _counters["spliced"] += 1
+            # A rebuild of a lower seq may already have written later shards
+            last_seq = max(saved["seq"], complaints.store.last_seq())
+            _write_index(last_seq // SHARD_SIZE + (1 if last_seq % SHARD_SIZE else 0), saved["ts"])
+    except Exception as e:
+        print(f"Sitemap update failed: {e}")
+        _counters["errors"] += 1
+
+def index() -> bytes:
+    """The sitemap index, built from the store if this instance has none yet"""
+    data = _read(INDEX_NAME)
+    if data is not None:
+        return data
+    with _FileLock():
+        last_seq = complaints.store.last_seq() if complaints.ENABLED else 0
+        shards = last_seq // SHARD_SIZE + (1 if last_seq % SHARD_SIZE else 0)
+        if shards:
+            _rebuild_shard(shards - 1)
+        _write_index(shards, datetime.now(timezone.utc).timestamp())
+    return _read(INDEX_NAME)
+
+def shard(name: str):
+    """Bytes of a complaint shard by file name, None when it does not exist"""
+    match = _shard_name.match(name or '')
+    if match is None or not complaints.ENABLED:
+        return None
+    data = _read(name)
+    if data is not None:
+        return data
+    number = int(match.group(1)) - 1
+    if number < 0 or number * SHARD_SIZE >= complaints.store.last_seq():
+        return None
+    with _FileLock():
+        return _read(name) or _rebuild_shard(number)
+
+metrics.register('sitemap', lambda: {**_counters, "directory": SITEMAP_DIR})
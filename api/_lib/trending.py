@@ -0,0 +1,396 @@
+"""
+Streaming "trending AI fails" over submitted complaints.
+
+Each time window (1h, 24h, 7d) keeps a Count-Min Sketch plus a small top-k
+heap for normalized complaint texts and for categories. Counts use forward
+exponential decay: an event at time t adds exp((t - landmark) / tau), so
+older submissions fade smoothly without per-bucket bookkeeping, and every
+update is O(depth) no matter how many complaints have been seen.
+
+State is synced with WHINE_TRENDING_SNAPSHOT (default: a file in the
+temp directory) every WHINE_TRENDING_SNAPSHOT_SECONDS. A sync takes a file
+lock, adds the submissions this process recorded since its last sync to
+the file (sketches and top-k merge by addition), writes it back and adopts
+the merged counts as its own view. A daemon thread syncs every interval,
+and submissions and reads sync when it is overdue. Processes sharing the
+file, such as the pre-forked server's workers, therefore each see every
+submission within about one interval instead of overwriting each other's
+counts. Only processes
+that share that file see the same trends: on the self-hosted server
+/api/trending reads what submit-complaint recorded, but on Vercel the two
+are separate functions with separate /tmp, so /api/trending there sees no
+submissions.
+
+The feed is public, so submit-complaint only records text the spam screen
+allows, labels are stripped of links, email addresses, phone numbers and
+handles, and categories are folded onto the known set (anger.CATEGORIES).
+"""
+
+import base64
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+from array import array
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import anger, metrics
+from .singleflight import normalize_key
+
+WINDOWS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400}
+KINDS = ('complaints', 'categories')
+
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+TOP_K = 50
+
+# Rescale before exp() of the landmark offset can overflow a double
+MAX_EXPONENT = 60.0
+
+SNAPSHOT_PATH = os.getenv('WHINE_TRENDING_SNAPSHOT', os.path.join(tempfile.gettempdir(), 'whine-trending.json'))
+SNAPSHOT_INTERVAL = float(os.getenv('WHINE_TRENDING_SNAPSHOT_SECONDS', '60'))
+
+_punctuation = re.compile(r'[^\w\s]')
+_contact = re.compile(
+    r'(?:https?://|www\.)\S+'                                   # links
+    r'|\S+@\S+\.\S+'                                           # email addresses
+    r'|\b[\w-]+(?:\.[\w-]+)*\.(?:com|net|org|io|co|me|ly|xyz|ru|info|biz|app|dev)\b\S*'  # bare domains
+    r'|\+?\d[\d\s().-]{6,}\d'                                   # phone numbers
+    r'|@\w+',                                                 # handles
+    re.I
+)
+_spaces = re.compile(r'\s+')
+
+def scrub_label(complaint: str) -> str:
+    """Public label for a complaint: no links or contact details, at most 200 characters"""
+    return _spaces.sub(' ', _contact.sub(' ', complaint)).strip()[:200]
+
+def complaint_key(complaint: str) -> str:
+    """Fold case, whitespace and punctuation so reposts count together"""
+    return normalize_key(_punctuation.sub(' ', complaint))[:200]
+
+def category_label(category: str) -> str:
+    """One of anger.CATEGORIES; free-form text counts as the general category"""
+    return anger.CATEGORIES[anger.category_index(category)]
+
+class DecayedCountMin:
+    """Count-Min Sketch whose counters decay exponentially with time constant tau"""
+
+    def __init__(self, tau: float, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH, landmark: float = None):
+        self.tau = tau
+        self.width = width
+        self.depth = depth
+        self.landmark = time.time() if landmark is None else landmark
+        self.rows = [array('d', bytes(8 * width)) for _ in range(depth)]
+
+    def _columns(self, key: str) -> list:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[4 * i:4 * i + 4], 'little') % self.width for i in range(self.depth)]
+
+    def weight(self, now: float) -> float:
+        return math.exp((now - self.landmark) / self.tau)
+
+    def needs_rescale(self, now: float) -> bool:
+        return (now - self.landmark) / self.tau > MAX_EXPONENT
+
+    def rescale(self, now: float) -> float:
+        """Move the landmark to now; returns the factor applied to stored values"""
+        factor = math.exp(-(now - self.landmark) / self.tau)
+        for row in self.rows:
+            for index in range(self.width):
+                row[index] *= factor
+        self.landmark = now
+        return factor
+
+    def estimate(self, key: str) -> float:
+        """Current estimate for key in landmark units"""
+        return min(row[column] for row, column in zip(self.rows, self._columns(key)))
+
+    def merge(self, other: 'DecayedCountMin'):
+        """Add other's counts; the caller has already moved this landmark to at least other's"""
+        factor = math.exp((other.landmark - self.landmark) / self.tau)
+        for row, other_row in zip(self.rows, other.rows):
+            for index in range(self.width):
+                row[index] += other_row[index] * factor
+
+    def add(self, key: str, now: float) -> float:
+        """Count one event and return the key's new estimate in landmark units"""
+        increment = self.weight(now)
+        estimate = None
+        for row, column in zip(self.rows, self._columns(key)):
+            row[column] += increment
+            if estimate is None or row[column] < estimate:
+                estimate = row[column]
+        return estimate
+
+    def to_decayed(self, value: float, now: float) -> float:
+        """Convert a landmark-scaled value into a decayed count at time now"""
+        return value / self.weight(now)
+
+class TopK:
+    """Heavy hitters: keys with the largest sketch estimates, via a lazy min-heap"""
+
+    def __init__(self, k: int = TOP_K):
+        self.k = k
+        self.members = {}
+        self.labels = {}
+        self._heap = []
+
+    def offer(self, key: str, estimate: float, label: str):
+        if key in self.members:
+            self.members[key] = estimate
+            heapq.heappush(self._heap, (estimate, key))
+        elif len(self.members) < self.k:
+            self.members[key] = estimate
+            self.labels[key] = label
+            heapq.heappush(self._heap, (estimate, key))
+        else:
+            self._drop_stale()
+            if estimate > self._heap[0][0]:
+                _, evicted = heapq.heappop(self._heap)
+                del self.members[evicted]
+                del self.labels[evicted]
+                self.members[key] = estimate
+                self.labels[key] = label
+                heapq.heappush(self._heap, (estimate, key))
+        if len(self._heap) > 4 * self.k:
+            self._rebuild()
+
+    def _drop_stale(self):
+        # Heap entries are stale when the member has since been re-pushed higher
+        while self._heap and self.members.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+    def _rebuild(self):
+        self._heap = [(estimate, key) for key, estimate in self.members.items()]
+        heapq.heapify(self._heap)
+
+    def scale(self, factor: float):
+        for key in self.members:
+            self.members[key] *= factor
+        self._rebuild()
+
+    def top(self, limit: int) -> list:
+        return sorted(self.members.items(), key=lambda item: -item[1])[:limit]
+
+class Window:
+    def __init__(self, name: str, seconds: float, now: float = None):
+        self.name = name
+        self.seconds = seconds
+        self.sketches = {kind: DecayedCountMin(seconds, landmark=now) for kind in KINDS}
+        self.heavy = {kind: TopK() for kind in KINDS}
+
+    def _rescale_if_needed(self, kind: str, now: float):
+        # Reads need it too: after a long idle spell or an old snapshot,
+        # weight(now) alone would overflow
+        sketch = self.sketches[kind]
+        if sketch.needs_rescale(now):
+            self.heavy[kind].scale(sketch.rescale(now))
+
+    def merge(self, other: 'Window'):
+        """Add other's counts; heavy hitters of either side are re-ranked on the merged sketch"""
+        for kind in KINDS:
+            sketch, heavy = self.sketches[kind], self.heavy[kind]
+            other_sketch, other_heavy = other.sketches[kind], other.heavy[kind]
+            if other_sketch.landmark > sketch.landmark:
+                heavy.scale(sketch.rescale(other_sketch.landmark))
+            sketch.merge(other_sketch)
+            for key, label in {**other_heavy.labels, **heavy.labels}.items():
+                heavy.offer(key, sketch.estimate(key), label)
+
+    def add(self, kind: str, key: str, label: str, now: float):
+        self._rescale_if_needed(kind, now)
+        self.heavy[kind].offer(key, self.sketches[kind].add(key, now), label)
+
+    def top(self, kind: str, limit: int, now: float) -> list:
+        self._rescale_if_needed(kind, now)
+        sketch = self.sketches[kind]
+        heavy = self.heavy[kind]
+        return [
+            {"key": key, "text": heavy.labels[key], "score": round(sketch.to_decayed(value, now), 3)}
+            for key, value in heavy.top(limit)
+        ]
+
+class TrendingTracker:
+    def __init__(self, now: float = None):
+        now = time.time() if now is None else now
+        self.windows = {name: Window(name, seconds, now) for name, seconds in WINDOWS.items()}
+        # What this process recorded since its last sync, to be added to the shared file
+        self.pending = {name: Window(name, seconds, now) for name, seconds in WINDOWS.items()}
+        self.pending_submissions = 0
+        self.lock = threading.Lock()
+        self.submissions = 0
+        self.last_snapshot = now
+
+    def record(self, complaint: str, category: str, now: float = None):
+        """O(1) update of every window for one submission"""
+        now = time.time() if now is None else now
+        label = scrub_label(complaint)
+        key = complaint_key(label)
+        category = category_label(category)
+        with self.lock:
+            self.submissions += 1
+            self.pending_submissions += 1
+            for windows in (self.windows, self.pending):
+                for window in windows.values():
+                    if key:
+                        window.add('complaints', key, label, now)
+                    window.add('categories', category.lower(), category, now)
+
+    def top(self, window: str, kind: str = 'complaints', limit: int = 10, now: float = None) -> list:
+        now = time.time() if now is None else now
+        with self.lock:
+            return self.windows[window].top(kind, limit, now)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "version": 1,
+                "saved_at": time.time(),
+                "submissions": self.submissions,
+                "windows": {
+                    name: {
+                        kind: {
+                            "landmark": window.sketches[kind].landmark,
+                            "width": window.sketches[kind].width,
+                            "depth": window.sketches[kind].depth,
+                            "rows": base64.b64encode(zlib.compress(
+                                b''.join(row.tobytes() for row in window.sketches[kind].rows), 6
+                            )).decode('ascii'),
+                            "top": [
+                                [key, value, window.heavy[kind].labels[key]]
+                                for key, value in window.heavy[kind].members.items()
+                            ]
+                        }
+                        for kind in KINDS
+                    }
+                    for name, window in self.windows.items()
+                }
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TrendingTracker':
+        tracker = cls()
+        tracker.submissions = data.get("submissions", 0)
+        for name, kinds in data.get("windows", {}).items():
+            window = tracker.windows.get(name)
+            if window is None:
+                continue
+            for kind, state in kinds.items():
+                if kind not in KINDS or state["width"] != SKETCH_WIDTH or state["depth"] != SKETCH_DEPTH:
+                    continue
+                sketch = window.sketches[kind]
+                raw = zlib.decompress(base64.b64decode(state["rows"]))
+                row_bytes = 8 * sketch.width
+                for index in range(sketch.depth):
+                    sketch.rows[index] = array('d', raw[index * row_bytes:(index + 1) * row_bytes])
+                sketch.landmark = state["landmark"]
+                heavy = window.heavy[kind]
+                for key, value, label in state["top"]:
+                    # Snapshots from before labels were scrubbed may hold raw text
+                    if kind == 'categories' and key not in anger.CATEGORY_INDEX:
+                        continue
+                    heavy.members[key] = value
+                    heavy.labels[key] = scrub_label(label) if kind == 'complaints' else category_label(label)
+                heavy._rebuild()
+        return tracker
+
+    def save(self, path: str = SNAPSHOT_PATH):
+        """Write a snapshot atomically so readers never see a partial file"""
+        data = json.dumps(self.to_dict())
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.trending-')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self.last_snapshot = time.time()
+
+    def sync(self, path: str = SNAPSHOT_PATH):
+        """Add this process's pending counts to the snapshot file and adopt the merged view"""
+        with self.lock, _SnapshotLock(path):
+            merged = load(path)
+            if self.pending_submissions:
+                for name, window in merged.windows.items():
+                    window.merge(self.pending[name])
+                merged.submissions += self.pending_submissions
+                merged.save(path)
+            now = time.time()
+            self.windows = merged.windows
+            self.submissions = merged.submissions
+            self.pending = {name: Window(name, seconds, now) for name, seconds in WINDOWS.items()}
+            self.pending_submissions = 0
+            self.last_snapshot = now
+
+    def maybe_sync(self, path: str = SNAPSHOT_PATH):
+        if time.time() - self.last_snapshot >= SNAPSHOT_INTERVAL:
+            try:
+                self.sync(path)
+            except OSError as e:
+                # Pending counts are kept for the next attempt
+                print(f"Trending snapshot failed: {e}")
+                self.last_snapshot = time.time()
+
+class _SnapshotLock:
+    """Exclusive flock next to the snapshot, where the platform has one"""
+
+    def __init__(self, path: str):
+        self.path = path + '.lock'
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            self._file.close()
+
+def load(path: str = SNAPSHOT_PATH) -> TrendingTracker:
+    try:
+        with open(path) as f:
+            return TrendingTracker.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Ignoring unreadable trending snapshot: {e}")
+        return TrendingTracker()
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def _sync_forever(tracker: TrendingTracker):
+    while True:
+        time.sleep(max(1.0, SNAPSHOT_INTERVAL))
+        tracker.maybe_sync()
+
+def get_tracker() -> TrendingTracker:
+    """Process-wide tracker, warmed from the last snapshot on first use"""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = load()
+            # Counts recorded here reach the shared file even if no further request arrives
+            threading.Thread(target=_sync_forever, args=(_tracker,), name='trending-sync', daemon=True).start()
+        return _tracker
+
+def record_submission(complaint: str, category: str):
+    tracker = get_tracker()
+    tracker.record(complaint, category)
+    tracker.maybe_sync()
+
+metrics.register('trending', lambda: {
+    "submissions": _tracker.submissions if _tracker else 0,
+    "loaded": _tracker is not None
+})
@@ -0,0 +1,212 @@
+"""
+Token and cost accounting for OpenAI completions, plus adaptive max_tokens.
+
+Every completion's usage block is stored in a local SQLite database
+(WHINE_USAGE_DB, default: a file in the temp directory) with the endpoint,
+model, estimated cost and whether the answer was cut off at max_tokens.
+
+max_tokens_for() learns each endpoint's output lengths and asks for the
+p99 plus some headroom instead of the hard-coded ceiling, so requests stop
+reserving and waiting on tokens they never use. It falls back to the
+ceiling until enough samples exist, and while recent answers are being
+truncated more often than TRUNCATION_LIMIT.
+"""
+
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+from . import metrics
+
+DB_PATH = os.getenv('WHINE_USAGE_DB', os.path.join(tempfile.gettempdir(), 'whine-usage.sqlite3'))
+
+# USD per 1K tokens (prompt, completion), matched by longest model prefix
+PRICES = {
+    'gpt-4': (0.03, 0.06),
+    'gpt-4-32k': (0.06, 0.12),
+    'gpt-4-turbo': (0.01, 0.03),
+    'gpt-4o': (0.0025, 0.01),
+    'gpt-4o-mini': (0.00015, 0.0006),
+    'gpt-3.5-turbo': (0.0005, 0.0015)
+}
+
+WINDOW = 500
+MIN_SAMPLES = 50
+PERCENTILE = 0.99
+HEADROOM = 1.1
+MIN_MAX_TOKENS = 32
+TRUNCATION_LIMIT = 0.02
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completions (
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    max_tokens INTEGER,
+    truncated INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_endpoint_ts ON completions (endpoint, ts);
+CREATE INDEX IF NOT EXISTS completions_day ON completions (day);
+CREATE INDEX IF NOT EXISTS completions_ts ON completions (ts);
+"""
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    matches = [name for name in PRICES if (model or '').startswith(name)]
+    prompt_price, completion_price = PRICES[max(matches, key=len) if matches else 'gpt-4']
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+class UsageStore:
+    """SQLite-backed completion log; one connection per thread, WAL for concurrent writers"""
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            with self._schema_lock:
+                if not self._schema_ready:
+                    connection.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.connection = connection
+        return connection
+
+    def insert(self, row: tuple):
+        self.connection().execute(
+            'INSERT INTO completions (ts, day, endpoint, model, prompt_tokens, completion_tokens, cost, max_tokens, truncated) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            row
+        )
+
+    def recent(self, endpoint: str, limit: int = WINDOW) -> list:
+        """(completion_tokens, truncated) for the latest completions, oldest first"""
+        rows = self.connection().execute(
+            'SELECT completion_tokens, truncated FROM completions WHERE endpoint = ? ORDER BY ts DESC LIMIT ?',
+            (endpoint, limit)
+        ).fetchall()
+        return rows[::-1]
+
+    def spend_since(self, since: float) -> float:
+        row = self.connection().execute('SELECT COALESCE(SUM(cost), 0) FROM completions WHERE ts >= ?', (since,)).fetchone()
+        return row[0]
+
+    def endpoints(self) -> list:
+        return [row[0] for row in self.connection().execute('SELECT DISTINCT endpoint FROM completions').fetchall()]
+
+    def daily_report(self, day: str) -> list:
+        cursor = self.connection().execute(
+            'SELECT endpoint, model, COUNT(*), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost), '
+            'AVG(completion_tokens), MAX(completion_tokens), SUM(truncated), AVG(max_tokens) '
+            'FROM completions WHERE day = ? GROUP BY endpoint, model ORDER BY SUM(cost) DESC',
+            (day,)
+        )
+        columns = ('endpoint', 'model', 'completions', 'prompt_tokens', 'completion_tokens', 'cost',
+                   'avg_completion_tokens', 'max_completion_tokens', 'truncated', 'avg_max_tokens')
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+class LengthTracker:
+    """Recent completion lengths for one endpoint"""
+
+    def __init__(self, samples: list = ()):
+        self.lengths = deque(maxlen=WINDOW)
+        self.truncated = deque(maxlen=WINDOW)
+        for length, truncated in samples:
+            self.add(length, truncated)
+
+    def add(self, length: int, truncated: bool):
+        self.lengths.append(length)
+        self.truncated.append(1 if truncated else 0)
+
+    def limit(self, default: int) -> int:
+        if len(self.lengths) < MIN_SAMPLES:
+            return default
+        # Truncated lengths are censored at the old limit, so p99 would
+        # underestimate; widen back to the ceiling until answers fit again
+        if sum(self.truncated) / len(self.truncated) > TRUNCATION_LIMIT:
+            return default
+        ordered = sorted(self.lengths)
+        p99 = ordered[min(len(ordered) - 1, math.ceil(PERCENTILE * len(ordered)) - 1)]
+        return max(MIN_MAX_TOKENS, min(default, math.ceil(p99 * HEADROOM)))
+
+store = UsageStore()
+_trackers = {}
+_trackers_lock = threading.Lock()
+_counters = {"recorded": 0, "store_errors": 0}
+
+def _tracker(endpoint: str) -> LengthTracker:
+    with _trackers_lock:
+        tracker = _trackers.get(endpoint)
+    if tracker is not None:
+        return tracker
+    try:
+        samples = store.recent(endpoint)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Usage store unavailable: {e}")
+        _counters["store_errors"] += 1
+        samples = []
+    with _trackers_lock:
+        return _trackers.setdefault(endpoint, LengthTracker(samples))
+
+def max_tokens_for(endpoint: str, default: int) -> int:
+    """max_tokens to request for this endpoint, never above the hard-coded default"""
+    return _tracker(endpoint).limit(default)
+
+def warm() -> int:
+    """Load the length history of every endpoint seen so far; returns how many"""
+    endpoints = store.endpoints()
+    for endpoint in endpoints:
+        _tracker(endpoint)
+    return len(endpoints)
+
+def record(endpoint: str, response, max_tokens: int = None):
+    """Account for one chat completion response"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    choices = getattr(response, 'choices', None) or []
+    record_completion(endpoint, getattr(response, 'model', None), usage.prompt_tokens or 0, usage.completion_tokens or 0,
+                      bool(choices) and choices[0].finish_reason == 'length', max_tokens)
+
+def record_completion(endpoint: str, model: str, prompt_tokens: int, completion_tokens: int,
+                      truncated: bool, max_tokens: int = None):
+    """Account for one completion from its parts, e.g. the chunks of a stream"""
+    model = model or 'unknown'
+    _tracker(endpoint).add(completion_tokens, truncated)
+    _counters["recorded"] += 1
+
+    now = time.time()
+    day = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%d')
+    try:
+        store.insert((now, day, endpoint, model, prompt_tokens, completion_tokens,
+                      estimate_cost(model, prompt_tokens, completion_tokens), max_tokens, int(truncated)))
+    except (sqlite3.Error, OSError) as e:
+        print(f"Usage store write failed: {e}")
+        _counters["store_errors"] += 1
+
+def _stats() -> dict:
+    with _trackers_lock:
+        trackers = dict(_trackers)
+    return {
+        **_counters,
+        "samples": {endpoint: len(tracker.lengths) for endpoint, tracker in trackers.items()}
+    }
+
+metrics.register('usage', _stats)
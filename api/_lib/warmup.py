@@ -0,0 +1,127 @@
+"""
+Instance warmup, run by /api/warmup and by GET ?warmup=1 on the chat and
+complaint functions.
+
+Each step does the work a cold instance would otherwise do on a real
+user's request: importing the handlers, building the shared provider
+client, opening a keep-alive connection to the provider (a free
+models.list call; set OPENAI_BASE_URL to point it at a mock), and loading
+the screening model, trending snapshot, usage history and render
+templates from disk. Every step is timed. Steps are idempotent, so on a
+warm instance they finish in microseconds, which is the check that real
+requests skip them too.
+
+On Vercel every api/*.py file runs in its own instances, so a scheduled
+ping has to hit the function it should keep warm.
+
+The endpoints are public, so the steps that reach outside the instance
+(the provider round trip and the render worker pool) only run for requests
+carrying the operator token (WHINE_OPS_TOKEN in X-Whine-Token); anyone
+else gets the local steps and the readiness answer.
+"""
+
+import os
+import threading
+import time
+
+from . import metrics, provider, screen, trending, usage
+from .endpoints import endpoint_names, load_endpoint
+from .httpcache import send_json
+
+# Seconds allowed for the provider round trip
+CONNECT_TIMEOUT = float(os.getenv('WHINE_WARMUP_TIMEOUT', '5'))
+
+def import_handlers():
+    names = [name for name in endpoint_names() if name != 'warmup']
+    for name in names:
+        load_endpoint(name)
+    return len(names)
+
+def build_client():
+    return provider.get_client() is not None
+
+def open_connection():
+    client = provider.get_client()
+    if client is None:
+        return 'skipped: no OPENAI_API_KEY'
+    # with_options shares the connection pool, so the connection stays open for real requests
+    models = client.with_options(timeout=CONNECT_TIMEOUT, max_retries=0).models.list()
+    return len(models.data)
+
+def load_screen_model():
+    return screen.get_model() is not None
+
+def load_trending():
+    return trending.get_tracker().submissions
+
+def load_usage_history():
+    return usage.warm()
+
+def load_render_templates():
+    # Imported here so text-only functions that run other steps never load Pillow
+    from . import render
+    return render.warm()
+
+STEPS = [
+    ('import_handlers', import_handlers),
+    ('build_client', build_client),
+    ('open_connection', open_connection),
+    ('load_screen_model', load_screen_model),
+    ('load_trending', load_trending),
+    ('load_usage_history', load_usage_history),
+    ('load_render_templates', load_render_templates)
+]
+
+# What a single text-generating function needs: it has already imported itself
+FUNCTION_STEPS = ('build_client', 'open_connection', 'load_screen_model', 'load_trending', 'load_usage_history')
+
+# Steps that call the provider or start processes; operator token only
+OPERATOR_STEPS = ('open_connection', 'load_render_templates')
+
+_runs = 0
+_runs_lock = threading.Lock()
+_last = {}
+
+def run(names: tuple = None) -> dict:
+    """Run the named steps (default: all) and report how long each took"""
+    global _runs, _last
+    with _runs_lock:
+        _runs += 1
+        cold = _runs == 1
+
+    steps = []
+    started = time.perf_counter()
+    for name, step in STEPS:
+        if names is not None and name not in names:
+            continue
+        step_started = time.perf_counter()
+        entry = {"name": name}
+        try:
+            entry["result"] = step()
+        except Exception as e:
+            entry["error"] = str(e)
+        entry["ms"] = round((time.perf_counter() - step_started) * 1000, 3)
+        steps.append(entry)
+
+    report = {
+        "ready": not any("error" in entry for entry in steps),
+        "cold": cold,
+        "pid": os.getpid(),
+        "total_ms": round((time.perf_counter() - started) * 1000, 3),
+        "steps": steps
+    }
+    _last = report
+    return report
+
+def respond(handler, names: tuple = None, allow_methods: str = 'GET, OPTIONS'):
+    """Run the steps and answer with the report; 503 when a step failed"""
+    if not metrics.authorized(handler):
+        names = tuple(name for name, _ in STEPS
+                      if (names is None or name in names) and name not in OPERATOR_STEPS)
+    report = run(names)
+    send_json(handler, report, 200 if report["ready"] else 503, allow_methods, cache_control='no-store')
+
+def _stats() -> dict:
+    return {"runs": _runs, "last_total_ms": _last.get("total_ms"), "ready": _last.get("ready")}
+
+metrics.register('warmup', _stats)
@@ -0,0 +1,61 @@
+"""
+Vercel Serverless Function for Anger Analytics
+Reports complaint counts and average anger level per category, from
+rollups kept by complaint submissions. The rollups live in WHINE_ANGER_DB,
+so this needs the self-hosted server or a submit-complaint on the same
+instance; on Vercel this function normally sees no submissions.
+"""
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import anger
+from _lib.httpcache import send_json, send_uncached_json
+
+STATS_CACHE = 'public, max-age=30, s-maxage=60, stale-while-revalidate=300'
+
+def _int_param(params: dict, name: str):
+    value = params.get(name, [None])[0]
+    return None if value is None else int(value)
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        try:
+            days = _int_param(params, 'days')
+            hours = _int_param(params, 'hours')
+            minutes = _int_param(params, 'minutes')
+        except ValueError:
+            send_uncached_json(self, 400, {
+                "error": "days, hours and minutes must be whole numbers",
+                "success": False
+            }, allow_methods='GET, OPTIONS')
+            return
+
+        days = 7 if days is None else max(1, min(anger.DAY_SLOTS - 1, days))
+        response = {
+            "days": days,
+            "categories": anger.stats.totals_for_days(days),
+            "recorded": anger.stats.recorded,
+            "timestamp": datetime.now().isoformat(),
+            "success": True
+        }
+        if hours:
+            response["hourly"] = anger.stats.series('hour', hours)
+        if minutes:
+            response["minutely"] = anger.stats.series('minute', minutes)
+        send_json(self, response, allow_methods='GET, OPTIONS', cache_control=STATS_CACHE)
+        return
+
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
@@ -7,22 +7,24 @@ from http.server import BaseHTTPRequestHandler
 import json
 import os
 import random
+import re
+import sys
+import time
 from datetime import datetime
 try:
     import openai
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, budget, capture, profiling, provider, screen, usage
+from _lib.httpcache import send_json
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('battle-commentary')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -37,12 +39,13 @@ class handler(BaseHTTPRequestHandler):
                     "error": "Two complaints are required",
                     "success": False
                 }
-                self.wfile.write(json.dumps(response).encode())
+                send_json(self, response)
                 return
             
             # Generate battle commentary
             result = generate_battle_commentary(complaint1, complaint2)
-            self.wfile.write(json.dumps(result).encode())
+            send_json(self, result)
+            capture.record('battle-commentary', data, result, time.time() - started)
             return
             
         except Exception as e:
@@ -53,7 +56,7 @@ class handler(BaseHTTPRequestHandler):
                 "success": False,
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            send_json(self, error_response)
             return
     
     def do_OPTIONS(self):
@@ -65,16 +68,157 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
         return
 
-def generate_battle_commentary(complaint1: str, complaint2: str) -> dict:
-    """Generate sports announcer style commentary for complaint battles"""
+# Complaint categories used to pick matchup commentary. Brand names are
+# strong evidence (weight 3), generic words weak (weight 1).
+CATEGORY_KEYWORDS = {
+    'autocorrect': {'autocorrect': 3, 'autocomplete': 3, 'spellcheck': 3, 'correct': 1, 'typing': 2, 'keyboard': 2, 'typo': 2},
+    'voice_assistant': {'alexa': 3, 'siri': 3, 'google assistant': 3, 'cortana': 3, 'google': 1, 'assistant': 1, 'voice': 2, 'speaker': 2},
+    'chatbot': {'chatgpt': 3, 'gpt': 3, 'chatbot': 3, 'chat': 1, 'bot': 1},
+    'smart_home': {'thermostat': 3, 'fridge': 3, 'vacuum': 3, 'iot': 3, 'smart': 1, 'home': 1, 'device': 1},
+    'navigation': {'gps': 3, 'waze': 3, 'maps': 2, 'navigation': 3, 'directions': 2, 'route': 2}
+}
+
+# Fixed order shared by the classifier and the matchup table
+MATCHUP_CATEGORIES = list(CATEGORY_KEYWORDS) + ['general']
+CATEGORY_INDEX = {category: index for index, category in enumerate(MATCHUP_CATEGORIES)}
+
+# Every keyword in one alternation, longest first so 'autocorrect' wins over 'correct'.
+# Whole words only ('iot' is not in 'idiot', 'bot' not in 'robot'), plus plain suffixes
+_keyword_weights = {
+    keyword: (CATEGORY_INDEX[category], weight)
+    for category, keywords in CATEGORY_KEYWORDS.items()
+    for keyword, weight in keywords.items()
+}
+_keyword_pattern = re.compile(r'\b(%s)(?:s|es|ed|ing)?\b' % '|'.join(
+    re.escape(keyword) for keyword in sorted(_keyword_weights, key=len, reverse=True)
+))
+
+def classify_complaint(complaint: str) -> int:
+    """Return the index of the best scoring category in one pass over the text"""
+    scores = [0] * len(MATCHUP_CATEGORIES)
+    for match in _keyword_pattern.finditer(complaint.lower()):
+        index, weight = _keyword_weights[match.group(1)]
+        scores[index] += weight
+    best = max(range(len(scores)), key=scores.__getitem__)
+    return best if scores[best] else CATEGORY_INDEX['general']
+
+def get_category(complaint: str) -> str:
+    """Classify a complaint into one of MATCHUP_CATEGORIES"""
+    return MATCHUP_CATEGORIES[classify_complaint(complaint)]
+
+# How each category fights, used to compose matchups nobody wrote by hand
+FIGHTERS = {
+    'autocorrect': {
+        'name': 'Autocorrect', 'title': 'the silent assassin of the keyboard',
+        'move': 'a surprise word swap', 'damage': 'professional emails turned into comedy specials'
+    },
+    'voice_assistant': {
+        'name': 'Voice Assistant', 'title': 'loud, proud and permanently hard of hearing',
+        'move': 'a confidently misheard command', 'damage': "the neighbor's polka collection at full volume"
+    },
+    'chatbot': {
+        'name': 'Chatbot', 'title': 'the philosopher of wrong answers',
+        'move': 'a PhD-level hallucination', 'damage': 'existential dread delivered with total confidence'
+    },
+    'smart_home': {
+        'name': 'Smart Home', 'title': 'the leader of the appliance uprising',
+        'move': 'a surprise lockout', 'damage': 'actual physical consequences'
+    },
+    'navigation': {
+        'name': 'GPS', 'title': 'the navigator of nowhere',
+        'move': 'a confident left turn into a lake', 'damage': 'three bonus hours of scenic detours'
+    },
+    'general': {
+        'name': 'Mystery AI', 'title': 'the wildcard of digital disappointment',
+        'move': 'an unexplained malfunction', 'damage': 'pure, unfiltered chaos'
+    }
+}
+
+MATCHUP_TEMPLATES = [
+    "🥊 In the left corner, {a_name} - {a_title}! In the right corner, {b_name} - {b_title}! {a_name} opens with {a_move}, but {b_name} answers with {b_move}! What a match!",
+    "{a_upper} ENTERS THE RING armed with {a_damage}! But wait - {b_name} counters with {b_damage}! The referee is hiding behind the ropes!",
+    "Two titans of technological terror face off! {a_name}'s weapon: {a_move}. {b_name}'s weapon: {b_move}. Place your bets, folks!"
+]
+
+SAME_CATEGORY_TEMPLATES = [
+    "🔥 WE HAVE A {a_upper} VS {a_upper} SHOWDOWN! Two warriors from the same technological battlefield, but only one can claim the crown of ultimate AI failure!",
+    "It's a civil war in the {a_name} category! Brother against brother, failure against failure! This is what we call a classic grudge match!",
+    "The {a_name} division championship is ON! Both competitors know each other's weaknesses, making this a battle of pure dysfunction!"
+]
+
+GENERIC_TEMPLATES = [
+    "🚨 LADIES AND GENTLEMEN, welcome to the AI FAILURE THUNDERDOME! Two spectacular technological disasters enter, but only one can be crowned the ultimate digital disappointment!",
+    "The crowd goes WILD as we witness this clash of artificial unintelligence! Both competitors have trained their entire existence to let humans down!",
+    "🥊 In a stunning display of technological dysfunction, we have TWO heavyweight champions of chaos! The anticipation is killing me - almost as much as these AI failures are killing productivity!",
+    "THIS IS IT! The moment we've all been waiting for! Two legendary fails square off in the ultimate battle of who can disappoint humans more creatively!",
+    "🔥 THE BATTLE OF THE BOTS! One algorithm's trash is another algorithm's treasure, but today they're both just trash! What a magnificent display of digital disaster!"
+]
+
+# Hand-written classics per ordered pair: the first category is complaint 1, in the left corner
+SIGNATURE_MATCHUPS = {
+    ('autocorrect', 'voice_assistant'): [
+        "🥊 In the left corner, we have Autocorrect - the silent assassin that strikes when you least expect it! In the right corner, Voice Assistant - loud, proud, and completely misunderstands everything! This is going to be EPIC!",
+        "Ladies and gentlemen, autocorrect comes in swinging with precision stupidity, but voice assistant counters with confident wrongness! What a match!",
+        "The battle of the input methods! Autocorrect says 'I'll ruin your typing,' while Voice Assistant shouts 'Hold my digital beer!' The crowd is on their feet!"
+    ],
+    ('voice_assistant', 'autocorrect'): [
+        "🥊 In the left corner, we have Voice Assistant - loud, proud, and completely misunderstands everything! In the right corner, Autocorrect - the silent assassin that strikes when you least expect it! This is going to be EPIC!",
+        "Ladies and gentlemen, voice assistant comes in swinging with confident wrongness, but autocorrect counters with precision stupidity! What a match!",
+        "The battle of the input methods! Voice Assistant shouts 'Hold my digital beer!' while Autocorrect whispers 'I'll ruin your typing.' The crowd is on their feet!"
+    ],
+    ('chatbot', 'smart_home'): [
+        "🤖 CHATBOT ENTERS THE RING with philosophical confusion! But wait - Smart Home Device responds with physical world chaos! This is artificial intelligence vs. artificial intelligence in the ultimate showdown!",
+        "Chatbot throws a devastating 'I don't understand your question' while Smart Home counters with 'I've locked you out of your own house!' The referee is calling this match early!",
+        "Two titans of technological terror face off! Chatbot's weapon: existential dread. Smart Home's weapon: actual consequences. Place your bets, folks!"
+    ],
+    ('smart_home', 'chatbot'): [
+        "🏠 SMART HOME ENTERS THE RING with physical world chaos! But wait - Chatbot responds with philosophical confusion! This is artificial intelligence vs. artificial intelligence in the ultimate showdown!",
+        "Smart Home throws a devastating 'I've locked you out of your own house!' while Chatbot counters with 'I don't understand your question!' The referee is calling this match early!",
+        "Two titans of technological terror face off! Smart Home's weapon: actual consequences. Chatbot's weapon: existential dread. Place your bets, folks!"
+    ]
+}
+
+def _fighter_fields(prefix: str, category: str) -> dict:
+    fighter = FIGHTERS[category]
+    fields = {f"{prefix}_{key}": value for key, value in fighter.items()}
+    fields[f"{prefix}_upper"] = fighter['name'].upper()
+    return fields
+
+def build_matchup_table() -> list:
+    """
+    Precompute commentary templates for every ordered category pair.
+    table[i][j] covers the same matchup as table[j][i], with fighter names
+    in the order the complaints were entered.
+    """
+    size = len(MATCHUP_CATEGORIES)
+    table = [[None] * size for _ in range(size)]
+    for i, first in enumerate(MATCHUP_CATEGORIES):
+        for j, second in enumerate(MATCHUP_CATEGORIES):
+            fields = {**_fighter_fields('a', first), **_fighter_fields('b', second)}
+            if first == second:
+                templates = [template.format(**fields) for template in SAME_CATEGORY_TEMPLATES]
+            elif (first, second) in SIGNATURE_MATCHUPS:
+                templates = SIGNATURE_MATCHUPS[(first, second)]
+            else:
+                templates = [template.format(**fields) for template in MATCHUP_TEMPLATES]
+                if 'general' in (first, second):
+                    templates = templates + GENERIC_TEMPLATES
+            table[i][j] = templates
+    return table
+
+MATCHUP_TABLE = build_matchup_table()
+
+def generate_battle_commentary(complaint1: str, complaint2: str, caller: str = 'battle-commentary') -> dict:
+    """Generate sports announcer style commentary for complaint battles; caller picks the admission class"""
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('battle-commentary', complaint1, complaint2) and budget.allow(caller):
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
-            response = client.chat.completions.create(
+            max_tokens = usage.max_tokens_for('battle-commentary', 200)
+            response = admission.call(caller, client.chat.completions.create,
                 model="gpt-4",
                 messages=[
                     {
@@ -89,9 +233,10 @@ Make it sound like a wrestling match or boxing commentary."""
                         "content": f"Commentate on this battle:\nComplaint 1: {complaint1}\nComplaint 2: {complaint2}"
                     }
                 ],
-                max_tokens=200,
+                max_tokens=max_tokens,
                 temperature=0.9
             )
+            usage.record('battle-commentary', response, max_tokens)
             
             commentary = response.choices[0].message.content.strip()
             
@@ -99,7 +244,8 @@ Make it sound like a wrestling match or boxing commentary."""
                 "complaint1": complaint1,
                 "complaint2": complaint2,
                 "commentary": commentary,
-                "success": True
+                "success": True,
+                "provider": "openai"
             }
             
         except Exception as e:
@@ -111,63 +257,8 @@ Make it sound like a wrestling match or boxing commentary."""
 def get_fallback_commentary(complaint1: str, complaint2: str) -> dict:
     """Fallback commentary when OpenAI is unavailable"""
     
-    # Analyze complaint types for better commentary
-    c1_lower = complaint1.lower()
-    c2_lower = complaint2.lower()
-    
-    # Determine complaint categories
-    categories = {
-        'autocorrect': ['autocorrect', 'correct', 'typing', 'keyboard'],
-        'voice_assistant': ['alexa', 'siri', 'google', 'assistant', 'voice'],
-        'chatbot': ['gpt', 'chatgpt', 'chat', 'bot'],
-        'smart_home': ['smart', 'home', 'device', 'iot'],
-        'navigation': ['gps', 'maps', 'navigation', 'directions']
-    }
-    
-    def get_category(complaint):
-        for category, keywords in categories.items():
-            if any(keyword in complaint for keyword in keywords):
-                return category
-        return 'general'
-    
-    cat1 = get_category(c1_lower)
-    cat2 = get_category(c2_lower)
-    
-    # Category-specific commentary templates
-    commentary_templates = {
-        'autocorrect_vs_voice_assistant': [
-            "🥊 In the left corner, we have Autocorrect - the silent assassin that strikes when you least expect it! In the right corner, Voice Assistant - loud, proud, and completely misunderstands everything! This is going to be EPIC!",
-            "Ladies and gentlemen, autocorrect comes in swinging with precision stupidity, but voice assistant counters with confident wrongness! What a match!",
-            "The battle of the input methods! Autocorrect says 'I'll ruin your typing,' while Voice Assistant shouts 'Hold my digital beer!' The crowd is on their feet!"
-        ],
-        'chatbot_vs_smart_home': [
-            "🤖 CHATBOT ENTERS THE RING with philosophical confusion! But wait - Smart Home Device responds with physical world chaos! This is artificial intelligence vs. artificial intelligence in the ultimate showdown!",
-            "Chatbot throws a devastating 'I don't understand your question' while Smart Home counters with 'I've locked you out of your own house!' The referee is calling this match early!",
-            "Two titans of technological terror face off! Chatbot's weapon: existential dread. Smart Home's weapon: actual consequences. Place your bets, folks!"
-        ],
-        'same_category': [
-            f"🔥 WE HAVE A {cat1.upper()} VS {cat2.upper()} SHOWDOWN! Two warriors from the same technological battlefield, but only one can claim the crown of ultimate AI failure!",
-            f"It's a civil war in the {cat1} category! Brother against brother, failure against failure! This is what we call a classic grudge match!",
-            f"The {cat1} division championship is ON! Both competitors know each other's weaknesses, making this a battle of pure dysfunction!"
-        ]
-    }
-    
-    # Select appropriate template
-    if cat1 == 'autocorrect' and cat2 == 'voice_assistant':
-        templates = commentary_templates['autocorrect_vs_voice_assistant']
-    elif cat1 == 'chatbot' and cat2 == 'smart_home':
-        templates = commentary_templates['chatbot_vs_smart_home']
-    elif cat1 == cat2:
-        templates = commentary_templates['same_category']
-    else:
-        # Generic templates
-        templates = [
-            "🚨 LADIES AND GENTLEMEN, welcome to the AI FAILURE THUNDERDOME! Two spectacular technological disasters enter, but only one can be crowned the ultimate digital disappointment!",
-            "The crowd goes WILD as we witness this clash of artificial unintelligence! Both competitors have trained their entire existence to let humans down!",
-            "🥊 In a stunning display of technological dysfunction, we have TWO heavyweight champions of chaos! The anticipation is killing me - almost as much as these AI failures are killing productivity!",
-            "THIS IS IT! The moment we've all been waiting for! Two legendary fails square off in the ultimate battle of who can disappoint humans more creatively!",
-            "🔥 THE BATTLE OF THE BOTS! One algorithm's trash is another algorithm's treasure, but today they're both just trash! What a magnificent display of digital disaster!"
-        ]
+    # Look up the precomputed matchup for both complaint categories
+    templates = MATCHUP_TABLE[classify_complaint(complaint1)][classify_complaint(complaint2)]
     
     commentary = random.choice(templates)
     
@@ -185,5 +276,6 @@ def get_fallback_commentary(complaint1: str, complaint2: str) -> dict:
         "complaint1": complaint1,
         "complaint2": complaint2,
         "commentary": full_commentary,
-        "success": True
+        "success": True,
+        "provider": "fallback"
     }
\ No newline at end of file
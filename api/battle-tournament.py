@@ -0,0 +1,249 @@
+"""
+Vercel Serverless Function for Complaint Battle Tournaments
+Seeds N complaints into a bracket and commentates every match
+"""
+
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, capture, profiling
+from _lib.endpoints import load_endpoint
+from _lib.httpcache import send_json
+from _lib.lru import LRUCache
+from _lib.singleflight import SingleFlight, normalize_key
+
+battle = load_endpoint('battle-commentary')
+
+MAX_ENTRANTS = 64
+
+# Matches generated at once; a 64-entrant bracket has 32 first-round matches.
+# Never more than the admission slots: extra threads would only queue behind
+# the tournament's own calls and be shed by the short batch wait budget
+MAX_WORKERS = int(os.getenv('WHINE_TOURNAMENT_WORKERS', '32'))
+
+# Commentary keyed by the unordered pair and stored in the key's order; a
+# rematch in the other order gets the same text with the labels swapped
+commentary_cache = LRUCache('battle-pairs', max_entries=4096)
+pair_flight = SingleFlight('battle-pairs')
+
+ANGRY_WORDS = {
+    'hate', 'worst', 'never', 'again', 'useless', 'stupid', 'ruined', 'furious',
+    'seriously', 'always', 'terrible', 'awful', 'why', 'broke', 'destroyed'
+}
+
+# Categories with real-world consequences hit harder in the ring
+CATEGORY_WEIGHTS = {
+    'smart_home': 3.0,
+    'navigation': 3.0,
+    'voice_assistant': 2.0,
+    'chatbot': 2.0,
+    'autocorrect': 2.0,
+    'general': 1.0
+}
+
+_words = re.compile(r"[a-z']+")
+# "Complaint 1", "Contestant #2", "left corner": the parts of the text that depend on the order
+_labels = re.compile(r'\b(complaint|contestant|fighter|challenger)(\s*#?\s*)([12])\b|\b(left|right)(\s+corner)\b', re.I)
+
+class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('battle-tournament')
+    def do_POST(self):
+        try:
+            started = time.time()
+            
+            # Get request body
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            data = json.loads(post_data.decode('utf-8'))
+            
+            complaints = [
+                str(complaint).strip() for complaint in data.get('complaints', [])
+                if str(complaint).strip()
+            ]
+            
+            if len(complaints) < 2 or len(complaints) > MAX_ENTRANTS:
+                response = {
+                    "error": f"Between 2 and {MAX_ENTRANTS} complaints are required",
+                    "success": False
+                }
+                send_json(self, response)
+                return
+            
+            # Run the tournament
+            result = run_tournament(complaints)
+            send_json(self, result)
+            capture.record('battle-tournament', data, result, time.time() - started)
+            return
+            
+        except Exception as e:
+            error_response = {
+                "commentary": "The tournament arena has collapsed under the weight of so much AI disappointment! Please reboot the crowd and try again.",
+                "success": False,
+                "error": str(e)
+            }
+            send_json(self, error_response)
+            return
+    
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
+
+def score_complaint(complaint: str) -> dict:
+    """Cheap local power rating from anger, category and length"""
+    lowered = complaint.lower()
+    words = _words.findall(lowered)
+    letters = [c for c in complaint if c.isalpha()]
+    
+    caps_ratio = sum(1 for c in letters if c.isupper()) / len(letters) if letters else 0.0
+    anger = min(10.0,
+                min(complaint.count('!'), 5) * 0.8
+                + caps_ratio * 4.0
+                + sum(1 for word in words if word in ANGRY_WORDS) * 1.5)
+    category = battle.get_category(lowered)
+    length = min(len(words) / 8.0, 3.0)
+    
+    return {
+        "anger": round(anger, 2),
+        "category": category,
+        "score": round(anger + CATEGORY_WEIGHTS.get(category, 1.0) + length, 2)
+    }
+
+def bracket_order(size: int) -> list:
+    """Standard seeding positions for a power-of-two bracket (1 vs size, 2 vs size-1, ...)"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+def build_bracket(entrants: list) -> list:
+    """
+    Lay out every round. Winners are decided by the seeding score, so the whole
+    bracket is known before any commentary is generated.
+    """
+    size = 1
+    while size < len(entrants):
+        size *= 2
+    
+    by_seed = {entrant["seed"]: entrant for entrant in entrants}
+    slots = [by_seed.get(seed) for seed in bracket_order(size)]
+    
+    rounds = []
+    while len(slots) > 1:
+        matches = []
+        winners = []
+        for index in range(0, len(slots), 2):
+            first, second = slots[index], slots[index + 1]
+            if first is None or second is None:
+                winner = first or second
+                matches.append({"entrant1": first, "entrant2": second, "winner": winner, "bye": True})
+            else:
+                # Higher score wins, better seed breaks ties
+                winner = max(first, second, key=lambda e: (e["score"], -e["seed"]))
+                matches.append({"entrant1": first, "entrant2": second, "winner": winner, "bye": False})
+            winners.append(winner)
+        rounds.append(matches)
+        slots = winners
+    return rounds
+
+def pair_key(complaint1: str, complaint2: str) -> tuple:
+    """(cache key of the unordered pair, True when the call order is the reverse of the key's)"""
+    first, second = normalize_key(complaint1), normalize_key(complaint2)
+    if second < first:
+        return f"{second}\x1e{first}", True
+    return f"{first}\x1e{second}", False
+
+def swap_labels(commentary: str) -> str:
+    """Swap Complaint 1/2 and the left/right corner, keeping the capitalization"""
+    def swap(match):
+        if match.group(3):
+            return match.group(1) + match.group(2) + ('2' if match.group(3) == '1' else '1')
+        side = match.group(4)
+        other = 'right' if side.lower() == 'left' else 'left'
+        if side.isupper():
+            other = other.upper()
+        elif side[0].isupper():
+            other = other.capitalize()
+        return other + match.group(5)
+    return _labels.sub(swap, commentary)
+
+def get_match_commentary(complaint1: str, complaint2: str) -> tuple:
+    """Return (commentary, cached) for a pair, generating it at most once in either order"""
+    key, reversed_order = pair_key(complaint1, complaint2)
+    commentary = commentary_cache.get(key)
+    if commentary is not None:
+        return (swap_labels(commentary) if reversed_order else commentary), True
+    
+    def generate():
+        result = battle.generate_battle_commentary(complaint1, complaint2, caller='battle-tournament')
+        # Shared with waiters in either order, so hand it over in the key's order
+        commentary = swap_labels(result["commentary"]) if reversed_order else result["commentary"]
+        # Fallback text stands in for an outage or a shed call; don't pin it
+        if result.get("provider") == "openai":
+            commentary_cache.set(key, commentary)
+        return commentary
+    
+    commentary = pair_flight.do(key, generate)
+    return (swap_labels(commentary) if reversed_order else commentary), False
+
+def run_tournament(complaints: list) -> dict:
+    """Seed the complaints, lay out the bracket and commentate every match concurrently"""
+    started = time.time()
+    
+    scored = [dict(score_complaint(complaint), complaint=complaint) for complaint in complaints]
+    ranked = sorted(enumerate(scored), key=lambda item: (-item[1]["score"], item[0]))
+    entrants = [dict(entry, seed=seed) for seed, (_, entry) in enumerate(ranked, start=1)]
+    
+    rounds = build_bracket(entrants)
+    contested = [match for matches in rounds for match in matches if not match["bye"]]
+    
+    # Every match is independent once the bracket is fixed
+    workers = max(1, min(MAX_WORKERS, admission.LIMIT or MAX_WORKERS, len(contested)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(get_match_commentary, match["entrant1"]["complaint"], match["entrant2"]["complaint"])
+            for match in contested
+        ]
+        for match, future in zip(contested, futures):
+            match["commentary"], match["cached"] = future.result()
+    
+    result_rounds = []
+    for number, matches in enumerate(rounds, start=1):
+        result_rounds.append([
+            {
+                "round": number,
+                "match": index,
+                "seed1": match["entrant1"]["seed"] if match["entrant1"] else None,
+                "seed2": match["entrant2"]["seed"] if match["entrant2"] else None,
+                "complaint1": match["entrant1"]["complaint"] if match["entrant1"] else None,
+                "complaint2": match["entrant2"]["complaint"] if match["entrant2"] else None,
+                "winner": match["winner"]["seed"],
+                "bye": match["bye"],
+                "commentary": match.get("commentary"),
+                "cached": match.get("cached", False)
+            }
+            for index, match in enumerate(matches, start=1)
+        ])
+    
+    champion = rounds[-1][0]["winner"]
+    
+    return {
+        "entrants": entrants,
+        "rounds": result_rounds,
+        "champion": champion,
+        "matches": len(contested),
+        "cached_matches": sum(1 for match in contested if match["cached"]),
+        "response_time": round(time.time() - started, 3),
+        "success": True
+    }
@@ -1,28 +1,32 @@
 """
 Vercel Serverless Function for WhineBot
-Handles chat requests with OpenAI GPT integration
+Handles chat requests with OpenAI GPT integration. With "stream": true
+the reply is sent as newline-delimited JSON frames while it is generated,
+compressed incrementally when the client accepts an encoding.
 """
 
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
 import time
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
 try:
     import openai
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, budget, capture, profiling, provider, screen, usage, warmup
+from _lib.compression import StreamingWriter
+from _lib.httpcache import send_json, send_uncached_json
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('chat')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -39,12 +43,19 @@ class handler(BaseHTTPRequestHandler):
                     "response_time": 0,
                     "timestamp": datetime.now().isoformat()
                 }
-                self.wfile.write(json.dumps(response).encode('utf-8'))
+                send_json(self, response)
+                return
+            
+            if data.get('stream'):
+                result = self._stream_reply(message, conversation_id)
+                if result is not None:
+                    capture.record('chat', data, result, time.time() - started)
                 return
             
             # Get WhineBot response
             result = get_whinebot_response(message, conversation_id)
-            self.wfile.write(json.dumps(result).encode('utf-8'))
+            send_json(self, result)
+            capture.record('chat', data, result, time.time() - started)
             return
             
         except Exception as e:
@@ -55,21 +66,64 @@ class handler(BaseHTTPRequestHandler):
                 "timestamp": datetime.now().isoformat(),
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            send_json(self, error_response)
             return
     
+    def _stream_reply(self, message: str, conversation_id: str):
+        """Send token frames as they arrive, then the done frame; None if the client went away"""
+        headers = {'Access-Control-Allow-Origin': '*'}
+        try:
+            with StreamingWriter(self, 'application/x-ndjson', headers=headers) as writer:
+                def send_frame(frame: dict):
+                    writer.write((json.dumps(frame) + '\n').encode('utf-8'))
+                
+                try:
+                    result = get_whinebot_response(message, conversation_id,
+                                                   on_token=lambda piece: send_frame({"type": "token", "text": piece}))
+                except (BrokenPipeError, ConnectionResetError):
+                    raise
+                except Exception as e:
+                    if not writer.started:
+                        raise
+                    # The status line is already out; end the stream instead of sending a second response
+                    send_frame({"type": "error", "error": str(e)})
+                    return None
+                send_frame({"type": "done", **result})
+            return result
+        except (BrokenPipeError, ConnectionResetError):
+            return None
+    
+    def do_GET(self):
+        # Scheduled ?warmup=1 pings keep this function's own instances warm
+        if 'warmup' in parse_qs(urlsplit(self.path).query):
+            warmup.respond(self, warmup.FUNCTION_STEPS, allow_methods='GET, POST, OPTIONS')
+        else:
+            send_uncached_json(self, 405, {"error": "Use POST, or GET ?warmup=1"})
+        return
+    
     def do_OPTIONS(self):
         # Handle CORS preflight
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
         return
 
-def get_whinebot_response(message: str, conversation_id: str) -> dict:
-    """Get response from WhineBot with enhanced OpenAI integration"""
+def get_whinebot_response(message: str, conversation_id: str, history: list = None, on_token=None) -> dict:
+    """
+    Get response from WhineBot with enhanced OpenAI integration.
+    history is earlier turns as chat messages; with on_token the reply is
+    streamed and on_token is called with each piece as it arrives. If the
+    stream fails partway the fallback is not streamed after the pieces
+    already sent; the result has "replace": True instead.
+    """
     start_time = time.time()
+    sent = []
+    
+    def forward(piece: str):
+        sent.append(piece)
+        on_token(piece)
     
     system_prompt = """You are WhineBot, the world's most entertainingly sarcastic AI therapist specializing in AI failures.
 
@@ -98,23 +152,28 @@ Sample responses:
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('chat', message) and budget.allow('chat'):
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
-            response = client.chat.completions.create(
+            messages = [{"role": "system", "content": system_prompt}] + list(history or []) + [
+                {"role": "user", "content": message}
+            ]
+            max_tokens = usage.max_tokens_for('chat', 200)
+            options = dict(
                 model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": message}
-                ],
-                max_tokens=200,
+                messages=messages,
+                max_tokens=max_tokens,
                 temperature=0.9,
                 frequency_penalty=0.5,
                 presence_penalty=0.3
             )
-            
-            bot_response = response.choices[0].message.content.strip()
+            if on_token:
+                bot_response = admission.call('chat', stream_completion, client, options, forward)
+            else:
+                response = admission.call('chat', client.chat.completions.create, **options)
+                usage.record('chat', response, max_tokens)
+                bot_response = response.choices[0].message.content.strip()
             response_time = time.time() - start_time
             
             return {
@@ -130,13 +189,37 @@ Sample responses:
     # Fallback responses if API unavailable
     response_time = time.time() - start_time
     fallback_response = get_fallback_response(message)
+    if on_token and not sent:
+        on_token(fallback_response)
     
-    return {
+    result = {
         "response": fallback_response,
         "provider": "fallback",
         "response_time": round(response_time, 3),
         "timestamp": datetime.now().isoformat()
     }
+    if sent:
+        # The done frame carries the whole reply and replaces the partial text
+        result["replace"] = True
+    return result
+
+def stream_completion(client, options: dict, on_token) -> str:
+    """Stream a completion through on_token and return the whole text"""
+    stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **options)
+    pieces = []
+    model, finish_reason, stream_usage = None, None, None
+    for chunk in stream:
+        model = chunk.model or model
+        stream_usage = getattr(chunk, 'usage', None) or stream_usage
+        for choice in chunk.choices:
+            finish_reason = choice.finish_reason or finish_reason
+            if choice.delta and choice.delta.content:
+                pieces.append(choice.delta.content)
+                on_token(choice.delta.content)
+    if stream_usage is not None:
+        usage.record_completion('chat', model, stream_usage.prompt_tokens or 0, stream_usage.completion_tokens or 0,
+                                finish_reason == 'length', options['max_tokens'])
+    return ''.join(pieces).strip()
 
 def get_fallback_response(message: str) -> str:
     """Fallback responses when API is unavailable"""
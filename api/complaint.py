@@ -0,0 +1,76 @@
+"""
+Vercel Serverless Function for Complaint Permalink Pages
+Serves /complaint/<id> as a server-rendered page, rendered once and then
+answered from the on-disk page cache
+"""
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import complaints, permalink
+from _lib.httpcache import CACHEABLE_GET, etag_matches, send_not_modified, strong_etag, write_body
+
+NOT_FOUND_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8" />
+  <title>Complaint not found - Whine About AI</title>
+  <meta name="robots" content="noindex">
+</head>
+<body>
+  <p>This complaint has gone missing. Even our database is complaining. <a href="/">Back to Home</a></p>
+</body>
+</html>
+""".encode('utf-8')
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._serve_page(include_body=True)
+    
+    def do_HEAD(self):
+        self._serve_page(include_body=False)
+    
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.end_headers()
+        return
+    
+    def _send_not_found(self, include_body: bool):
+        self.send_response(404)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(NOT_FOUND_PAGE)))
+        self.send_header('Cache-Control', 'public, max-age=60')
+        self.end_headers()
+        if include_body:
+            self.wfile.write(NOT_FOUND_PAGE)
+    
+    def _serve_page(self, include_body: bool):
+        try:
+            query = parse_qs(urlsplit(self.path).query)
+            record = complaints.get(query.get('id', [''])[0].strip().lower())
+            
+            if record is None:
+                self._send_not_found(include_body)
+                return
+            
+            # The key covers the record's last update, so a 304 needs no rendering
+            etag = strong_etag(permalink.page_key(record))
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                send_not_modified(self, etag, CACHEABLE_GET)
+                return
+            
+            data, cache_status = permalink.cached_page(record)
+            write_body(self, 200, data, 'text/html; charset=utf-8',
+                       {'ETag': etag, 'Cache-Control': CACHEABLE_GET, 'X-Cache': cache_status},
+                       'GET, HEAD, OPTIONS', include_body)
+            
+        except Exception as e:
+            print(f"Permalink error: {e}")
+            self._send_not_found(include_body)
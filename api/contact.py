@@ -1,14 +1,23 @@
 import json
 import os
 import smtplib
+import sys
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 from http.server import BaseHTTPRequestHandler
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import capture, profiling
+from _lib.httpcache import send_json
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('contact')
     def do_POST(self):
         try:
+            started = time.time()
+            
             # Parse request data
             content_length = int(self.headers.get('Content-Length', 0))
             post_data = self.rfile.read(content_length)
@@ -23,12 +32,9 @@ class handler(BaseHTTPRequestHandler):
             
             # Validate required fields
             if not all([name, email, subject, message]):
-                self.send_response(400)
-                self.send_header('Content-Type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({
+                send_json(self, {
                     'error': 'All fields are required! Even our form validation has standards.'
-                }).encode())
+                }, 400)
                 return
             
             # Map frustration levels to fun descriptions
@@ -143,32 +149,23 @@ The irony levels are off the charts! 📊
             response_message = responses.get(subject, "Thanks for your submission! We'll respond when the AI overlords permit us to.")
             
             # Send success response
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
-            
-            self.wfile.write(json.dumps({
+            result = {
                 'success': True,
                 'message': response_message
-            }).encode())
+            }
+            send_json(self, result)
+            capture.record('contact', data, result, time.time() - started)
             
         except json.JSONDecodeError:
-            self.send_response(400)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            send_json(self, {
                 'error': 'Invalid JSON data. Even our form parser has AI problems!'
-            }).encode())
+            }, 400)
             
         except Exception as e:
             print(f"Contact form error: {str(e)}")
-            self.send_response(500)
-            self.send_header('Content-Type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps({
+            send_json(self, {
                 'error': 'Internal server error. Our contact form just had an existential crisis!'
-            }).encode())
+            }, 500)
     
     def do_OPTIONS(self):
         self.send_response(200)
@@ -7,22 +7,95 @@ from http.server import BaseHTTPRequestHandler
 import json
 import os
 import random
+import sys
+import threading
+import time
+from collections import deque
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
 try:
     import openai
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, budget, capture, complaints, jsonrepair, metrics, profiling, provider, render, screen, usage
+from _lib.singleflight import SingleFlight, normalize_key
+from _lib.httpcache import send_cacheable_json, send_json, send_uncached_json, stable_random
+
+# Identical complaints arriving together share one upstream call
+meme_flight = SingleFlight('create-meme')
+
+# Templates the frontend and renderer know; anything else renders as classic
+MEME_TYPES = (
+    'classic', 'drake_pointing', 'change_my_mind', 'distracted_boyfriend', 'surprised_pikachu',
+    'this_is_fine', 'brain_expansion', 'confident_but_wrong', 'monkey_puppet', 'galaxy_brain',
+    'ancient_aliens', 'success_kid', 'clown_makeup', 'two_buttons'
+)
+MEME_FIELDS = ('top_text', 'bottom_text', 'meme_type')
+MAX_TEXT_LENGTH = 120
+
+MEME_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "top_text": {"type": "string", "description": "Setup line, upper case"},
+        "bottom_text": {"type": "string", "description": "Punchline, upper case"},
+        "meme_type": {"type": "string", "enum": list(MEME_TYPES)}
+    },
+    "required": list(MEME_FIELDS),
+    "additionalProperties": False
+}
+
+# Strict schemas need a model with structured outputs (gpt-4o and later); gpt-4 still
+# gets the schema through the forced tool call and complete_meme checks the answer
+MEME_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "make_meme",
+        "description": "Create the meme for this complaint",
+        "parameters": MEME_SCHEMA,
+        "strict": os.getenv('WHINE_MEME_STRICT') == '1'
+    }
+}
+
+class MemeStats:
+    """How many provider calls ended up in the meme, and how long they took"""
+    
+    OUTCOMES = ('clean', 'repaired', 'wasted', 'failed')
+    
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.counts = dict.fromkeys(self.OUTCOMES, 0)
+    
+    def record(self, outcome: str, seconds: float):
+        with self._lock:
+            self.counts[outcome] += 1
+            self._latencies.append(seconds)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self.counts)
+        calls = sum(counts.values())
+        result = dict(counts, calls=calls)
+        # A call is wasted when none of its text reaches the user
+        result["wasted_rate"] = round((counts['wasted'] + counts['failed']) / calls, 4) if calls else 0.0
+        if latencies:
+            result["latency_ms"] = {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 1),
+                "p95": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 1)
+            }
+        return result
+
+meme_stats = MemeStats()
+metrics.register('create-meme', meme_stats.stats)
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('create-meme')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -36,12 +109,30 @@ class handler(BaseHTTPRequestHandler):
                     "error": "Complaint is required",
                     "success": False
                 }
-                self.wfile.write(json.dumps(response).encode())
+                send_json(self, response, allow_methods='GET, POST, OPTIONS')
                 return
             
             # Create meme
             result = create_meme_text(complaint)
-            self.wfile.write(json.dumps(result).encode())
+            result["share_card_url"] = render.share_card_url(complaint, 'meme', meme_card_text(result))
+            
+            # Optionally render the finished image server-side
+            if data.get('render') is True:
+                try:
+                    result["image"] = render.render_image(
+                        result.get("meme_type", "classic"),
+                        result.get("top_text", ""),
+                        result.get("bottom_text", ""),
+                        data.get('format', 'png')
+                    )
+                except Exception as e:
+                    result["render_error"] = str(e)
+            
+            send_json(self, result, allow_methods='GET, POST, OPTIONS')
+            capture.record('create-meme', data, result, time.time() - started)
+            if data.get('complaintId'):
+                complaints.attach(data['complaintId'], complaint, 'meme',
+                                  {key: result.get(key, '') for key in ('meme_type', 'top_text', 'bottom_text')})
             return
             
         except Exception as e:
@@ -53,65 +144,157 @@ class handler(BaseHTTPRequestHandler):
                 "success": False,
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            send_json(self, error_response, allow_methods='GET, POST, OPTIONS')
+            return
+    
+    def do_GET(self):
+        try:
+            started = time.time()
+            
+            # Cacheable form: /api/create-meme?complaint=...
+            query = parse_qs(urlsplit(self.path).query)
+            complaint = query.get('complaint', [''])[0].strip()
+            
+            if not complaint:
+                send_uncached_json(self, 400, {
+                    "error": "Complaint is required",
+                    "success": False
+                })
+                return
+            
+            # Create meme, seeded from the input so the edge caches one stable answer
+            result = create_meme_text(complaint, rng=stable_random(complaint))
+            result["share_card_url"] = render.share_card_url(complaint, 'meme', meme_card_text(result))
+            send_cacheable_json(self, result)
+            capture.record('create-meme', {"complaint": complaint}, result, time.time() - started, method='GET')
+            return
+            
+        except Exception as e:
+            send_uncached_json(self, 500, {
+                "error": str(e),
+                "success": False
+            })
             return
     
     def do_OPTIONS(self):
         # Handle CORS preflight
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
         return
 
-def create_meme_text(complaint: str) -> dict:
+def meme_card_text(meme: dict) -> str:
+    """The meme's caption as one line of share card text"""
+    return " ".join(part for part in (meme.get("top_text", ""), meme.get("bottom_text", "")) if part)
+
+def create_meme_text(complaint: str, rng=random) -> dict:
     """Generate meme-worthy text from complaints"""
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('create-meme', complaint) and budget.allow('create-meme'):
+        started = time.perf_counter()
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Convert complaints into viral meme format. Create:
+            def request_meme():
+                max_tokens = usage.max_tokens_for('create-meme', 100)
+                return admission.call('create-meme', stream_meme, client, {
+                    "model": "gpt-4",
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": f"""Convert complaints into viral meme format. Create:
 - Top text and bottom text for memes
 - Relatable format that others can share
 - Classic meme structures
 - Keep it punchy and shareable
 - Use meme language and style
 
-Return JSON with: {"top_text": "...", "bottom_text": "...", "meme_type": "..."}
-"""
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Turn this into meme text: {complaint}"
-                    }
-                ],
-                max_tokens=100,
-                temperature=0.8,
-                response_format={"type": "json_object"}
-            )
-            
-            meme_data = json.loads(response.choices[0].message.content)
-            meme_data["success"] = True
-            meme_data["original_complaint"] = complaint
+Call {MEME_TOOL["function"]["name"]} with the top text, bottom text and the meme template that fits best."""
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Turn this into meme text: {complaint}"
+                        }
+                    ],
+                    "max_tokens": max_tokens,
+                    "temperature": 0.8,
+                    "tools": [MEME_TOOL],
+                    "tool_choice": {"type": "function", "function": {"name": MEME_TOOL["function"]["name"]}}
+                })
             
-            return meme_data
+            # complete_meme builds a new dict, so waiters sharing the result don't see each other's fields
+            fields, repaired = meme_flight.do(normalize_key(complaint), request_meme)
+            meme_data, filled = complete_meme(fields, complaint, rng)
+            if meme_data is not None:
+                meme_stats.record('repaired' if repaired or filled else 'clean', time.perf_counter() - started)
+                meme_data["success"] = True
+                meme_data["original_complaint"] = complaint
+                meme_data["provider"] = "openai"
+                return meme_data
+            meme_stats.record('wasted', time.perf_counter() - started)
             
         except Exception as e:
+            meme_stats.record('failed', time.perf_counter() - started)
             print(f"OpenAI API error: {e}")
     
     # Fallback meme generation
-    return get_fallback_meme(complaint)
+    return get_fallback_meme(complaint, rng)
+
+def stream_meme(client, options: dict) -> tuple:
+    """Stream the meme tool call, parsing the arguments as they arrive; returns (fields, repaired)"""
+    stream = client.chat.completions.create(stream=True, stream_options={"include_usage": True}, **options)
+    parser = jsonrepair.IncrementalParser()
+    model, finish_reason, stream_usage = None, None, None
+    for chunk in stream:
+        model = chunk.model or model
+        stream_usage = getattr(chunk, 'usage', None) or stream_usage
+        for choice in chunk.choices:
+            finish_reason = choice.finish_reason or finish_reason
+            delta = choice.delta
+            if delta is None:
+                continue
+            # Models that answer in plain content instead of the tool call are parsed the same way
+            for tool_call in delta.tool_calls or ():
+                if tool_call.function and tool_call.function.arguments:
+                    parser.feed(tool_call.function.arguments)
+            if delta.content:
+                parser.feed(delta.content)
+    if stream_usage is not None:
+        usage.record_completion('create-meme', model, stream_usage.prompt_tokens or 0, stream_usage.completion_tokens or 0,
+                                finish_reason == 'length', options['max_tokens'])
+    fields = parser.value()
+    return (fields if isinstance(fields, dict) else {}), parser.repaired
+
+def complete_meme(fields: dict, complaint: str, rng=random) -> tuple:
+    """Check parsed fields against MEME_SCHEMA; returns (meme, fields filled in), meme None if no text survived"""
+    meme = {}
+    for field in ('top_text', 'bottom_text'):
+        value = fields.get(field)
+        if isinstance(value, str) and value.strip():
+            meme[field] = value.strip()[:MAX_TEXT_LENGTH]
+    if not meme:
+        return None, len(MEME_FIELDS)
+    
+    meme_type = fields.get('meme_type')
+    if isinstance(meme_type, str):
+        meme_type = meme_type.strip().lower().replace(' ', '_').replace('-', '_')
+        if meme_type in MEME_TYPES:
+            meme["meme_type"] = meme_type
+    
+    # Keep what the model wrote and borrow only the missing pieces
+    filled = len(MEME_FIELDS) - len(meme)
+    if 'top_text' not in meme or 'bottom_text' not in meme:
+        fallback = get_fallback_meme(complaint, rng)
+        meme.setdefault('top_text', fallback['top_text'])
+        meme.setdefault('bottom_text', fallback['bottom_text'])
+    meme.setdefault('meme_type', 'classic')
+    return meme, filled
 
-def get_fallback_meme(complaint: str) -> dict:
+def get_fallback_meme(complaint: str, rng=random) -> dict:
     """Fallback meme generation when OpenAI is unavailable"""
     
     complaint_lower = complaint.lower()
@@ -198,8 +381,9 @@ def get_fallback_meme(complaint: str) -> dict:
         ]
     
     # Select random template
-    selected_meme = random.choice(meme_templates)
+    selected_meme = rng.choice(meme_templates)
     selected_meme["success"] = True
     selected_meme["original_complaint"] = complaint
+    selected_meme["provider"] = "fallback"
     
     return selected_meme
\ No newline at end of file
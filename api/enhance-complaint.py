@@ -6,6 +6,7 @@ Enhances complaints using OpenAI to make them funnier and more shareable
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
 import time
 from datetime import datetime
 try:
@@ -13,16 +14,32 @@ try:
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, budget, capture, profiling, provider, render, screen, usage
+from _lib.httpcache import send_json
+from _lib.lru import LRUCache
+from _lib.singleflight import SingleFlight, normalize_key
+
+STYLE_PROMPTS = {
+    "sarcastic": "Make this complaint hilariously sarcastic while keeping the core frustration. Add witty observations and relatable metaphors.",
+    "dramatic": "Turn this complaint into an overly dramatic, theatrical piece. Make it sound like a Shakespearean tragedy about technology.",
+    "absurd": "Make this complaint completely absurd and over-the-top while keeping it relatable. Add unexpected comparisons.",
+    "professional": "Rewrite this complaint as if it's a professional email that's trying too hard to be polite about AI failures."
+}
+
+# Longest variant accepted from the all-styles completion
+MAX_ENHANCED_CHARS = 500
+
+# Variants from all-styles calls per (normalized text, style), so flipping styles
+# is local; single-style answers are not kept, so asking again gets a fresh take
+enhancement_cache = LRUCache('enhancements', max_entries=4096)
+all_styles_flight = SingleFlight('enhance-complaint-all')
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('enhance-complaint')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -31,18 +48,21 @@ class handler(BaseHTTPRequestHandler):
             
             text = data.get('text', '').strip()
             style = data.get('style', 'sarcastic')
+            all_styles = data.get('styles') == 'all'
             
             if not text:
                 response = {
                     "error": "Text is required",
                     "success": False
                 }
-                self.wfile.write(json.dumps(response).encode())
+                send_json(self, response)
                 return
             
             # Enhance complaint
-            result = enhance_complaint(text, style)
-            self.wfile.write(json.dumps(result).encode())
+            result = enhance_all_styles(text, style) if all_styles else enhance_complaint(text, style)
+            result["share_card_url"] = render.share_card_url(text, 'enhanced', result["enhanced"])
+            send_json(self, result)
+            capture.record('enhance-complaint', data, result, time.time() - started)
             return
             
         except Exception as e:
@@ -53,7 +73,7 @@ class handler(BaseHTTPRequestHandler):
                 "success": False,
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            send_json(self, error_response)
             return
     
     def do_OPTIONS(self):
@@ -68,22 +88,30 @@ class handler(BaseHTTPRequestHandler):
 def enhance_complaint(text: str, style: str = "sarcastic") -> dict:
     """Enhance complaints to make them funnier and more shareable"""
     
-    styles = {
-        "sarcastic": "Make this complaint hilariously sarcastic while keeping the core frustration. Add witty observations and relatable metaphors.",
-        "dramatic": "Turn this complaint into an overly dramatic, theatrical piece. Make it sound like a Shakespearean tragedy about technology.",
-        "absurd": "Make this complaint completely absurd and over-the-top while keeping it relatable. Add unexpected comparisons.",
-        "professional": "Rewrite this complaint as if it's a professional email that's trying too hard to be polite about AI failures."
-    }
+    if style not in STYLE_PROMPTS:
+        style = "sarcastic"
+    style_prompt = STYLE_PROMPTS[style]
     
-    style_prompt = styles.get(style, styles["sarcastic"])
+    # A previous all-styles call may already have this one
+    cached = enhancement_cache.get((normalize_key(text), style))
+    if cached:
+        return {
+            "original": text,
+            "enhanced": cached,
+            "style": style,
+            "cached": True,
+            "success": True,
+            "provider": "openai"
+        }
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('enhance-complaint', text) and budget.allow('enhance-complaint'):
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
-            response = client.chat.completions.create(
+            max_tokens = usage.max_tokens_for('enhance-complaint', 150)
+            response = admission.call('enhance-complaint', client.chat.completions.create,
                 model="gpt-4",
                 messages=[
                     {
@@ -102,9 +130,10 @@ def enhance_complaint(text: str, style: str = "sarcastic") -> dict:
                         "content": f"Original complaint: {text}"
                     }
                 ],
-                max_tokens=150,
+                max_tokens=max_tokens,
                 temperature=0.8
             )
+            usage.record('enhance-complaint', response, max_tokens)
             
             enhanced_text = response.choices[0].message.content.strip()
             
@@ -112,7 +141,8 @@ def enhance_complaint(text: str, style: str = "sarcastic") -> dict:
                 "original": text,
                 "enhanced": enhanced_text,
                 "style": style,
-                "success": True
+                "success": True,
+                "provider": "openai"
             }
             
         except Exception as e:
@@ -121,6 +151,91 @@ def enhance_complaint(text: str, style: str = "sarcastic") -> dict:
     # Fallback enhancement
     return get_fallback_enhancement(text, style)
 
+def parse_all_styles(content: str) -> dict:
+    """Keep the well-formed variants from an all-styles JSON completion"""
+    data = json.loads(content)
+    if not isinstance(data, dict):
+        raise ValueError("expected a JSON object")
+    variants = {}
+    for style in STYLE_PROMPTS:
+        value = data.get(style)
+        if isinstance(value, str) and value.strip() and len(value.strip()) <= MAX_ENHANCED_CHARS:
+            variants[style] = value.strip()
+    return variants
+
+def enhance_all_styles(text: str, style: str = "sarcastic") -> dict:
+    """Enhance a complaint in every style with one completion, caching each variant"""
+    
+    if style not in STYLE_PROMPTS:
+        style = "sarcastic"
+    key = normalize_key(text)
+    enhancements = {}
+    for name in STYLE_PROMPTS:
+        cached = enhancement_cache.get((key, name))
+        if cached:
+            enhancements[name] = cached
+    
+    # Try OpenAI for whatever the cache doesn't have
+    api_key = os.getenv('OPENAI_API_KEY')
+    if len(enhancements) < len(STYLE_PROMPTS) and api_key and openai and screen.allow('enhance-complaint', text) and budget.allow('enhance-complaint'):
+        try:
+            client = provider.get_client(api_key)
+            
+            def request_all_styles():
+                instructions = "\n".join(f'- "{name}": {prompt}' for name, prompt in STYLE_PROMPTS.items())
+                max_tokens = usage.max_tokens_for('enhance-complaint-all', 600)
+                response = admission.call('enhance-complaint', client.chat.completions.create,
+                    model="gpt-4",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": f"""You are a comedy writer specializing in AI failures. Rewrite the complaint once in each of these styles:
+{instructions}
+
+Rules:
+- Keep each version under 280 characters for shareability
+- Make it funnier than the original
+- Don't lose the core frustration
+- Add a unexpected twist or punchline
+- Make it relatable to others
+
+Return JSON with exactly these keys: {{"sarcastic": "...", "dramatic": "...", "absurd": "...", "professional": "..."}}"""
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Original complaint: {text}"
+                        }
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=0.8,
+                    response_format={"type": "json_object"}
+                )
+                usage.record('enhance-complaint-all', response, max_tokens)
+                
+                return parse_all_styles(response.choices[0].message.content)
+            
+            for name, enhanced_text in all_styles_flight.do(key, request_all_styles).items():
+                enhancement_cache.set((key, name), enhanced_text)
+                enhancements.setdefault(name, enhanced_text)
+            
+        except Exception as e:
+            print(f"OpenAI API error: {e}")
+    
+    # Fill any style the model skipped or mangled locally, without caching it
+    from_model = set(enhancements)
+    for name in STYLE_PROMPTS:
+        if name not in enhancements:
+            enhancements[name] = get_fallback_enhancement(text, name)["enhanced"]
+    
+    return {
+        "original": text,
+        "enhanced": enhancements[style],
+        "style": style,
+        "enhancements": enhancements,
+        "success": True,
+        "provider": "openai" if style in from_model else "fallback"
+    }
+
 def get_fallback_enhancement(text: str, style: str) -> dict:
     """Fallback enhancement when OpenAI is unavailable"""
     import random
@@ -155,5 +270,6 @@ def get_fallback_enhancement(text: str, style: str) -> dict:
         "original": text,
         "enhanced": enhanced,
         "style": style,
-        "success": True
+        "success": True,
+        "provider": "fallback"
     }
\ No newline at end of file
@@ -7,22 +7,28 @@ from http.server import BaseHTTPRequestHandler
 import json
 import os
 import random
+import sys
+import time
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
 try:
     import openai
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, budget, capture, complaints, profiling, provider, render, screen, usage
+from _lib.singleflight import SingleFlight, normalize_key
+from _lib.httpcache import send_cacheable_json, send_json, send_uncached_json, stable_random
+
+# Identical complaints arriving together share one upstream call
+comeback_flight = SingleFlight('generate-comeback')
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('generate-comeback')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -36,12 +42,16 @@ class handler(BaseHTTPRequestHandler):
                     "error": "Complaint is required",
                     "success": False
                 }
-                self.wfile.write(json.dumps(response).encode())
+                send_json(self, response, allow_methods='GET, POST, OPTIONS')
                 return
             
             # Generate comeback
             result = generate_comeback(complaint)
-            self.wfile.write(json.dumps(result).encode())
+            result["share_card_url"] = render.share_card_url(complaint, 'comeback', result["comeback"])
+            send_json(self, result, allow_methods='GET, POST, OPTIONS')
+            capture.record('generate-comeback', data, result, time.time() - started)
+            if data.get('complaintId'):
+                complaints.attach(data['complaintId'], complaint, 'comeback', result["comeback"])
             return
             
         except Exception as e:
@@ -51,33 +61,64 @@ class handler(BaseHTTPRequestHandler):
                 "success": False,
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            send_json(self, error_response, allow_methods='GET, POST, OPTIONS')
+            return
+    
+    def do_GET(self):
+        try:
+            started = time.time()
+            
+            # Cacheable form: /api/generate-comeback?complaint=...
+            query = parse_qs(urlsplit(self.path).query)
+            complaint = query.get('complaint', [''])[0].strip()
+            
+            if not complaint:
+                send_uncached_json(self, 400, {
+                    "error": "Complaint is required",
+                    "success": False
+                })
+                return
+            
+            # Generate comeback, seeded from the input so the edge caches one stable answer
+            result = generate_comeback(complaint, rng=stable_random(complaint))
+            result["share_card_url"] = render.share_card_url(complaint, 'comeback', result["comeback"])
+            send_cacheable_json(self, result)
+            capture.record('generate-comeback', {"complaint": complaint}, result, time.time() - started, method='GET')
+            return
+            
+        except Exception as e:
+            send_uncached_json(self, 500, {
+                "error": str(e),
+                "success": False
+            })
             return
     
     def do_OPTIONS(self):
         # Handle CORS preflight
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
         return
 
-def generate_comeback(complaint: str) -> dict:
+def generate_comeback(complaint: str, rng=random) -> dict:
     """Generate perfect comebacks for AI failures"""
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('generate-comeback', complaint) and budget.allow('generate-comeback'):
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """You create perfect comebacks and responses to AI failures. These should be:
+            def request_comeback():
+                max_tokens = usage.max_tokens_for('generate-comeback', 100)
+                response = admission.call('generate-comeback', client.chat.completions.create,
+                    model="gpt-4",
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": """You create perfect comebacks and responses to AI failures. These should be:
 - Witty one-liners people wish they had said
 - Shareable on social media
 - Clever observations about the AI failure
@@ -88,31 +129,35 @@ Examples:
 - For autocorrect fails: "Thanks autocorrect, you've turned my professional email into a comedy show nobody asked for."
 - For smart speakers: "Alexa, I asked for the weather, not an existential crisis about whether rain has feelings."
 """
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Generate a perfect comeback for this AI failure: {complaint}"
-                    }
-                ],
-                max_tokens=100,
-                temperature=0.8
-            )
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Generate a perfect comeback for this AI failure: {complaint}"
+                        }
+                    ],
+                    max_tokens=max_tokens,
+                    temperature=0.8
+                )
+                usage.record('generate-comeback', response, max_tokens)
+            
+                return response.choices[0].message.content.strip()
             
-            comeback = response.choices[0].message.content.strip()
+            comeback = comeback_flight.do(normalize_key(complaint), request_comeback)
             
             return {
                 "complaint": complaint,
                 "comeback": comeback,
-                "success": True
+                "success": True,
+                "provider": "openai"
             }
             
         except Exception as e:
             print(f"OpenAI API error: {e}")
     
     # Fallback comebacks
-    return get_fallback_comeback(complaint)
+    return get_fallback_comeback(complaint, rng)
 
-def get_fallback_comeback(complaint: str) -> dict:
+def get_fallback_comeback(complaint: str, rng=random) -> dict:
     """Fallback comebacks when OpenAI is unavailable"""
     
     complaint_lower = complaint.lower()
@@ -157,6 +202,7 @@ def get_fallback_comeback(complaint: str) -> dict:
     
     return {
         "complaint": complaint,
-        "comeback": random.choice(comebacks),
-        "success": True
+        "comeback": rng.choice(comebacks),
+        "success": True,
+        "provider": "fallback"
     }
\ No newline at end of file
@@ -0,0 +1,42 @@
+"""
+Vercel Serverless Function for Runtime Metrics
+Reports in-process counters such as single-flight collapse rates.
+Counters are per process, so this is meant for the self-hosted server;
+on Vercel it only sees its own function's instance. Requires the
+WHINE_OPS_TOKEN operator token.
+"""
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import metrics
+from _lib.httpcache import send_json, send_uncached_json
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if not metrics.authorized(self):
+            if metrics.TOKEN:
+                send_uncached_json(self, 403, {"error": f"Missing or wrong {metrics.HEADER} header"}, 'GET, OPTIONS')
+            else:
+                send_uncached_json(self, 404, {"error": "Metrics are disabled; set WHINE_OPS_TOKEN"}, 'GET, OPTIONS')
+            return
+        
+        response = {
+            "metrics": metrics.snapshot(),
+            "pid": os.getpid(),
+            "timestamp": datetime.now().isoformat()
+        }
+        send_json(self, response, allow_methods='GET, OPTIONS', cache_control='no-store')
+        return
+
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', f'Content-Type, {metrics.HEADER}')
+        self.end_headers()
+        return
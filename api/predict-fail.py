@@ -6,23 +6,25 @@ Predicts what AI will mess up next in given scenarios
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
+import time
 import random
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
 try:
     import openai
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, budget, capture, complaints, profiling, provider, render, screen, usage
+from _lib.httpcache import send_cacheable_json, send_json, send_uncached_json, stable_random
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('predict-fail')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -36,12 +38,17 @@ class handler(BaseHTTPRequestHandler):
                     "error": "Scenario is required",
                     "success": False
                 }
-                self.wfile.write(json.dumps(response).encode())
+                send_json(self, response, allow_methods='GET, POST, OPTIONS')
                 return
             
             # Predict AI fail
             result = predict_ai_fail(scenario)
-            self.wfile.write(json.dumps(result).encode())
+            result["share_card_url"] = render.share_card_url(scenario, 'prediction', result["prediction"])
+            send_json(self, result, allow_methods='GET, POST, OPTIONS')
+            capture.record('predict-fail', data, result, time.time() - started)
+            if data.get('complaintId'):
+                complaints.attach(data['complaintId'], scenario, 'prediction',
+                                  {"prediction": result["prediction"], "confidence": result["confidence"]})
             return
             
         except Exception as e:
@@ -52,28 +59,58 @@ class handler(BaseHTTPRequestHandler):
                 "success": False,
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode())
+            send_json(self, error_response, allow_methods='GET, POST, OPTIONS')
+            return
+    
+    def do_GET(self):
+        try:
+            started = time.time()
+            
+            # Cacheable form: /api/predict-fail?scenario=...
+            query = parse_qs(urlsplit(self.path).query)
+            scenario = query.get('scenario', [''])[0].strip()
+            
+            if not scenario:
+                send_uncached_json(self, 400, {
+                    "error": "Scenario is required",
+                    "success": False
+                })
+                return
+            
+            # Predict AI fail, seeded from the input so the edge caches one stable answer
+            result = predict_ai_fail(scenario, rng=stable_random(scenario))
+            result["share_card_url"] = render.share_card_url(scenario, 'prediction', result["prediction"])
+            send_cacheable_json(self, result)
+            capture.record('predict-fail', {"scenario": scenario}, result, time.time() - started, method='GET')
+            return
+            
+        except Exception as e:
+            send_uncached_json(self, 500, {
+                "error": str(e),
+                "success": False
+            })
             return
     
     def do_OPTIONS(self):
         # Handle CORS preflight
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
         return
 
-def predict_ai_fail(scenario: str) -> dict:
+def predict_ai_fail(scenario: str, rng=random) -> dict:
     """Predict what AI will probably screw up next"""
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('predict-fail', scenario) and budget.allow('predict-fail'):
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
-            response = client.chat.completions.create(
+            max_tokens = usage.max_tokens_for('predict-fail', 150)
+            response = admission.call('predict-fail', client.chat.completions.create,
                 model="gpt-4",
                 messages=[
                     {
@@ -93,26 +130,28 @@ Rules:
                         "content": f"Predict what AI will probably mess up in this scenario: {scenario}"
                     }
                 ],
-                max_tokens=150,
+                max_tokens=max_tokens,
                 temperature=0.9
             )
+            usage.record('predict-fail', response, max_tokens)
             
             prediction = response.choices[0].message.content.strip()
             
             return {
                 "scenario": scenario,
                 "prediction": prediction,
-                "confidence": random.randint(87, 99),  # Fake confidence for humor
-                "success": True
+                "confidence": rng.randint(87, 99),  # Fake confidence for humor
+                "success": True,
+                "provider": "openai"
             }
             
         except Exception as e:
             print(f"OpenAI API error: {e}")
     
     # Fallback predictions
-    return get_fallback_prediction(scenario)
+    return get_fallback_prediction(scenario, rng)
 
-def get_fallback_prediction(scenario: str) -> dict:
+def get_fallback_prediction(scenario: str, rng=random) -> dict:
     """Fallback predictions when OpenAI is unavailable"""
     
     # Context-aware fallbacks
@@ -149,7 +188,8 @@ def get_fallback_prediction(scenario: str) -> dict:
     
     return {
         "scenario": scenario,
-        "prediction": random.choice(predictions),
-        "confidence": random.randint(85, 95),
-        "success": True
+        "prediction": rng.choice(predictions),
+        "confidence": rng.randint(85, 95),
+        "success": True,
+        "provider": "fallback"
     }
\ No newline at end of file
@@ -0,0 +1,113 @@
+"""
+Vercel Serverless Function for Dynamic Share Cards
+Renders a per-result Open Graph image (complaint plus comeback, prediction
+or enhanced text) on top of the site share image. Parameters must carry
+the HMAC signature from render.share_card_url(), so only texts this site
+produced are rendered.
+"""
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+import tempfile
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import render
+from _lib.diskcache import DiskLRU
+from _lib.httpcache import etag_matches, send_json, strong_etag
+
+MAX_COMPLAINT_LENGTH = 280
+MAX_TEXT_LENGTH = 400
+
+# Rendered cards survive across warm invocations and are shared by processes
+card_cache = DiskLRU(
+    'share-cards',
+    os.getenv('WHINE_SHARE_CARD_DIR', os.path.join(tempfile.gettempdir(), 'whine-share-cards')),
+    int(os.getenv('WHINE_SHARE_CARD_MAX_BYTES', str(256 * 1024 * 1024))),
+    suffix='.jpg'
+)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# URLs without the current renderer version may change when the layout does
+UNPINNED = 'public, max-age=3600, s-maxage=86400'
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._serve_card(include_body=True)
+    
+    def do_HEAD(self):
+        self._serve_card(include_body=False)
+    
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.end_headers()
+        return
+    
+    def _send_error_json(self, status: int, message: str):
+        send_json(self, {"error": message, "success": False}, status, allow_methods='GET, HEAD, OPTIONS')
+    
+    def _serve_card(self, include_body: bool):
+        try:
+            query = parse_qs(urlsplit(self.path).query)
+            raw_complaint = query.get('complaint', [''])[0]
+            raw_kind = query.get('kind', ['comeback'])[0]
+            raw_text = query.get('text', [''])[0]
+            complaint = raw_complaint.strip()[:MAX_COMPLAINT_LENGTH]
+            kind = raw_kind.strip().lower()
+            text = raw_text.strip()[:MAX_TEXT_LENGTH]
+            version = query.get('v', [''])[0]
+            
+            if not complaint:
+                self._send_error_json(400, "A complaint is required for a share card")
+                return
+            
+            if render.SHARE_CARD_SECRET and not render.valid_share_card_signature(
+                    raw_complaint, raw_kind, raw_text, query.get('sig', [''])[0]):
+                self._send_error_json(403, "Share cards are only rendered for signed URLs")
+                return
+            
+            if not render.available() or not render.SHARE_CARD_SECRET:
+                # Crawlers still get the generic preview
+                self.send_response(307)
+                self.send_header('Location', render.STATIC_SHARE_IMAGE)
+                self.send_header('Cache-Control', 'public, max-age=300')
+                self.end_headers()
+                return
+            
+            key = render.share_card_key(complaint, kind, text)
+            etag = strong_etag(key)
+            cache_control = IMMUTABLE if version == str(render.RENDER_VERSION) else UNPINNED
+            
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', cache_control)
+                self.end_headers()
+                return
+            
+            data = card_cache.get(key)
+            cache_status = 'HIT'
+            if data is None:
+                cache_status = 'MISS'
+                data = render.run_render(render.render_share_card, complaint, kind, text)
+                card_cache.set(key, data)
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+            self.send_header('Content-Length', str(len(data)))
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('X-Cache', cache_status)
+            self.end_headers()
+            if include_body:
+                self.wfile.write(data)
+            
+        except Exception as e:
+            print(f"Share card error: {e}")
+            self._send_error_json(500, "Our share card printer jammed. Even the pixels are complaining!")
@@ -0,0 +1,53 @@
+"""
+Vercel Serverless Function for the Sitemap
+Serves /sitemap.xml (the index) and /sitemaps/complaints-NNNNN.xml shards,
+which submit-complaint keeps up to date
+"""
+
+from http.server import BaseHTTPRequestHandler
+import hashlib
+import os
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import sitemap
+from _lib.httpcache import send_cacheable_body, send_uncached_json, strong_etag
+
+# Crawlers fetch sitemaps rarely; the CDN may hold one for an hour
+SITEMAP_CACHE = 'public, max-age=0, s-maxage=3600'
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self._serve_sitemap(include_body=True)
+    
+    def do_HEAD(self):
+        self._serve_sitemap(include_body=False)
+    
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, HEAD, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.end_headers()
+        return
+    
+    def _serve_sitemap(self, include_body: bool):
+        try:
+            query = parse_qs(urlsplit(self.path).query)
+            shard = query.get('shard', [''])[0].strip()
+            
+            data = sitemap.shard(shard) if shard else sitemap.index()
+            if data is None:
+                send_uncached_json(self, 404, {"error": "Unknown sitemap", "success": False},
+                                   allow_methods='GET, HEAD, OPTIONS')
+                return
+            
+            etag = strong_etag(hashlib.sha256(data).hexdigest()[:32])
+            send_cacheable_body(self, data, 'application/xml; charset=utf-8', etag, SITEMAP_CACHE, include_body)
+            
+        except Exception as e:
+            print(f"Sitemap error: {e}")
+            send_uncached_json(self, 500, {"error": "Our sitemap got lost. Ironic, we know.", "success": False},
+                               allow_methods='GET, HEAD, OPTIONS')
@@ -6,23 +6,24 @@ Generates witty AI responses to user complaints
 from http.server import BaseHTTPRequestHandler
 import json
 import os
+import sys
 import time
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
 try:
     import openai
 except ImportError:
     openai = None
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import admission, anger, budget, capture, complaints, profiling, provider, screen, sitemap, trending, usage, warmup
+from _lib.httpcache import send_json, send_uncached_json
+
 class handler(BaseHTTPRequestHandler):
+    @profiling.profiled('submit-complaint')
     def do_POST(self):
         try:
-            # Handle CORS
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
-            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
-            self.end_headers()
+            started = time.time()
             
             # Get request body
             content_length = int(self.headers['Content-Length'])
@@ -38,12 +39,26 @@ class handler(BaseHTTPRequestHandler):
                     "response": "Did you forget to actually complain? That's so human of you! 🙄",
                     "success": False
                 }
-                self.wfile.write(json.dumps(response).encode('utf-8'))
+                send_json(self, response)
                 return
             
             # Get witty response
             result = get_complaint_response(complaint, category, anger_level)
-            self.wfile.write(json.dumps(result).encode('utf-8'))
+            
+            # Spam gets its answer but no public permalink page and no place in trending
+            allowed = screen.check(complaint).allowed
+            saved = complaints.save(category, anger_level, complaint, result["response"]) if allowed else None
+            if saved:
+                result["id"] = saved["id"]
+                result["permalink"] = complaints.permalink(saved["id"])
+            
+            send_json(self, result)
+            capture.record('submit-complaint', data, result, time.time() - started)
+            if allowed:
+                trending.record_submission(complaint, category)
+            anger.record(category, anger_level)
+            if saved:
+                sitemap.add(saved)
             return
             
         except Exception as e:
@@ -52,14 +67,22 @@ class handler(BaseHTTPRequestHandler):
                 "success": True,
                 "error": str(e)
             }
-            self.wfile.write(json.dumps(error_response).encode('utf-8'))
+            send_json(self, error_response)
             return
     
+    def do_GET(self):
+        # Scheduled ?warmup=1 pings keep this function's own instances warm
+        if 'warmup' in parse_qs(urlsplit(self.path).query):
+            warmup.respond(self, warmup.FUNCTION_STEPS, allow_methods='GET, POST, OPTIONS')
+        else:
+            send_uncached_json(self, 405, {"error": "Use POST, or GET ?warmup=1"})
+        return
+    
     def do_OPTIONS(self):
         # Handle CORS preflight
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
-        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
         self.end_headers()
         return
@@ -87,21 +110,23 @@ Examples:
     
     # Try OpenAI first
     api_key = os.getenv('OPENAI_API_KEY')
-    if api_key and openai:
+    if api_key and openai and screen.allow('submit-complaint', complaint) and budget.allow('submit-complaint'):
         try:
-            client = openai.OpenAI(api_key=api_key)
+            client = provider.get_client(api_key)
             
             user_prompt = f"Complaint: {complaint}\nCategory: {category}\nAnger Level: {anger_level}/10"
             
-            response = client.chat.completions.create(
+            max_tokens = usage.max_tokens_for('submit-complaint', 150)
+            response = admission.call('submit-complaint', client.chat.completions.create,
                 model="gpt-4",
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                max_tokens=150,
+                max_tokens=max_tokens,
                 temperature=0.9
             )
+            usage.record('submit-complaint', response, max_tokens)
             
             bot_response = response.choices[0].message.content.strip()
             
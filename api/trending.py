@@ -0,0 +1,67 @@
+"""
+Vercel Serverless Function for Trending Complaints
+Reports the most repeated complaints and categories over the last hour,
+day or week, from time-decayed sketches fed by complaint submissions.
+"""
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+from datetime import datetime
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import trending
+from _lib.httpcache import send_json, send_uncached_json
+
+MAX_LIMIT = 50
+
+# Trends move slowly; a minute of CDN caching absorbs homepage traffic
+TRENDING_CACHE = 'public, max-age=30, s-maxage=60, stale-while-revalidate=300'
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        window = params.get('window', ['24h'])[0]
+        kind = params.get('kind', ['complaints'])[0]
+
+        if window not in trending.WINDOWS or kind not in trending.KINDS:
+            send_uncached_json(self, 400, {
+                "error": f"window must be one of {', '.join(trending.WINDOWS)} and kind one of {', '.join(trending.KINDS)}",
+                "success": False
+            }, allow_methods='GET, OPTIONS')
+            return
+
+        try:
+            limit = max(1, min(MAX_LIMIT, int(params.get('limit', ['10'])[0])))
+        except ValueError:
+            limit = 10
+
+        try:
+            tracker = trending.get_tracker()
+            # Pick up what other processes sharing the snapshot have recorded
+            tracker.maybe_sync()
+            response = {
+                "window": window,
+                "kind": kind,
+                "trending": tracker.top(window, kind, limit),
+                "submissions": tracker.submissions,
+                "timestamp": datetime.now().isoformat(),
+                "success": True
+            }
+        except Exception as e:
+            print(f"Trending error: {e}")
+            send_uncached_json(self, 500, {"error": "Trending is unavailable right now", "success": False},
+                               allow_methods='GET, OPTIONS')
+            return
+        send_json(self, response, allow_methods='GET, OPTIONS', cache_control=TRENDING_CACHE)
+        return
+
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
@@ -0,0 +1,28 @@
+"""
+Vercel Serverless Function for Warmup and Readiness
+Imports every handler, builds the shared OpenAI client, opens a keep-alive
+connection to the provider and loads models and snapshots from disk,
+reporting how long each step took. Safe to call from a cron or health check;
+the provider call and the render pool need the operator token.
+"""
+
+from http.server import BaseHTTPRequestHandler
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _lib import metrics, warmup
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        warmup.respond(self)
+        return
+
+    def do_OPTIONS(self):
+        # Handle CORS preflight
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', f'Content-Type, {metrics.HEADER}')
+        self.end_headers()
+        return
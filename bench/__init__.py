@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for WhineAboutAI.
+Everything here runs against a local mock of the OpenAI API, so results
+never depend on network conditions or spend real tokens.
+"""
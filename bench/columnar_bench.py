@@ -0,0 +1,240 @@
+"""
+Aggregate query time over the columnar export versus the raw capture JSONL.
+
+Uses a capture directory (--capture-dir) or generates a synthetic one
+spread over --days days, exports it with scripts/export_columnar.py,
+appends more traffic and exports again to show the incremental run only
+converts the new lines, then runs the same query both ways:
+
+    count, mean latency and mean anger per category x provider
+    for the last --query-days days
+
+Results are checked against each other before timings are reported.
+
+    python -m bench.columnar_bench [--generate 200000] [--days 60] [--query-days 30]
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts'))
+import export_columnar
+
+from .stats import environment
+from .workloads import CATEGORIES, COMPLAINTS, CHAT_MESSAGES
+
+def synthetic_records(count: int, days: int, seed: int, end: float):
+    """Capture-shaped records; complaint submissions carry category and anger"""
+    rng = random.Random(seed)
+    start = end - days * 86400
+    for _ in range(count):
+        ts = start + rng.random() * days * 86400
+        provider = 'openai' if rng.random() < 0.8 else 'fallback'
+        latency = rng.lognormvariate(0.0, 0.6) * (900 if provider == 'openai' else 2)
+        if rng.random() < 0.6:
+            endpoint = 'submit-complaint'
+            request = {"complaint": rng.choice(COMPLAINTS), "category": rng.choice(CATEGORIES), "angerLevel": rng.randint(1, 10)}
+            response = {"response": "Your complaint has been filed under 'Things That Surprise No One.'", "success": True, "provider": provider}
+        else:
+            endpoint = 'chat'
+            request = {"message": rng.choice(CHAT_MESSAGES), "conversation_id": f"{rng.randrange(1 << 32):08x}"}
+            response = {"response": "Have you tried turning your expectations off and on again?", "provider": provider}
+        yield {"ts": round(ts, 6), "endpoint": endpoint, "method": "POST", "status": 200,
+               "latency_ms": round(latency, 3), "request": request, "response": response}
+
+def write_capture(directory: str, records, rotate_every: int = 50000):
+    """Write records like capture.record would, oldest in the highest-numbered file"""
+    records = sorted(records, key=lambda record: record["ts"])
+    chunks = [records[i:i + rotate_every] for i in range(0, len(records), rotate_every)]
+    for index, chunk in enumerate(chunks):
+        suffix = '' if index == len(chunks) - 1 else f'.{len(chunks) - 1 - index}'
+        with open(os.path.join(directory, export_columnar.CAPTURE_FILE + suffix), 'a', encoding='utf-8') as f:
+            for record in chunk:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def _accumulate(groups: dict, category: str, provider: str, latency: float, anger):
+    group = groups[(category, provider)]
+    group[0] += 1
+    group[1] += latency
+    if anger is not None and anger >= 0:
+        group[2] += anger
+        group[3] += 1
+
+def _finish(groups: dict) -> dict:
+    return {
+        f"{category}|{provider}": {
+            "count": count,
+            "mean_latency_ms": round(latency / count, 3),
+            "mean_anger": round(anger / angry, 3) if angry else None
+        }
+        for (category, provider), (count, latency, anger, angry) in sorted(groups.items())
+    }
+
+def query_jsonl(capture_dir: str, since: float) -> dict:
+    groups = defaultdict(lambda: [0, 0.0, 0, 0])
+    for path in export_columnar.capture_segments(capture_dir):
+        with open(path, 'rb') as f:
+            for line in f:
+                record = json.loads(line)
+                if record["ts"] < since:
+                    continue
+                row = export_columnar.flatten(record)
+                _accumulate(groups, row['category'], row['provider'], row['latency_ms'], row['anger_level'])
+    return _finish(groups)
+
+def _parts(output: str, since_day: str):
+    for day_dir in sorted(os.listdir(output)):
+        if not day_dir.startswith('day=') or day_dir[4:] < since_day:
+            continue
+        for category_dir in sorted(os.listdir(os.path.join(output, day_dir))):
+            directory = os.path.join(output, day_dir, category_dir)
+            for part in sorted(os.listdir(directory)):
+                if not part.endswith('.tmp'):
+                    yield os.path.join(directory, part)
+
+def query_columns(output: str, since: float) -> dict:
+    """Raw-format query: only the four columns it needs, only the days it needs"""
+    since_day = datetime.fromtimestamp(since, timezone.utc).strftime('%Y-%m-%d')
+    groups = defaultdict(lambda: [0, 0.0, 0, 0])
+    for part in _parts(output, since_day):
+        meta = export_columnar.read_meta(part)
+        columns = {name: export_columnar.read_column(part, name, meta) for name in ('ts', 'category', 'provider', 'latency_ms', 'anger_level')}
+        ts = columns['ts'][0]
+        (categories, category_names), (providers, provider_names) = columns['category'], columns['provider']
+        latency, anger = columns['latency_ms'][0], columns['anger_level'][0]
+        if numpy is not None:
+            _accumulate_numpy(groups, ts, categories, category_names, providers, provider_names, latency, anger, since)
+            continue
+        for index in range(meta["rows"]):
+            if ts[index] >= since:
+                _accumulate(groups, category_names[categories[index]], provider_names[providers[index]], latency[index], anger[index])
+    return _finish(groups)
+
+def _accumulate_numpy(groups, ts, categories, category_names, providers, provider_names, latency, anger, since):
+    keep = numpy.frombuffer(ts, numpy.float64) >= since
+    categories = numpy.frombuffer(categories, numpy.int16)[keep]
+    providers = numpy.frombuffer(providers, numpy.int16)[keep]
+    latency = numpy.frombuffer(latency, numpy.float32)[keep]
+    anger = numpy.frombuffer(anger, numpy.int8)[keep]
+    combined = categories.astype(numpy.int64) * len(provider_names) + providers
+    size = len(category_names) * len(provider_names)
+    counts = numpy.bincount(combined, minlength=size)
+    latency_sums = numpy.bincount(combined, weights=latency, minlength=size)
+    angry = anger >= 0
+    anger_sums = numpy.bincount(combined[angry], weights=anger[angry], minlength=size)
+    anger_counts = numpy.bincount(combined[angry], minlength=size)
+    for code in numpy.nonzero(counts)[0]:
+        group = groups[(category_names[code // len(provider_names)], provider_names[code % len(provider_names)])]
+        group[0] += int(counts[code])
+        group[1] += float(latency_sums[code])
+        group[2] += int(anger_sums[code])
+        group[3] += int(anger_counts[code])
+
+def query_parquet(output: str, since: float) -> dict:
+    import pyarrow
+    import pyarrow.dataset
+    # Only day is a partition field: category is also a column inside the files
+    partitioning = pyarrow.dataset.partitioning(pyarrow.schema([('day', pyarrow.string())]), flavor='hive')
+    dataset = pyarrow.dataset.dataset(output, format='parquet', partitioning=partitioning, exclude_invalid_files=True)
+    since_day = datetime.fromtimestamp(since, timezone.utc).strftime('%Y-%m-%d')
+    table = dataset.to_table(
+        columns=['category', 'provider', 'latency_ms', 'anger_level'],
+        filter=(pyarrow.dataset.field('day') >= since_day) & (pyarrow.dataset.field('ts') >= since)
+    )
+    table = pyarrow.table({
+        name: column.cast(pyarrow.string()) if pyarrow.types.is_dictionary(column.type) else column
+        for name, column in zip(table.column_names, table.columns)
+    })
+    aggregated = table.group_by(['category', 'provider']).aggregate([
+        ('latency_ms', 'count'), ('latency_ms', 'sum'), ('anger_level', 'sum'), ('anger_level', 'count')
+    ]).to_pylist()
+    groups = {(row['category'], row['provider']): [row['latency_ms_count'], row['latency_ms_sum'],
+                                                   row['anger_level_sum'] or 0, row['anger_level_count']]
+              for row in aggregated}
+    return _finish(groups)
+
+def timed(fn, *args, repeat: int = 3) -> tuple:
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, round(best, 4)
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar export queries against raw capture JSONL")
+    parser.add_argument('--capture-dir', help="Existing capture directory (default: generate one)")
+    parser.add_argument('--generate', type=int, default=200000, help="Synthetic records when no capture dir is given")
+    parser.add_argument('--days', type=int, default=60)
+    parser.add_argument('--query-days', type=int, default=30)
+    parser.add_argument('--format', choices=('auto', 'parquet', 'columns'), default='auto')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='whine-columnar-')
+    try:
+        capture_dir = args.capture_dir
+        end = time.time()
+        incremental = None
+        output = os.path.join(workdir, 'export')
+        if capture_dir is None:
+            capture_dir = os.path.join(workdir, 'capture')
+            os.makedirs(capture_dir)
+            write_capture(capture_dir, synthetic_records(args.generate, args.days, args.seed, end - 3600))
+            full = export_columnar.export(capture_dir, output, args.format)
+            # New traffic lands in the live file; only it should be converted
+            appended = max(1, args.generate // 100)
+            with open(os.path.join(capture_dir, export_columnar.CAPTURE_FILE), 'a', encoding='utf-8') as f:
+                for record in synthetic_records(appended, 1, args.seed + 1, end):
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            incremental = export_columnar.export(capture_dir, output, args.format)
+            incremental["appended"] = appended
+        else:
+            full = export_columnar.export(capture_dir, output, args.format)
+
+        since = end - args.query_days * 86400
+        columnar_query = query_parquet if full["format"] == 'parquet' else query_columns
+        raw, raw_seconds = timed(query_jsonl, capture_dir, since, repeat=args.repeat)
+        columnar, columnar_seconds = timed(columnar_query, output, since, repeat=args.repeat)
+        mismatched = [key for key in set(raw) | set(columnar)
+                      if raw.get(key, {}).get("count") != columnar.get(key, {}).get("count")]
+
+        report = {
+            "meta": environment(ROOT_DIR),
+            "config": {"format": full["format"], "numpy": numpy is not None, "query_days": args.query_days},
+            "export": full,
+            "incremental_export": incremental,
+            "bytes": {"jsonl": directory_bytes(capture_dir), "columnar": directory_bytes(output)},
+            "query": {
+                "groups": len(raw),
+                "rows": sum(group["count"] for group in raw.values()),
+                "jsonl_seconds": raw_seconds,
+                "columnar_seconds": columnar_seconds,
+                "speedup": round(raw_seconds / max(columnar_seconds, 1e-9), 1),
+                "mismatched_groups": mismatched
+            }
+        }
+        print(json.dumps(report, indent=2))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Fallback battle commentary: keyword classification checks and throughput.
+
+Classifies CLASSIFY_CASES, complaints with the near-miss words plain
+substring matching got wrong ('iot' inside "idiot", 'bot' inside "robot"
+and "both"), and reports any that land in another category. Checks that
+every matchup template names complaint 1's fighter before complaint 2's,
+for both orderings of each pair. Then times get_fallback_commentary over
+the workload complaints, which is one classification per side and a table
+lookup. Any failed check makes the exit status 1.
+
+    python -m bench.commentary_bench [--calls 20000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib.endpoints import load_endpoint
+
+from .stats import environment
+from .workloads import COMPLAINTS
+
+# (complaint, category the fallback must pick)
+CLASSIFY_CASES = [
+    ("My GPS is an idiot", 'navigation'),
+    ("This robot is both dumb and slow", 'general'),
+    ("Both of my robots ignored me", 'general'),
+    ("The chatbot told me the moon is cheese", 'chatbot'),
+    ("Three different bots refused my refund", 'chatbot'),
+    ("My IoT kettle joined a botnet", 'smart_home'),
+    ("Autocorrected my boss's name to 'Bossy'", 'autocorrect'),
+    ("Siri keeps typing the wrong thing", 'voice_assistant'),
+    ("The new routes sent me through a field", 'navigation'),
+    ("I was correct and it still argued", 'autocorrect')
+]
+
+def check_classification(battle) -> dict:
+    failed = []
+    for complaint, expected in CLASSIFY_CASES:
+        category = battle.get_category(complaint)
+        if category != expected:
+            failed.append({"complaint": complaint, "expected": expected, "got": category})
+    return {"cases": len(CLASSIFY_CASES), "failed": failed}
+
+def check_corners(battle) -> dict:
+    """Templates naming both fighters must name complaint 1's first"""
+    failed = []
+    checked = 0
+    categories = battle.MATCHUP_CATEGORIES
+    for i, first in enumerate(categories):
+        for j, second in enumerate(categories):
+            if first == second:
+                continue
+            first_name = battle.FIGHTERS[first]['name'].lower()
+            second_name = battle.FIGHTERS[second]['name'].lower()
+            for template in battle.MATCHUP_TABLE[i][j]:
+                text = template.lower()
+                if first_name not in text or second_name not in text:
+                    continue
+                checked += 1
+                if text.index(first_name) > text.index(second_name):
+                    failed.append({"first": first, "second": second, "template": template[:80]})
+    return {"templates": checked, "failed": failed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the fallback battle commentary")
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    battle = load_endpoint('battle-commentary')
+    classification = check_classification(battle)
+    corners = check_corners(battle)
+
+    rng = random.Random(args.seed)
+    pairs = [(rng.choice(COMPLAINTS), rng.choice(COMPLAINTS)) for _ in range(args.calls)]
+    started = time.perf_counter()
+    for complaint1, complaint2 in pairs:
+        battle.get_fallback_commentary(complaint1, complaint2)
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"calls": args.calls},
+        "classification": classification,
+        "corners": corners,
+        "us_per_fallback": round(elapsed / max(args.calls, 1) * 1e6, 2)
+    }
+    print(json.dumps(report, indent=2))
+    if classification["failed"] or corners["failed"]:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Response compression: bytes on the wire and CPU cost per endpoint.
+
+Starts the self-hosted server in-process (fallback answers, no OpenAI
+key), collects uncompressed response bodies for every endpoint workload,
+then compresses each one with every encoding this process supports. Also
+compares a streamed reply flushed token by token against compressing the
+same text in one shot, which is what StreamingWriter trades for latency.
+
+    python -m bench.compression_bench [--samples 20] [--repeat 200]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import compression
+
+from server.app import make_server
+
+from .stats import environment
+from .workloads import DEFAULT_MIX, EXTRA_WORKLOADS
+
+def fetch(base_url: str, endpoint: str, payload: dict = None) -> bytes:
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(f"{base_url}/api/{endpoint}", data=data, headers={
+        'Content-Type': 'application/json',
+        'Accept-Encoding': 'identity'
+    })
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+def collect_bodies(samples: int, seed: int) -> dict:
+    """Uncompressed response bodies keyed by endpoint"""
+    os.environ.pop('OPENAI_API_KEY', None)
+    server = make_server('127.0.0.1', 0, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    rng = random.Random(seed)
+    bodies = {}
+    try:
+        for endpoint, _, factory in DEFAULT_MIX + EXTRA_WORKLOADS:
+            bodies[endpoint] = [fetch(base_url, endpoint, factory(rng)) for _ in range(samples)]
+        bodies['metrics'] = [fetch(base_url, 'metrics')]
+    finally:
+        server.shutdown()
+        server.server_close()
+    return bodies
+
+def measure(bodies: list, encoding: str, repeat: int) -> dict:
+    sizes = [len(compression.compress(body, encoding)) for body in bodies]
+    started = time.process_time()
+    for _ in range(repeat):
+        for body in bodies:
+            compression.compress(body, encoding)
+    cpu = time.process_time() - started
+    return {
+        "avg_bytes": round(sum(sizes) / len(sizes), 1),
+        "ratio": round(sum(sizes) / sum(map(len, bodies)), 3),
+        "cpu_us": round(cpu / (repeat * len(bodies)) * 1e6, 1)
+    }
+
+def wire_bytes(bodies: list, encoding: str) -> float:
+    """Average bytes actually sent once the size threshold is applied"""
+    sent = [len(compression.encode_body(body, encoding)[0]) for body in bodies]
+    return round(sum(sent) / len(sent), 1)
+
+def bench_endpoints(bodies: dict, repeat: int) -> dict:
+    results = {}
+    for endpoint, samples in bodies.items():
+        row = {"identity_bytes": round(sum(map(len, samples)) / len(samples), 1)}
+        for encoding in compression.SUPPORTED:
+            row[encoding] = {**measure(samples, encoding, repeat), "wire_bytes": wire_bytes(samples, encoding)}
+        results[endpoint] = row
+    return results
+
+def bench_streaming(text: str, repeat: int) -> dict:
+    """Token-by-token flushes against one-shot compression of the same text"""
+    tokens = [token + ' ' for token in text.split(' ')]
+    raw = ''.join(tokens).encode('utf-8')
+    results = {"tokens": len(tokens), "identity_bytes": len(raw)}
+    for encoding in compression.SUPPORTED:
+        started = time.process_time()
+        for _ in range(repeat):
+            compressor = compression._Compressor(encoding)
+            streamed = sum(len(compressor.compress(token.encode('utf-8'))) for token in tokens)
+            streamed += len(compressor.finish())
+        cpu = time.process_time() - started
+        results[encoding] = {
+            "streamed_bytes": streamed,
+            "one_shot_bytes": len(compression.compress(raw, encoding)),
+            "cpu_us_per_token": round(cpu / (repeat * len(tokens)) * 1e6, 2)
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression per endpoint and encoding")
+    parser.add_argument('--samples', type=int, default=20, help="Responses collected per endpoint")
+    parser.add_argument('--repeat', type=int, default=200, help="Compression passes when timing")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # Handlers log to stdout; keep the JSON report the only thing printed there
+    with contextlib.redirect_stdout(sys.stderr):
+        bodies = collect_bodies(args.samples, args.seed)
+    reply = max((json.loads(body).get('response', '') for body in bodies['chat']), key=len)
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"encodings": compression.SUPPORTED, "min_bytes": compression.MIN_BYTES, "samples": args.samples},
+        "endpoints": bench_endpoints(bodies, args.repeat),
+        "streaming": bench_streaming(' '.join([reply] * 4), args.repeat)
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""
+Load generator for the WhineAboutAI API.
+
+By default it starts the mock OpenAI server and the self-hosted app server
+in-process, points the handlers at the mock, replays a weighted request mix
+against every endpoint and prints a JSON report with throughput, latency
+percentiles and error rates per endpoint.
+
+    python -m bench.loadgen --duration 10 --concurrency 16 --output bench-results.json
+    python -m bench.loadgen --baseline bench-results.json   # compare to a previous run
+
+Use --target to drive an already running deployment instead.
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from .mock_openai import MockConfig, start_mock_server
+from .stats import environment, summarize_latencies
+from . import workloads
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def post_json(target: str, endpoint: str, payload: dict, timeout: float = 30.0):
+    """POST one request and return (status, parsed body or None)"""
+    parts = urlsplit(target)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    try:
+        body = json.dumps(payload).encode('utf-8')
+        conn.request('POST', f"/api/{endpoint}", body=body, headers={
+            'Content-Type': 'application/json',
+            'Content-Length': str(len(body))
+        })
+        response = conn.getresponse()
+        raw = response.read()
+        try:
+            return response.status, json.loads(raw)
+        except ValueError:
+            return response.status, None
+    finally:
+        conn.close()
+
+def is_error(status: int, body) -> bool:
+    if status >= 400 or not isinstance(body, dict):
+        return True
+    return 'error' in body or body.get('success') is False
+
+def run_load(target: str, mix: list, duration: float, concurrency: int, seed: int,
+             max_requests: int = None) -> dict:
+    """Drive the target with `concurrency` workers and collect per-endpoint samples"""
+    names = [entry[0] for entry in mix]
+    weights = [entry[1] for entry in mix]
+    factories = {entry[0]: entry[2] for entry in mix}
+
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id: int):
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            if max_requests is not None:
+                with lock:
+                    if issued[0] >= max_requests:
+                        return
+                    issued[0] += 1
+            endpoint = rng.choices(names, weights)[0]
+            payload = factories[endpoint](rng)
+            started = time.perf_counter()
+            try:
+                status, body = post_json(target, endpoint, payload)
+                failed = is_error(status, body)
+            except (OSError, http.client.HTTPException):
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                samples[endpoint].append(elapsed)
+                if failed:
+                    errors[endpoint] += 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    return build_report(samples, errors, wall)
+
+def build_report(samples: dict, errors: dict, wall: float) -> dict:
+    endpoints = {}
+    all_latencies = []
+    total_errors = 0
+    for name in sorted(samples):
+        latencies = samples[name]
+        all_latencies.extend(latencies)
+        total_errors += errors[name]
+        count = len(latencies)
+        endpoints[name] = {
+            "requests": count,
+            "errors": errors[name],
+            "error_rate": round(errors[name] / count, 4) if count else 0.0,
+            "throughput_rps": round(count / wall, 2) if wall else 0.0,
+            **summarize_latencies(latencies)
+        }
+
+    total = len(all_latencies)
+    overall = {
+        "requests": total,
+        "errors": total_errors,
+        "error_rate": round(total_errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "wall_seconds": round(wall, 3),
+        **summarize_latencies(all_latencies)
+    }
+    return {"overall": overall, "endpoints": endpoints}
+
+def compare(current: dict, baseline: dict) -> dict:
+    """Relative change of the headline numbers versus a previous report"""
+    def delta(new, old):
+        return round((new - old) / old, 4) if old else None
+
+    keys = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "error_rate")
+    result = {"baseline_commit": baseline.get("meta", {}).get("commit")}
+    sections = [("overall", current["overall"], baseline.get("overall", {}))]
+    for name, stats in current["endpoints"].items():
+        sections.append((name, stats, baseline.get("endpoints", {}).get(name, {})))
+    for name, new, old in sections:
+        result[name] = {key: delta(new.get(key, 0), old.get(key, 0)) for key in keys}
+    return result
+
+@contextlib.contextmanager
+def local_stack(mock_config: MockConfig, quiet: bool = True):
+    """Run the mock provider and the app server in-process for the duration"""
+    from server.app import make_server
+
+    mock_server, base_url = start_mock_server(mock_config)
+    saved_env = {key: os.environ.get(key) for key in ('OPENAI_API_KEY', 'OPENAI_BASE_URL')}
+    os.environ['OPENAI_API_KEY'] = 'sk-mock-benchmark'
+    os.environ['OPENAI_BASE_URL'] = base_url
+
+    app_server = make_server('127.0.0.1', 0, quiet=True)
+    app_thread = threading.Thread(target=app_server.serve_forever, daemon=True)
+    app_thread.start()
+    target = f"http://127.0.0.1:{app_server.server_address[1]}"
+
+    # Handlers print diagnostics (contact form, provider errors); keep the report clean
+    sink = io.StringIO() if quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(sink):
+            yield target
+    finally:
+        app_server.shutdown()
+        app_server.server_close()
+        mock_server.shutdown()
+        mock_server.server_close()
+        for key, value in saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a realistic request mix and report latency percentiles")
+    parser.add_argument('--target', help="Base URL of a running deployment (default: start a local stack)")
+    parser.add_argument('--endpoint', help="Only exercise this endpoint")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, help="Stop after this many requests")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--mock-latency', default='lognormal:-2.0,0.5')
+    parser.add_argument('--mock-error-rate', type=float, default=0.01)
+    parser.add_argument('--mock-tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--output', help="Write the JSON report here as well as stdout")
+    parser.add_argument('--baseline', help="Previous JSON report to compare against")
+    args = parser.parse_args()
+
+    mix = workloads.only(args.endpoint) if args.endpoint else workloads.DEFAULT_MIX
+    mock_config = MockConfig(args.mock_latency, args.mock_error_rate, args.mock_tokens_per_second, args.seed)
+
+    if args.target:
+        stack = contextlib.nullcontext(args.target)
+    else:
+        stack = local_stack(mock_config)
+
+    with stack as target:
+        results = run_load(target, mix, args.duration, args.concurrency, args.seed, args.requests)
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {
+            "target": args.target or "local",
+            "duration": args.duration,
+            "concurrency": args.concurrency,
+            "max_requests": args.requests,
+            "seed": args.seed,
+            "mix": {name: weight for name, weight, _ in mix},
+            "mock": None if args.target else mock_config.as_dict()
+        },
+        **results
+    }
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(results, json.load(f))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
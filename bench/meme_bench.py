@@ -0,0 +1,159 @@
+"""
+Wasted provider calls and latency for /api/create-meme, before and after
+the schema-enforced tool call with streaming partial parse.
+
+Runs the mock provider in-process with --json-fault-rate of its JSON
+answers malformed (wrapped in prose, truncated, missing a key or naming an
+unknown template) and generates memes for the same complaints twice:
+
+    before  response_format json_object and a bare json.loads, as the
+            handler used to; anything that fails to parse is wasted
+    after   create_meme_text as it ships now
+
+A call is wasted when none of the model's text reaches the user.
+
+Before either run, the repairing parser is checked against PARSER_CASES,
+answers seen from models that the mock does not generate; the report
+lists any case that parsed to something else, and the exit status is 1.
+
+    python -m bench.meme_bench [--requests 400] [--json-fault-rate 0.2]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import jsonrepair, provider
+from _lib.endpoints import load_endpoint
+
+from .mock_openai import MockConfig, start_mock_server
+from .stats import environment, summarize_latencies
+from .workloads import COMPLAINTS
+
+MEME_KEYS = ('top_text', 'bottom_text', 'meme_type')
+
+# (model answer, what jsonrepair.parse must return)
+PARSER_CASES = [
+    ('{"top_text": "a", "bottom_text": "b"}', {"top_text": "a", "bottom_text": "b"}),
+    ('Sure! ```json\n{"top_text": "a"}\n```', {"top_text": "a"}),
+    ('Here [is] your meme: {"top_text": "a"}', {"top_text": "a"}),
+    ('[1] [draft] {"top_text": "a"}', [1]),
+    ('{"top_text": "a",}', {"top_text": "a"}),
+    ('{"top_text": "a", "tags": ["x", "y",],}', {"top_text": "a", "tags": ["x", "y"]}),
+    ('{"top_text": "a, }"}', {"top_text": "a, }"}),
+    ('{"top_text": "when the AI', {"top_text": "when the AI"}),
+    ('{"top_text": "a", "bottom_text":', {"top_text": "a"}),
+    ('{"top_text": "a\\', {"top_text": "a"}),
+    ('no json here [at all]', None)
+]
+
+def legacy_meme(client, complaint: str) -> dict:
+    """The pre-schema request: json_object mode and json.loads"""
+    response = client.chat.completions.create(
+        model="gpt-4",
+        messages=[
+            {"role": "system", "content": 'Convert complaints into viral meme format. '
+                                          'Return JSON with: {"top_text": "...", "bottom_text": "...", "meme_type": "..."}'},
+            {"role": "user", "content": f"Turn this into meme text: {complaint}"}
+        ],
+        max_tokens=100,
+        temperature=0.8,
+        response_format={"type": "json_object"}
+    )
+    return json.loads(response.choices[0].message.content)
+
+def check_parser() -> dict:
+    failed = []
+    for text, expected in PARSER_CASES:
+        try:
+            value = jsonrepair.parse(text)
+        except Exception as e:
+            value = f"raised {type(e).__name__}: {e}"
+        if value != expected:
+            failed.append({"input": text, "expected": expected, "got": value})
+    return {"cases": len(PARSER_CASES), "failed": failed}
+
+def bench_before(complaints: list) -> dict:
+    client = provider.get_client()
+    latencies, wasted, incomplete = [], 0, 0
+    for complaint in complaints:
+        started = time.perf_counter()
+        try:
+            meme = legacy_meme(client, complaint)
+            incomplete += not all(isinstance(meme.get(key), str) and meme[key] for key in MEME_KEYS)
+        except ValueError:
+            wasted += 1
+        latencies.append(time.perf_counter() - started)
+    return {
+        "calls": len(complaints),
+        "wasted": wasted,
+        "wasted_rate": round(wasted / len(complaints), 4),
+        "incomplete_but_served": incomplete,
+        "latency": summarize_latencies(latencies)
+    }
+
+def bench_after(complaints: list) -> dict:
+    module = load_endpoint('create-meme')
+    latencies = []
+    for complaint in complaints:
+        started = time.perf_counter()
+        # Distinct keys so single-flight never collapses two bench calls
+        module.create_meme_text(f"{complaint} #{len(latencies)}")
+        latencies.append(time.perf_counter() - started)
+    stats = module.meme_stats.stats()
+    stats.pop("latency_ms", None)
+    stats["latency"] = summarize_latencies(latencies)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark wasted calls and latency of meme generation")
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--json-fault-rate', type=float, default=0.2)
+    parser.add_argument('--mock-latency', default='fixed:0.02')
+    # The mock only charges generation time to streamed answers; 0 keeps the comparison even
+    parser.add_argument('--mock-tokens-per-second', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    parser_check = check_parser()
+    rng = random.Random(args.seed)
+    complaints = [rng.choice(COMPLAINTS) for _ in range(args.requests)]
+    results = {}
+    for name, bench in (("before", bench_before), ("after", bench_after)):
+        # A fresh mock per run so both see the same sequence of faults
+        config = MockConfig(args.mock_latency, 0.0, args.mock_tokens_per_second, args.seed, args.json_fault_rate)
+        server, base_url = start_mock_server(config)
+        saved = {key: os.environ.get(key) for key in ('OPENAI_API_KEY', 'OPENAI_BASE_URL')}
+        os.environ.update(OPENAI_API_KEY='sk-mock-benchmark', OPENAI_BASE_URL=base_url)
+        try:
+            # Handlers print provider errors; keep the report clean
+            with contextlib.redirect_stdout(sys.stderr):
+                results[name] = bench(complaints)
+            results[name]["faults_injected"] = config.json_faults
+        finally:
+            server.shutdown()
+            server.server_close()
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"requests": args.requests, "json_fault_rate": args.json_fault_rate},
+        "parser": parser_check,
+        "results": results
+    }
+    print(json.dumps(report, indent=2))
+    if parser_check["failed"]:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+Local mock of the OpenAI chat completions API.
+Latency, error rate and streaming behaviour are configurable so the
+handlers can be exercised under realistic upstream conditions.
+
+Run standalone: python -m bench.mock_openai --port 8089 --latency lognormal:-1.2,0.5
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+CANNED_TEXT = (
+    "Ah yes, another AI betrayal. I've filed it under 'Entirely Predictable' "
+    "and scheduled a sarcastic support group for your toaster."
+)
+
+CANNED_MEME = {
+    "top_text": "ASKS AI FOR HELP",
+    "bottom_text": "GETS MOCK RESPONSE INSTEAD",
+    "meme_type": "surprised_pikachu"
+}
+
+def parse_latency(spec: str):
+    """
+    Parse a latency distribution spec into a sampler returning seconds.
+    Supported: fixed:S, uniform:LO,HI, normal:MEAN,STDDEV, lognormal:MU,SIGMA
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+
+    if kind == 'fixed':
+        seconds = values[0] if values else 0.0
+        return lambda rng: seconds
+    if kind == 'uniform':
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == 'normal':
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if kind == 'lognormal':
+        mu, sigma = values
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+class MockConfig:
+    """Behaviour knobs shared by all requests to one mock server"""
+
+    def __init__(self, latency: str = 'fixed:0.05', error_rate: float = 0.0,
+                 tokens_per_second: float = 200.0, seed: int = 1234, json_fault_rate: float = 0.0):
+        self.latency_spec = latency
+        self.sample_latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.tokens_per_second = tokens_per_second
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.json_fault_rate = json_fault_rate
+        self.requests = 0
+        self.errors = 0
+        self.json_faults = 0
+
+    def draw(self):
+        """Return (latency seconds, should_fail) for the next request"""
+        with self._rng_lock:
+            self.requests += 1
+            latency = self.sample_latency(self._rng)
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+            return latency, fail
+
+    def draw_json_fault(self):
+        """One of JSON_FAULTS for this JSON answer, or None to answer cleanly"""
+        with self._rng_lock:
+            if self._rng.random() >= self.json_fault_rate:
+                return None
+            self.json_faults += 1
+            return self._rng.choice(JSON_FAULTS)
+
+    def as_dict(self) -> dict:
+        return {
+            "latency": self.latency_spec,
+            "error_rate": self.error_rate,
+            "tokens_per_second": self.tokens_per_second,
+            "json_fault_rate": self.json_fault_rate
+        }
+
+# Ways real models get JSON answers wrong
+JSON_FAULTS = ('prose', 'truncated', 'missing_key', 'unknown_type')
+
+def apply_json_fault(content: str, fault: str) -> str:
+    if fault == 'prose':
+        return f"Sure! Here is your meme:\n```json\n{content}\n```\nHope that makes you laugh."
+    if fault == 'truncated':
+        return content[:int(len(content) * 0.7)]
+    data = json.loads(content)
+    if fault == 'missing_key':
+        data.pop(sorted(data)[-1])
+    elif 'meme_type' in data:
+        data['meme_type'] = 'Unknown Template'
+    return json.dumps(data)
+
+def requested_keys(body: dict) -> list:
+    """Keys of the 'Return JSON with ... {"key": "..."}' template in the system prompt"""
+    for message in body.get('messages', []):
+        if message.get('role') == 'system':
+            template = re.search(r'Return JSON with[^{]*(\{.*?\})', str(message.get('content', '')), re.S)
+            if template:
+                return re.findall(r'"(\w+)"\s*:', template.group(1))
+    return []
+
+def tool_keys(body: dict) -> list:
+    """Required properties of the first function tool the caller offered"""
+    for tool in body.get('tools') or []:
+        parameters = (tool.get('function') or {}).get('parameters') or {}
+        return list(parameters.get('required') or parameters.get('properties') or [])
+    return []
+
+def build_content(body: dict) -> str:
+    """Pick a response body that matches what the caller asked for"""
+    response_format = body.get('response_format') or {}
+    if body.get('tools'):
+        keys = tool_keys(body)
+        if keys and not set(keys) <= set(CANNED_MEME):
+            return json.dumps({key: f"Mock {key.replace('_', ' ')}: {CANNED_TEXT}" for key in keys})
+        return json.dumps(CANNED_MEME)
+    if response_format.get('type') in ('json_object', 'json_schema'):
+        keys = requested_keys(body)
+        if keys and not set(keys) <= set(CANNED_MEME):
+            return json.dumps({key: f"Mock {key.replace('_', ' ')}: {CANNED_TEXT}" for key in keys})
+        return json.dumps(CANNED_MEME)
+    return CANNED_TEXT
+
+def tool_call(name: str, arguments: str) -> dict:
+    return {"index": 0, "id": f"call_mock_{uuid.uuid4().hex[:12]}", "type": "function",
+            "function": {"name": name, "arguments": arguments}}
+
+def count_tokens(text: str) -> int:
+    # Roughly four characters per token, close enough for accounting tests
+    return max(1, len(text) // 4)
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = MockConfig()
+    # Headers and body go out in separate writes; without this, Nagle plus
+    # delayed ACKs add ~40ms to every non-streamed answer
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._send_json(200, {
+                "object": "list",
+                "data": [{"id": "gpt-4", "object": "model", "owned_by": "mock"}]
+            })
+            return
+        self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+    def do_POST(self):
+        content_length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(content_length) or b'{}')
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        latency, fail = self.config.draw()
+        time.sleep(latency)
+
+        if fail:
+            self._send_json(500, {"error": {"message": "Mock upstream failure", "type": "server_error"}})
+            return
+
+        content = build_content(body)
+        if body.get('tools') or (body.get('response_format') or {}).get('type') in ('json_object', 'json_schema'):
+            fault = self.config.draw_json_fault()
+            if fault:
+                content = apply_json_fault(content, fault)
+        tool_name = None
+        if body.get('tools'):
+            tool_name = ((body.get('tool_choice') or {}).get('function') or {}).get('name') \
+                or body['tools'][0]['function']['name']
+        prompt_tokens = sum(count_tokens(str(m.get('content', ''))) for m in body.get('messages', []))
+        completion_tokens = min(count_tokens(content), body.get('max_tokens') or 4096)
+        finish_reason = "length" if completion_tokens < count_tokens(content) else "stop"
+        model = body.get('model', 'gpt-4')
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+
+        if body.get('stream'):
+            self._stream(completion_id, model, content, usage, finish_reason, tool_name)
+            return
+
+        message = {"role": "assistant", "content": content}
+        if tool_name:
+            message = {"role": "assistant", "content": None, "tool_calls": [tool_call(tool_name, content)]}
+
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": message,
+                "finish_reason": finish_reason
+            }],
+            "usage": usage
+        })
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: dict, finish_reason: str = "stop",
+                tool_name: str = None):
+        """Send the completion as server-sent events, one word per chunk; tool calls stream their arguments"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def send_event(payload):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        delay = 1.0 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        words = content.split(' ')
+        for index, word in enumerate(words):
+            piece = word if index == 0 else ' ' + word
+            if tool_name:
+                call = tool_call(tool_name, piece)
+                if index:
+                    call = {"index": 0, "function": {"arguments": piece}}
+                delta = {"tool_calls": [call]}
+            else:
+                delta = {"content": piece}
+            send_event(json.dumps({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+            }))
+            if delay:
+                time.sleep(delay)
+
+        send_event(json.dumps({
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+            "usage": usage
+        }))
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+def make_mock_server(host: str = '127.0.0.1', port: int = 0, config: MockConfig = None):
+    """Create (but do not start) a mock server; port 0 picks a free port"""
+    handler_class = type('Handler', (MockOpenAIHandler,), {'config': config or MockConfig()})
+    server = ThreadingHTTPServer((host, port), handler_class)
+    server.daemon_threads = True
+    return server
+
+def start_mock_server(config: MockConfig = None, host: str = '127.0.0.1', port: int = 0):
+    """Start a mock server on a background thread and return (server, base_url)"""
+    server = make_mock_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server, base_url
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', default='fixed:0.05', help="fixed:S | uniform:LO,HI | normal:MEAN,SD | lognormal:MU,SIGMA")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--tokens-per-second', type=float, default=200.0)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--json-fault-rate', type=float, default=0.0, help="Share of JSON answers sent malformed")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency, args.error_rate, args.tokens_per_second, args.seed, args.json_fault_rate)
+    server = make_mock_server(args.host, args.port, config)
+    print(f"Mock OpenAI API on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Requests/sec of the pre-forked server from 1 to N worker processes.
+
+For each worker count, starts `python -m server --workers K` as a
+subprocess without OPENAI_API_KEY, so every request is answered by the
+local fallbacks (keyword classification, templates, JSON encoding): the
+CPU-bound work the GIL confines to one core in single-process mode. The
+single-process threaded server is measured first as the baseline. Load
+comes from --clients closed-loop client processes sharing the host, so
+leave them cores of their own or the curve flattens early.
+
+    python -m bench.prefork_bench [--max-workers 32] [--clients 64] [--duration 10]
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+from .stats import environment, summarize_latencies
+from .workloads import DEFAULT_MIX
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Fallback-heavy endpoints; chat is mostly I/O and contact prints every submission
+ENDPOINTS = [entry for entry in DEFAULT_MIX if entry[0] not in ('chat', 'contact')]
+
+def start_server(workers) -> tuple:
+    """Start the server (workers None = single process) and return (process, host, port)"""
+    env = {key: value for key, value in os.environ.items() if key != 'OPENAI_API_KEY'}
+    env['PYTHONUNBUFFERED'] = '1'
+    command = [sys.executable, '-m', 'server', '--port', '0', '--quiet']
+    if workers is not None:
+        command += ['--workers', str(workers)]
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env, stdout=subprocess.PIPE, text=True)
+    target = process.stdout.readline().strip().rsplit(' ', 1)[-1]
+    host, port = target.split('//', 1)[1].split(':')
+    return process, host, int(port)
+
+def client(args) -> tuple:
+    """One closed-loop client: (completed, errors, latencies)"""
+    host, port, duration, seed = args
+    rng = random.Random(seed)
+    names = [name for name, _, _ in ENDPOINTS]
+    weights = [weight for _, weight, _ in ENDPOINTS]
+    factories = {name: factory for name, _, factory in ENDPOINTS}
+    completed, errors, latencies = 0, 0, []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        name = rng.choices(names, weights)[0]
+        body = json.dumps(factories[name](rng))
+        started = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            connection.request('POST', f'/api/{name}', body=body, headers={'Content-Type': 'application/json'})
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            if response.status != 200:
+                errors += 1
+                continue
+        except OSError:
+            errors += 1
+            continue
+        completed += 1
+        latencies.append(time.perf_counter() - started)
+    return completed, errors, latencies
+
+def measure(workers, clients: int, duration: float, warmup: float, seed: int) -> dict:
+    process, host, port = start_server(workers)
+    try:
+        with multiprocessing.Pool(clients) as pool:
+            pool.map(client, [(host, port, warmup, seed + index) for index in range(clients)])
+            results = pool.map(client, [(host, port, duration, seed + index) for index in range(clients)])
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    completed = sum(result[0] for result in results)
+    latencies = [latency for result in results for latency in result[2]]
+    return {
+        "workers": workers or 0,
+        "requests": completed,
+        "errors": sum(result[1] for result in results),
+        "rps": round(completed / duration, 1),
+        "latency": summarize_latencies(latencies)
+    }
+
+def worker_counts(maximum: int) -> list:
+    counts, count = [], 1
+    while count < maximum:
+        counts.append(count)
+        count *= 2
+    return counts + [maximum]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pre-forked server scaling")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--clients', type=int, default=None, help="Client processes (default 2 per worker at the max)")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--warmup', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    clients = args.clients or max(2, 2 * args.max_workers)
+
+    runs = [measure(None, clients, args.duration, args.warmup, args.seed)]
+    for workers in worker_counts(args.max_workers):
+        runs.append(measure(workers, clients, args.duration, args.warmup, args.seed))
+    baseline = runs[0]["rps"] or 1
+    for run in runs:
+        run["speedup"] = round(run["rps"] / baseline, 2)
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"clients": clients, "duration": args.duration, "endpoints": [name for name, _, _ in ENDPOINTS]},
+        "runs": runs
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
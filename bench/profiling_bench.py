@@ -0,0 +1,122 @@
+"""
+Cost of the @profiling.profiled decorator on handler methods.
+
+Decorator: times a trivial method bare, decorated with profiling off, and
+decorated with WHINE_PROFILE_TOKEN set but no profile header (the common
+production state), reporting the added nanoseconds per call.
+
+Requests: runs the mock provider and the app server in-process and sends
+the same /api/<endpoint> requests unprofiled and with each profiling mode
+armed, so the cost of actually profiling is visible too.
+
+    python -m bench.profiling_bench [--calls 1000000] [--requests 300] [--endpoint predict-fail]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import profiling
+
+from .loadgen import local_stack
+from .mock_openai import MockConfig
+from .stats import environment, summarize_latencies
+from .workloads import DEFAULT_MIX
+
+class FakeHandler:
+    headers = {}
+
+    def do_POST(self):
+        return None
+
+def per_call_ns(method, calls: int, repeat: int = 5) -> float:
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter_ns()
+        for _ in range(calls):
+            method()
+        elapsed = (time.perf_counter_ns() - started) / calls
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def bench_decorator(calls: int) -> dict:
+    bare = FakeHandler()
+    decorated_class = type('Decorated', (FakeHandler,), {'do_POST': profiling.profiled('bench')(FakeHandler.do_POST)})
+    decorated = decorated_class()
+
+    saved = profiling.TOKEN
+    results = {"bare_ns": round(per_call_ns(bare.do_POST, calls), 1)}
+    try:
+        profiling.TOKEN = ''
+        profiling._refresh()
+        results["disabled_ns"] = round(per_call_ns(decorated.do_POST, calls), 1)
+        profiling.TOKEN = 'bench-token'
+        profiling._refresh()
+        results["token_set_ns"] = round(per_call_ns(decorated.do_POST, calls), 1)
+    finally:
+        profiling.TOKEN = saved
+        profiling._refresh()
+    results["disabled_overhead_ns"] = round(results["disabled_ns"] - results["bare_ns"], 1)
+    results["token_set_overhead_ns"] = round(results["token_set_ns"] - results["bare_ns"], 1)
+    return results
+
+def bench_requests(target: str, endpoint: str, payloads: list, modes: tuple) -> dict:
+    host, port = target.split('//', 1)[1].split(':')
+    connection = http.client.HTTPConnection(host, int(port), timeout=60)
+    results = {}
+    for mode in modes:
+        if mode != 'off':
+            profiling.arm(endpoint, mode, len(payloads))
+        latencies = []
+        for payload in payloads:
+            started = time.perf_counter()
+            connection.request('POST', f'/api/{endpoint}', body=json.dumps(payload),
+                               headers={'Content-Type': 'application/json'})
+            connection.getresponse().read()
+            latencies.append(time.perf_counter() - started)
+        results[mode] = summarize_latencies(latencies)
+    connection.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark profiling hook overhead")
+    parser.add_argument('--calls', type=int, default=1000000)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--endpoint', default='predict-fail')
+    parser.add_argument('--modes', default='off,sample,cprofile,memory')
+    parser.add_argument('--mock-latency', default='fixed:0.02')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    factories = {name: factory for name, _, factory in DEFAULT_MIX}
+    rng = random.Random(args.seed)
+    payloads = [factories[args.endpoint](rng) for _ in range(args.requests)]
+
+    profile_dir = tempfile.mkdtemp(prefix='whine-profile-bench-')
+    profiling.PROFILE_DIR = profile_dir
+    try:
+        decorator = bench_decorator(args.calls)
+        with local_stack(MockConfig(args.mock_latency, 0.0, 2000.0, args.seed)) as target:
+            requests = bench_requests(target, args.endpoint, payloads, tuple(args.modes.split(',')))
+    finally:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"calls": args.calls, "requests": args.requests, "endpoint": args.endpoint,
+                   "mock_latency": args.mock_latency, "interval_ms": profiling.INTERVAL * 1000},
+        "decorator": decorator,
+        "requests": requests
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
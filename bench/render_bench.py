@@ -0,0 +1,91 @@
+"""
+Meme rendering throughput.
+
+Measures renders/sec for a single process (with warm template and glyph
+caches), for the process pool at 1..N workers, and for output-cache hits.
+
+    python -m bench.render_bench --renders 200 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import render
+
+from .stats import environment
+from .workloads import COMPLAINTS
+
+def texts(count: int) -> list:
+    """Distinct top/bottom pairs so the output cache never hits"""
+    return [
+        (f"WHEN {COMPLAINTS[i % len(COMPLAINTS)].upper()}", f"TAKE {i}: AI STRIKES AGAIN")
+        for i in range(count)
+    ]
+
+def bench_inline(path: str, pairs: list, image_format: str) -> dict:
+    render.render_meme(path, "WARM UP", "THE CACHES", image_format)
+    started = time.perf_counter()
+    for top, bottom in pairs:
+        render.render_meme(path, top, bottom, image_format)
+    elapsed = time.perf_counter() - started
+    return {"renders": len(pairs), "seconds": round(elapsed, 3), "renders_per_sec": round(len(pairs) / elapsed, 2)}
+
+def bench_pool(path: str, pairs: list, image_format: str, workers: int) -> dict:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Warm every worker's template and glyph caches before timing
+        list(pool.map(render.render_meme, [path] * workers, ["WARM"] * workers, ["UP"] * workers, [image_format] * workers))
+        started = time.perf_counter()
+        list(pool.map(render.render_meme, [path] * len(pairs), [p[0] for p in pairs], [p[1] for p in pairs],
+                      [image_format] * len(pairs), chunksize=4))
+        elapsed = time.perf_counter() - started
+    rate = len(pairs) / elapsed
+    return {
+        "workers": workers,
+        "renders": len(pairs),
+        "seconds": round(elapsed, 3),
+        "renders_per_sec": round(rate, 2),
+        "renders_per_sec_per_core": round(rate / workers, 2)
+    }
+
+def bench_cached(meme_type: str, image_format: str, count: int) -> dict:
+    os.environ['WHINE_RENDER_WORKERS'] = '0'
+    render.render_image(meme_type, "CACHED", "RENDER", image_format)
+    started = time.perf_counter()
+    for _ in range(count):
+        render.render_image(meme_type, "CACHED", "RENDER", image_format)
+    elapsed = time.perf_counter() - started
+    return {"lookups": count, "lookups_per_sec": round(count / elapsed, 2)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark server-side meme rendering")
+    parser.add_argument('--renders', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--format', default='png', choices=sorted(render.FORMATS))
+    parser.add_argument('--meme-type', default='classic')
+    args = parser.parse_args()
+
+    if not render.available():
+        print(json.dumps({"error": "Pillow is not installed"}))
+        sys.exit(1)
+
+    path = render.template_path(args.meme_type)
+    pairs = texts(args.renders)
+    worker_counts = sorted({1, *[n for n in (2, 4, 8, 16, 32) if n < args.workers], args.workers})
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"renders": args.renders, "format": args.format, "template": os.path.basename(path)},
+        "inline": bench_inline(path, pairs, args.format),
+        "pool": [bench_pool(path, pairs, args.format, workers) for workers in worker_counts],
+        "cache_hits": bench_cached(args.meme_type, args.format, args.renders * 10)
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
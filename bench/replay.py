@@ -0,0 +1,265 @@
+"""
+Replay captured traffic against a deployment.
+
+Reads the requests.jsonl captures written by api/_lib/capture.py (plain or
+.gz, rotated files oldest first), streams them line by line and re-issues
+each request at its original relative time divided by --speed, with at most
+--concurrency requests in flight. Captures are never loaded into memory:
+a bounded queue sits between the reader and the workers and latencies go
+into fixed-size histograms.
+
+    python -m bench.replay /var/log/whine-captures --speed 10 --concurrency 32
+    python -m bench.replay requests.jsonl.3 requests.jsonl.2 --target http://127.0.0.1:3000
+
+The report lists recorded and replayed latency per endpoint. Recorded
+latency is measured inside the handler and replayed latency over HTTP
+(against a mock provider by default), so the two are not compared:
+regressions are only flagged against --baseline, an earlier replay report
+saved with --output, for endpoints whose p50/p95/p99 grew by more than
+--threshold. Streamed chat replies (NDJSON) are judged by their last frame.
+"""
+
+import argparse
+import contextlib
+import gzip
+import http.client
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from .loadgen import is_error, local_stack
+from .mock_openai import MockConfig
+from .stats import LatencyHistogram, environment
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_rotation_suffix = re.compile(r'\.(\d+)(\.gz)?$')
+
+def capture_files(path: str) -> list:
+    """Expand a capture directory into its files, oldest rotation first"""
+    if not os.path.isdir(path):
+        return [path]
+
+    def age(name):
+        match = _rotation_suffix.search(name)
+        return -int(match.group(1)) if match else 0
+
+    names = [name for name in os.listdir(path) if name.startswith('requests.jsonl')]
+    return [os.path.join(path, name) for name in sorted(names, key=age)]
+
+def iter_records(paths: list, stats: dict):
+    """Yield capture records one at a time across all files"""
+    for path in paths:
+        for filename in capture_files(path):
+            opener = gzip.open if filename.endswith('.gz') else open
+            with opener(filename, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        stats['skipped'] += 1
+                        continue
+                    if 'endpoint' not in record or 'ts' not in record:
+                        stats['skipped'] += 1
+                        continue
+                    yield record
+
+def send_record(target: str, record: dict, timeout: float = 30.0):
+    """Re-issue one captured request and return (status, parsed body or None)"""
+    parts = urlsplit(target)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+    method = record.get('method', 'POST')
+    path = f"/api/{record['endpoint']}"
+    payload = record.get('request') or {}
+    try:
+        if method == 'GET':
+            query = urlencode(payload)
+            conn.request('GET', f"{path}?{query}" if query else path)
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            conn.request(method, path, body=body, headers={
+                'Content-Type': 'application/json',
+                'Content-Length': str(len(body))
+            })
+        response = conn.getresponse()
+        return response.status, parse_body(response.getheader('Content-Type', ''), response.read())
+    finally:
+        conn.close()
+
+def parse_body(content_type: str, raw: bytes):
+    """The JSON body, or the last frame of a streamed reply ("done" or "error"); None if unparseable"""
+    try:
+        if content_type.startswith('application/x-ndjson'):
+            frames = [json.loads(line) for line in raw.splitlines() if line.strip()]
+            return frames[-1] if frames else None
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+class EndpointStats:
+    def __init__(self):
+        self.recorded = LatencyHistogram()
+        self.replayed = LatencyHistogram()
+        self.errors = 0
+
+def replay(target: str, paths: list, speed: float, concurrency: int, limit: int = None) -> dict:
+    """Stream captures against the target and collect per-endpoint histograms"""
+    endpoints = {}
+    lock = threading.Lock()
+    reader_stats = {'skipped': 0, 'dispatched': 0, 'max_lag_ms': 0.0}
+    work = queue.Queue(maxsize=concurrency * 4)
+    done = object()
+
+    def endpoint_stats(name):
+        with lock:
+            stats = endpoints.get(name)
+            if stats is None:
+                stats = endpoints[name] = EndpointStats()
+            return stats
+
+    def worker():
+        while True:
+            record = work.get()
+            if record is done:
+                return
+            stats = endpoint_stats(record['endpoint'])
+            started = time.perf_counter()
+            try:
+                status, body = send_record(target, record)
+                failed = is_error(status, body)
+            except (OSError, http.client.HTTPException):
+                failed = True
+            elapsed = time.perf_counter() - started
+            with lock:
+                stats.replayed.add(elapsed)
+                if 'latency_ms' in record:
+                    stats.recorded.add(record['latency_ms'] / 1000.0)
+                if failed:
+                    stats.errors += 1
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    first_ts = None
+    for record in iter_records(paths, reader_stats):
+        if limit is not None and reader_stats['dispatched'] >= limit:
+            break
+        if first_ts is None:
+            first_ts = record['ts']
+        if speed > 0:
+            due = started + (record['ts'] - first_ts) / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                reader_stats['max_lag_ms'] = max(reader_stats['max_lag_ms'], -wait * 1000)
+        work.put(record)
+        reader_stats['dispatched'] += 1
+
+    for _ in threads:
+        work.put(done)
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    return {
+        "wall_seconds": round(wall, 3),
+        "dispatched": reader_stats['dispatched'],
+        "skipped_lines": reader_stats['skipped'],
+        "max_schedule_lag_ms": round(reader_stats['max_lag_ms'], 3),
+        "endpoints": {
+            name: {
+                "requests": stats.replayed.count,
+                "errors": stats.errors,
+                "error_rate": round(stats.errors / stats.replayed.count, 4) if stats.replayed.count else 0.0,
+                "replayed": stats.replayed.summary(),
+                "recorded": stats.recorded.summary()
+            }
+            for name, stats in sorted(endpoints.items())
+        }
+    }
+
+def find_regressions(endpoints: dict, reference: dict, threshold: float) -> list:
+    """Endpoints whose replayed percentiles grew by more than threshold over the reference"""
+    regressions = []
+    for name, result in endpoints.items():
+        base = reference.get(name)
+        if not base:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            old = base.get(key, 0)
+            new = result["replayed"].get(key, 0)
+            if old and (new - old) / old > threshold:
+                regressions.append({
+                    "endpoint": name,
+                    "metric": key,
+                    "reference_ms": old,
+                    "replayed_ms": new,
+                    "change": round((new - old) / old, 4)
+                })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic and report latency regressions")
+    parser.add_argument('captures', nargs='+', help="Capture files or directories")
+    parser.add_argument('--target', help="Base URL of the deployment (default: start a local stack)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Time compression factor; 0 replays as fast as possible")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--limit', type=int, help="Stop after this many records")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative latency growth that counts as a regression")
+    parser.add_argument('--baseline', help="Previous replay report (--output) to check for latency regressions against")
+    parser.add_argument('--mock-latency', default='lognormal:-2.0,0.5')
+    parser.add_argument('--output', help="Write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    if args.target:
+        stack = contextlib.nullcontext(args.target)
+    else:
+        stack = local_stack(MockConfig(args.mock_latency))
+
+    with stack as target:
+        results = replay(target, args.captures, args.speed, args.concurrency, args.limit)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        reference = {name: stats["replayed"] for name, stats in baseline.get("endpoints", {}).items()}
+        regressions = find_regressions(results["endpoints"], reference, args.threshold)
+    else:
+        # In-handler recorded latency is no reference for HTTP round trips to a mock
+        regressions = None
+        print("No --baseline: latencies reported without a regression check; save this report with "
+              "--output and pass it as --baseline on the next replay", file=sys.stderr)
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {
+            "target": args.target or "local",
+            "captures": args.captures,
+            "speed": args.speed,
+            "concurrency": args.concurrency,
+            "threshold": args.threshold,
+            "baseline": args.baseline
+        },
+        **results,
+        "regressions": regressions
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+if __name__ == '__main__':
+    main()
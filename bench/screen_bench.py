@@ -0,0 +1,74 @@
+"""
+Local spam screening accuracy and cost.
+
+Runs api/_lib/screen.py over the labeled sample and reports how many
+upstream calls it would avoid, how many real complaints it would wrongly
+send to the fallback, and microseconds per check, with and without the
+n-gram model. The holdout rows are the records scripts/train_screen.py
+left out of training.
+
+    python -m bench.screen_bench [--sample bench/data/screen_sample.jsonl]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import screen
+
+from .stats import environment
+
+DEFAULT_SAMPLE = os.path.join(ROOT_DIR, 'bench', 'data', 'screen_sample.jsonl')
+
+def evaluate(records: list, use_model: bool, repeat: int) -> dict:
+    verdicts = [screen.check(record['text'], use_model) for record in records]
+    spam = [v for v, r in zip(verdicts, records) if r['label'] == 'spam']
+    legit = [v for v, r in zip(verdicts, records) if r['label'] != 'spam']
+    rejected = sum(not v.allowed for v in verdicts)
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for record in records:
+            screen.check(record['text'], use_model)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "records": len(records),
+        "upstream_calls_avoided": round(rejected / max(len(records), 1), 4),
+        "spam_caught": round(sum(not v.allowed for v in spam) / max(len(spam), 1), 4),
+        "legit_rejected": round(sum(not v.allowed for v in legit) / max(len(legit), 1), 4),
+        "reasons": dict(Counter(v.reason for v in verdicts if not v.allowed)),
+        "us_per_check": round(elapsed / (repeat * max(len(records), 1)) * 1e6, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local spam screen on a labeled sample")
+    parser.add_argument('--sample', default=DEFAULT_SAMPLE)
+    parser.add_argument('--holdout', type=int, default=5, help="Same split as scripts/train_screen.py")
+    parser.add_argument('--repeat', type=int, default=20, help="Passes over the sample when timing")
+    args = parser.parse_args()
+
+    with open(args.sample, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    holdout = [record for index, record in enumerate(records) if args.holdout > 0 and not index % args.holdout]
+
+    if screen.get_model() is None:
+        print(json.dumps({"error": f"No screening model at {screen.WEIGHTS_PATH}; run scripts/train_screen.py"}))
+        sys.exit(1)
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"sample": os.path.relpath(args.sample, ROOT_DIR), "model_threshold": screen.MODEL_THRESHOLD},
+        "heuristics_only": evaluate(records, False, args.repeat),
+        "with_model": evaluate(records, True, args.repeat),
+        "holdout_with_model": evaluate(holdout, True, args.repeat) if holdout else None
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
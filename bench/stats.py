@@ -0,0 +1,106 @@
+"""
+Small statistics helpers shared by the benchmark scripts
+"""
+
+import math
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Linear-interpolated percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+def summarize_latencies(latencies: list) -> dict:
+    """p50/p95/p99/mean/max in milliseconds"""
+    values = sorted(latencies)
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3)
+    }
+
+def git_revision(root: str) -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=root, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def environment(root: str) -> dict:
+    """Metadata that makes results comparable across commits and machines"""
+    return {
+        "commit": git_revision(root),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+class LatencyHistogram:
+    """
+    Fixed-size log-bucketed latency histogram.
+    Memory stays constant no matter how many samples are added, with
+    percentiles accurate to within one bucket (about 2.5%).
+    """
+
+    def __init__(self, min_seconds: float = 0.0001, max_seconds: float = 300.0, ratio: float = 1.05):
+        self.min_seconds = min_seconds
+        self.ratio = ratio
+        self._log_ratio = math.log(ratio)
+        size = int(math.ceil(math.log(max_seconds / min_seconds) / self._log_ratio)) + 2
+        self.buckets = [0] * size
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float):
+        if seconds <= self.min_seconds:
+            index = 0
+        else:
+            index = min(len(self.buckets) - 1, 1 + int(math.log(seconds / self.min_seconds) / self._log_ratio))
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct: float) -> float:
+        if not self.count:
+            return 0.0
+        target = self.count * pct / 100.0
+        seen = 0
+        for index, bucket in enumerate(self.buckets):
+            seen += bucket
+            if bucket and seen >= target:
+                if index == 0:
+                    return self.min_seconds
+                # Geometric midpoint of the bucket, capped at the observed max
+                upper = self.min_seconds * self.ratio ** index
+                return min(self.max, upper / math.sqrt(self.ratio))
+        return self.max
+
+    def summary(self) -> dict:
+        """Same shape as summarize_latencies, in milliseconds"""
+        return {
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p95_ms": round(self.percentile(95) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3)
+        }
@@ -0,0 +1,98 @@
+"""
+Admission of a lone tournament's match commentary.
+
+Runs the mock provider in-process with slow calls (--mock-latency, 1s by
+default) and commentates one --entrants bracket on an otherwise idle
+instance, with fresh complaints so no match is served from the pair cache.
+Reports how many matches the admission controller admitted and shed and
+how many fell back to the templates. Then replays the first --rematches
+pairs with the corners swapped, which must all be served from the pair
+cache with the labels swapped. A lone tournament must not shed its own
+calls, so any shed match or missed rematch makes the exit status 1.
+
+    python -m bench.tournament_bench [--entrants 64] [--mock-latency fixed:1.0]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import admission, metrics
+from _lib.endpoints import load_endpoint
+
+from .mock_openai import MockConfig, start_mock_server
+from .stats import environment
+from .workloads import COMPLAINTS
+
+def check_rematches(tournament, complaints) -> dict:
+    """Each pair in the other order must be a cache hit with the labels swapped"""
+    failed = []
+    pairs = list(zip(complaints[::2], complaints[1::2]))
+    for complaint1, complaint2 in pairs:
+        commentary, _ = tournament.get_match_commentary(complaint1, complaint2)
+        rematch, cached = tournament.get_match_commentary(complaint2, complaint1)
+        if not cached or rematch != tournament.swap_labels(commentary):
+            failed.append({"complaint1": complaint1, "complaint2": complaint2, "cached": cached})
+    return {"pairs": len(pairs), "failed": failed}
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a lone tournament is not shed by admission control")
+    parser.add_argument('--entrants', type=int, default=64)
+    parser.add_argument('--mock-latency', default='fixed:1.0')
+    parser.add_argument('--rematches', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    # Numbered so every pair is new to the commentary cache
+    complaints = [f"{rng.choice(COMPLAINTS)} #{index}" for index in range(args.entrants)]
+
+    config = MockConfig(args.mock_latency, 0.0, 0.0, args.seed)
+    server, base_url = start_mock_server(config)
+    saved = {key: os.environ.get(key) for key in ('OPENAI_API_KEY', 'OPENAI_BASE_URL')}
+    os.environ.update(OPENAI_API_KEY='sk-mock-benchmark', OPENAI_BASE_URL=base_url)
+    try:
+        tournament = load_endpoint('battle-tournament')
+        before = metrics.snapshot()["admission"]["classes"]["batch"]
+        started = time.perf_counter()
+        # Handlers print shed calls; keep the report clean
+        with contextlib.redirect_stdout(sys.stderr):
+            result = tournament.run_tournament(complaints)
+        elapsed = time.perf_counter() - started
+        after = metrics.snapshot()["admission"]["classes"]["batch"]
+        provider_calls = config.requests
+        rematches = check_rematches(tournament, complaints[:args.rematches * 2])
+    finally:
+        server.shutdown()
+        server.server_close()
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    counts = {key: after[key] - before[key] for key in after}
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"entrants": args.entrants, "mock_latency": args.mock_latency,
+                   "admission_limit": admission.LIMIT, "tournament_workers": tournament.MAX_WORKERS},
+        "matches": result["matches"],
+        "admitted": counts["admitted"],
+        "shed": counts["shed"] + counts["evicted"],
+        # Every match without a provider call got template commentary
+        "fallback_commentary": result["matches"] - provider_calls,
+        "rematches": rematches,
+        "seconds": round(elapsed, 3)
+    }
+    print(json.dumps(report, indent=2))
+    if report["shed"] or rematches["failed"]:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
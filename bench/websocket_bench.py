@@ -0,0 +1,215 @@
+"""
+WhineBot chat over WebSocket versus one POST per message.
+
+Latency: runs the mock provider and the app server in-process and sends
+the same messages as POST /api/chat (optionally preceded by the CORS
+preflight a cross-origin page pays) and over one /ws/chat connection,
+reporting time to the full reply and, for the socket, to the first token.
+
+Memory: starts `python -m server` as a subprocess, opens --idle-sessions
+WebSocket sessions that never send anything, and reports the server's
+resident memory and thread count before and after, scaled to 10k sessions.
+
+    python -m bench.websocket_bench [--messages 200] [--idle-sessions 10000]
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import os
+import random
+import socket
+import struct
+import subprocess
+import sys
+import time
+import urllib.request
+
+from server.websocket import OP_CLOSE, OP_TEXT, accept_key, encode_frame
+
+from .loadgen import local_stack
+from .mock_openai import MockConfig
+from .stats import environment, summarize_latencies
+from .workloads import CHAT_MESSAGES
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Operator token the benchmark's own server is started with, for /api/metrics
+OPS_TOKEN = 'websocket-bench'
+
+class Client:
+    """Just enough of a WebSocket client for the benchmark"""
+
+    def __init__(self, host: str, port: int, path: str):
+        self.sock = socket.create_connection((host, port))
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        self.sock.sendall((
+            f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        ).encode('ascii'))
+        self.buffer = b''
+        while b'\r\n\r\n' not in self.buffer:
+            chunk = self.sock.recv(4096)
+            if not chunk:
+                raise ConnectionError("connection closed during handshake")
+            self.buffer += chunk
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        if b' 101 ' not in head.split(b'\r\n', 1)[0] or accept_key(key).encode('ascii') not in head:
+            raise ConnectionError(f"handshake failed: {head[:200]!r}")
+
+    def _read(self, count: int) -> bytes:
+        while len(self.buffer) < count:
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("connection closed")
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:count], self.buffer[count:]
+        return data
+
+    def send(self, text: str):
+        self.sock.sendall(encode_frame(OP_TEXT, text.encode('utf-8'), os.urandom(4)))
+
+    def receive(self) -> dict:
+        first, second = self._read(2)
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self._read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._read(8))[0]
+        payload = self._read(length)
+        if first & 0x0F == OP_CLOSE:
+            raise ConnectionError(f"closed by server: {payload[2:]!r}")
+        return json.loads(payload)
+
+    def close(self):
+        try:
+            self.sock.sendall(encode_frame(OP_CLOSE, struct.pack('!H', 1000), os.urandom(4)))
+        except OSError:
+            pass
+        self.sock.close()
+
+def post_chat(host: str, port: int, payload: dict, preflight: bool):
+    if preflight:
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        connection.request('OPTIONS', '/api/chat', headers={
+            'Origin': 'https://example.com',
+            'Access-Control-Request-Method': 'POST',
+            'Access-Control-Request-Headers': 'content-type'
+        })
+        connection.getresponse().read()
+        connection.close()
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    connection.request('POST', '/api/chat', body=json.dumps(payload), headers={'Content-Type': 'application/json'})
+    body = connection.getresponse().read()
+    connection.close()
+    return json.loads(body)
+
+def bench_latency(target: str, messages: list) -> dict:
+    host, port = target.split('//', 1)[1].split(':')
+    port = int(port)
+    results = {}
+    for name, preflight in (("post", False), ("preflight_post", True)):
+        latencies = []
+        for message in messages:
+            started = time.perf_counter()
+            post_chat(host, port, {"message": message, "conversation_id": "bench-http"}, preflight)
+            latencies.append(time.perf_counter() - started)
+        results[name] = summarize_latencies(latencies)
+
+    client = Client(host, port, '/ws/chat')
+    client.receive()
+    done, first_token = [], []
+    for message in messages:
+        started = time.perf_counter()
+        client.send(json.dumps({"message": message}))
+        reply = client.receive()
+        first_token.append(time.perf_counter() - started)
+        while reply["type"] == "token":
+            reply = client.receive()
+        done.append(time.perf_counter() - started)
+    client.close()
+    results["websocket"] = summarize_latencies(done)
+    results["websocket_first_token"] = summarize_latencies(first_token)
+    return results
+
+def process_status(pid: int) -> dict:
+    status = {}
+    with open(f'/proc/{pid}/status') as f:
+        for line in f:
+            name, _, value = line.partition(':')
+            status[name] = value.strip()
+    return {"rss_kib": int(status['VmRSS'].split()[0]), "threads": int(status['Threads'])}
+
+def open_sessions(target: str) -> int:
+    request = urllib.request.Request(f"{target}/api/metrics", headers={'X-Whine-Token': OPS_TOKEN})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())["metrics"].get("websocket", {}).get("open", 0)
+
+def bench_idle_memory(sessions: int) -> dict:
+    environment_vars = {key: value for key, value in os.environ.items() if key != 'OPENAI_API_KEY'}
+    environment_vars['PYTHONUNBUFFERED'] = '1'
+    environment_vars['WHINE_OPS_TOKEN'] = OPS_TOKEN
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'server', '--port', '0', '--quiet'],
+        cwd=ROOT_DIR, env=environment_vars, stdout=subprocess.PIPE, text=True
+    )
+    try:
+        target = server.stdout.readline().strip().rsplit(' ', 1)[-1]
+        host, port = target.split('//', 1)[1].split(':')
+        # Warm every code path once so imports are not counted as session cost
+        warm = Client(host, int(port), '/ws/chat')
+        warm.receive()
+        warm.close()
+        time.sleep(0.5)
+        before = process_status(server.pid)
+
+        clients = []
+        started = time.perf_counter()
+        for index in range(sessions):
+            clients.append(Client(host, int(port), '/ws/chat'))
+        connect_seconds = time.perf_counter() - started
+        while open_sessions(target) < sessions:
+            time.sleep(0.1)
+        time.sleep(0.5)
+        after = process_status(server.pid)
+
+        for client in clients:
+            client.sock.close()
+        per_session = (after["rss_kib"] - before["rss_kib"]) * 1024 / max(sessions, 1)
+        return {
+            "sessions": sessions,
+            "before": before,
+            "after": after,
+            "bytes_per_session": round(per_session),
+            "mib_per_10k_sessions": round(per_session * 10000 / 2 ** 20, 1),
+            "connects_per_sec": round(sessions / connect_seconds, 1)
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket chat latency and idle session memory")
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--idle-sessions', type=int, default=10000)
+    parser.add_argument('--mock-latency', default='fixed:0.02')
+    parser.add_argument('--mock-tokens-per-second', type=float, default=2000.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    messages = [rng.choice(CHAT_MESSAGES) for _ in range(args.messages)]
+    mock_config = MockConfig(args.mock_latency, 0.0, args.mock_tokens_per_second, args.seed)
+    with local_stack(mock_config) as target:
+        latency = bench_latency(target, messages)
+
+    report = {
+        "meta": environment(ROOT_DIR),
+        "config": {"messages": args.messages, "mock": mock_config.as_dict()},
+        "latency": latency,
+        "idle_memory": bench_idle_memory(args.idle_sessions) if args.idle_sessions else None
+    }
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Realistic request mixes for every API endpoint.
+Weights approximate production traffic: chat and complaint submission
+dominate, the generator tools follow, contact is rare.
+"""
+
+COMPLAINTS = [
+    "Siri set an alarm for 3 AM instead of calling my mom",
+    "Autocorrect changed 'meeting' to 'mating' in an email to my boss",
+    "My smart fridge ordered 50 pizzas while I was on vacation",
+    "ChatGPT confidently told me the Eiffel Tower is in Rome",
+    "Google Maps routed me through a lake",
+    "Alexa started playing polka at full volume at midnight",
+    "The work AI scheduled my performance review on a Sunday",
+    "My smart thermostat decided winter is a myth",
+    "The chatbot asked me to verify I'm human four times",
+    "Autocorrect turned 'thanks' into 'tanks' in my wedding toast",
+    "GPS told me to turn left into a cornfield",
+    "My robot vacuum ate a sock and then sent me a push notification about it",
+]
+
+CATEGORIES = [
+    "Smart Home Fails",
+    "Chatbot Chaos",
+    "Autocorrect Anarchy",
+    "Navigation Nightmares",
+    "Work AI Woes",
+    "General AI Grief",
+]
+
+SCENARIOS = [
+    "Using AI to plan my wedding",
+    "Letting a smart oven cook Thanksgiving dinner",
+    "A job interview over a video call with auto-captions",
+    "Taking a road trip with only voice navigation",
+    "Asking a chatbot to do my taxes",
+]
+
+STYLES = ["sarcastic", "dramatic", "absurd", "professional"]
+
+CHAT_MESSAGES = [
+    "Why does my phone keep autocorrecting my name?",
+    "ChatGPT wrote me a poem about cheese when I asked for help with SQL",
+    "Alexa won't stop recommending cat food and I don't have a cat",
+    "Is it normal that my smart TV judges my viewing habits?",
+    "help",
+]
+
+def _pick(rng, items):
+    return items[rng.randrange(len(items))]
+
+def chat(rng):
+    return {"message": _pick(rng, CHAT_MESSAGES), "conversation_id": f"bench-{rng.randrange(50)}"}
+
+def submit_complaint(rng):
+    return {
+        "complaint": _pick(rng, COMPLAINTS),
+        "category": _pick(rng, CATEGORIES),
+        "angerLevel": rng.randint(1, 10)
+    }
+
+def create_meme(rng):
+    return {"complaint": _pick(rng, COMPLAINTS)}
+
+def generate_comeback(rng):
+    return {"complaint": _pick(rng, COMPLAINTS)}
+
+def predict_fail(rng):
+    return {"scenario": _pick(rng, SCENARIOS)}
+
+def enhance_complaint(rng):
+    return {"text": _pick(rng, COMPLAINTS), "style": _pick(rng, STYLES)}
+
+def battle_commentary(rng):
+    first = rng.randrange(len(COMPLAINTS))
+    second = (first + 1 + rng.randrange(len(COMPLAINTS) - 1)) % len(COMPLAINTS)
+    return {"complaint1": COMPLAINTS[first], "complaint2": COMPLAINTS[second]}
+
+def contact(rng):
+    return {
+        "name": "Bench Marker",
+        "email": "bench@example.com",
+        "subject": _pick(rng, ["general", "bug", "feature", "complaint"]),
+        "message": _pick(rng, COMPLAINTS),
+        "frustrationLevel": str(rng.randint(1, 10))
+    }
+
+# (endpoint, weight, payload factory)
+DEFAULT_MIX = [
+    ("chat", 30, chat),
+    ("submit-complaint", 25, submit_complaint),
+    ("create-meme", 10, create_meme),
+    ("generate-comeback", 10, generate_comeback),
+    ("predict-fail", 8, predict_fail),
+    ("enhance-complaint", 8, enhance_complaint),
+    ("battle-commentary", 7, battle_commentary),
+    ("contact", 2, contact),
+]
+
+def battle_tournament(rng):
+    size = rng.choice([4, 8, 16])
+    return {"complaints": [rng.choice(COMPLAINTS) + f" (round {i})" for i in range(size)]}
+
+# Endpoints outside the default mix, reachable with --endpoint
+EXTRA_WORKLOADS = [
+    ("battle-tournament", 1, battle_tournament),
+]
+
+def only(endpoint: str) -> list:
+    """Restrict the mix to a single endpoint"""
+    mix = [entry for entry in DEFAULT_MIX + EXTRA_WORKLOADS if entry[0] == endpoint]
+    if not mix:
+        raise KeyError(f"No workload for endpoint: {endpoint}")
+    return mix
@@ -0,0 +1,227 @@
+"""
+Build the static site into dist/.
+
+- Minifies the HTML pages and their inline CSS and JavaScript
+- Fingerprints favicon.ico and whine-about-ai-share.jpg (name.<hash>.ext)
+  and points the pages at the fingerprinted copies
+- Writes precompressed .gz (and .br when the brotli package is installed)
+  siblings for every text asset
+- With --update-vercel-config, rewrites vercel.json so Vercel builds into
+  dist/ and serves fingerprinted assets as immutable (run it when the
+  fingerprinted file types change, and commit the result)
+- Prints a per-file size and transfer report
+
+    python scripts/build_static.py [--output dist] [--update-vercel-config]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ['index.html', 'ai-tools.html', 'contact.html', 'privacy-policy.html', 'terms-of-service.html']
+FINGERPRINTED = ['favicon.ico', 'whine-about-ai-share.jpg']
+COPIED = ['robots.txt', 'sitemap-pages.xml', 'ads.txt']
+COMPRESSIBLE = ('.html', '.txt', '.xml', '.ico', '.css', '.js', '.svg')
+
+FINGERPRINT_LENGTH = 10
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+# Whitespace inside these elements is significant or code, handled separately
+_raw_blocks = re.compile(r'(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)', re.S | re.I)
+_html_comment = re.compile(r'<!--(?!\[).*?-->', re.S)
+_css_comment = re.compile(r'/\*.*?\*/', re.S)
+
+def minify_css(css: str) -> str:
+    css = _css_comment.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    # Spaces before ':' can be a descendant selector, so only trim after it
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+def minify_js(js: str) -> str:
+    """
+    Conservative: drop indentation, blank lines and whole-line // comments.
+    Line breaks stay, so automatic semicolon insertion behaves as before.
+    """
+    lines = []
+    for line in js.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        lines.append(stripped)
+    return '\n'.join(lines)
+
+def _collapse_whitespace(html: str) -> str:
+    html = _html_comment.sub('', html)
+    # Keep one newline where there was one, so inline element spacing survives
+    html = re.sub(r'[ \t]*\n\s*', '\n', html)
+    return re.sub(r'[ \t]{2,}', ' ', html)
+
+def minify_html(html: str) -> str:
+    parts = []
+    position = 0
+    for match in _raw_blocks.finditer(html):
+        parts.append(_collapse_whitespace(html[position:match.start()]))
+        opening, tag, body, closing = match.group(1), match.group(2).lower(), match.group(3), match.group(4)
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script':
+            body = minify_js(body)
+        parts.append(_collapse_whitespace(opening) + body + closing)
+        position = match.end()
+    parts.append(_collapse_whitespace(html[position:]))
+    return ''.join(parts).strip() + '\n'
+
+def fingerprint_name(name: str, data: bytes) -> str:
+    stem, extension = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]}{extension}"
+
+def rewrite_references(html: str, renames: dict) -> str:
+    """Point absolute and root-relative references at the fingerprinted names"""
+    for original, fingerprinted in renames.items():
+        html = re.sub(r'(?<=/)' + re.escape(original) + r'(?=["\'?#])', fingerprinted, html)
+    return html
+
+def gzip_bytes(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte-identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def write_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def write_compressed(path: str, data: bytes) -> dict:
+    """Write .gz/.br siblings when they are smaller; returns the sizes written"""
+    sizes = {"gzip": None, "brotli": None}
+    if not path.endswith(COMPRESSIBLE):
+        return sizes
+    gzipped = gzip_bytes(data)
+    if len(gzipped) < len(data):
+        write_file(path + '.gz', gzipped)
+        sizes["gzip"] = len(gzipped)
+    if brotli:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            write_file(path + '.br', compressed)
+            sizes["brotli"] = len(compressed)
+    return sizes
+
+def vercel_headers(renames: dict) -> list:
+    """Cache rules: pages always revalidate, fingerprinted assets never change"""
+    extensions = sorted({os.path.splitext(name)[1].lstrip('.') for name in renames})
+    # Later matching rules win, so the immutable rule overrides the default
+    return [
+        {
+            "source": "/((?!api/).*)",
+            "headers": [{"key": "Cache-Control", "value": REVALIDATE}]
+        },
+        {
+            "source": f"/(.*)\\.([0-9a-f]{{{FINGERPRINT_LENGTH}}})\\.({'|'.join(extensions)})",
+            "headers": [{"key": "Cache-Control", "value": IMMUTABLE}]
+        }
+    ]
+
+def update_vercel_config(renames: dict, output: str, root: str = ROOT_DIR):
+    path = os.path.join(root, 'vercel.json')
+    with open(path) as f:
+        config = json.load(f)
+    config["buildCommand"] = "python3 scripts/build_static.py"
+    config["outputDirectory"] = os.path.relpath(output, root)
+    config["headers"] = vercel_headers(renames)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write('\n')
+
+def build(output: str, root: str = ROOT_DIR) -> tuple:
+    """Build the site into output; returns report rows and the fingerprint renames"""
+    if os.path.isdir(output):
+        shutil.rmtree(output)
+    os.makedirs(output)
+
+    report = []
+    renames = {}
+    for name in FINGERPRINTED:
+        with open(os.path.join(root, name), 'rb') as f:
+            data = f.read()
+        renames[name] = fingerprint_name(name, data)
+        # Keep the plain name too: browsers probe /favicon.ico and old shares link the jpg
+        for target in (name, renames[name]):
+            write_file(os.path.join(output, target), data)
+            sizes = write_compressed(os.path.join(output, target), data)
+        report.append(_row(renames[name], data, data, sizes))
+
+    for name in PAGES:
+        with open(os.path.join(root, name), encoding='utf-8') as f:
+            original = f.read()
+        built = rewrite_references(minify_html(original), renames).encode('utf-8')
+        write_file(os.path.join(output, name), built)
+        report.append(_row(name, original.encode('utf-8'), built, write_compressed(os.path.join(output, name), built)))
+
+    for name in COPIED:
+        source = os.path.join(root, name)
+        if not os.path.exists(source):
+            continue
+        with open(source, 'rb') as f:
+            data = f.read()
+        write_file(os.path.join(output, name), data)
+        report.append(_row(name, data, data, write_compressed(os.path.join(output, name), data)))
+
+    return report, renames
+
+def _row(name: str, original: bytes, built: bytes, sizes: dict) -> dict:
+    compressible = name.endswith(COMPRESSIBLE)
+    return {
+        "file": name,
+        "original": len(original),
+        "original_gzip": min(len(gzip_bytes(original)), len(original)) if compressible else len(original),
+        "built": len(built),
+        "gzip": sizes["gzip"],
+        "brotli": sizes["brotli"]
+    }
+
+def print_report(report: list):
+    print(f"{'file':<36} {'original':>9} {'orig gz':>9} {'minified':>9} {'gzip':>9} {'brotli':>9} {'transfer':>9}")
+    totals = {"before": 0, "after": 0}
+    for row in report:
+        best = min(size for size in (row["built"], row["gzip"], row["brotli"]) if size is not None)
+        totals["before"] += row["original_gzip"]
+        totals["after"] += best
+        print(
+            f"{row['file']:<36} {row['original']:>9} {row['original_gzip']:>9} {row['built']:>9} "
+            f"{row['gzip'] or '-':>9} {row['brotli'] or '-':>9} {best:>9}"
+        )
+    saved = totals["before"] - totals["after"]
+    print(f"\nTransfer: {totals['before']} -> {totals['after']} bytes ({saved / max(totals['before'], 1):.1%} smaller)")
+    if not brotli:
+        print("brotli is not installed; only .gz siblings were written")
+
+def main():
+    parser = argparse.ArgumentParser(description="Minify, fingerprint and precompress the static site")
+    parser.add_argument('--output', default=os.path.join(ROOT_DIR, 'dist'))
+    parser.add_argument('--update-vercel-config', action='store_true',
+                        help="Rewrite vercel.json's build settings and cache headers for this build")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    report, renames = build(output)
+    if args.update_vercel_config:
+        update_vercel_config(renames, output)
+    print_report(report)
+    print(f"Wrote {output}")
+
+if __name__ == '__main__':
+    sys.exit(main())
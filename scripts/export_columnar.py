@@ -0,0 +1,294 @@
+"""
+Export captured traffic (WHINE_CAPTURE_DIR) to columnar files for analytics.
+
+Reads requests.jsonl and its rotated siblings and writes one file per
+(day, category) partition and source segment:
+
+    <output>/day=2024-01-01/category=chatbot-chaos/part-<segment>-<offset>.parquet
+
+Parquet (via pyarrow) is used when installed. Without pyarrow each part is a
+directory of raw little-endian column files plus meta.json, the layout
+numpy.fromfile/np.memmap read directly. Low-cardinality strings (endpoint,
+method, category, provider) are dictionary-encoded in both formats.
+
+The export is incremental. Capture files rotate by renaming, so segments
+are identified by a hash of their first line rather than their name, and
+<output>/_export_state.json records how many bytes of each have been
+converted. Each run converts only complete lines appended since the last
+run. Part names are derived from (segment, start offset), so a run that
+died before saving state is simply redone.
+
+    python scripts/export_columnar.py /var/log/whine-captures --output exports/ [--format auto|parquet|columns]
+"""
+
+import argparse
+import array
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+CAPTURE_FILE = 'requests.jsonl'
+STATE_FILE = '_export_state.json'
+UNCATEGORIZED = 'uncategorized'
+
+# Request/response fields holding the user's text and the generated answer, first match wins
+TEXT_FIELDS = ('complaint', 'message', 'scenario', 'text', 'complaint1')
+RESPONSE_FIELDS = ('response', 'comeback', 'prediction', 'enhanced', 'commentary', 'top_text')
+
+# name -> (kind, array typecode); kinds: float, int, dict (dictionary-encoded string), text
+SCHEMA = {
+    'ts': ('float', 'd'),
+    'endpoint': ('dict', 'h'),
+    'method': ('dict', 'b'),
+    'status': ('int', 'h'),
+    'latency_ms': ('float', 'f'),
+    'category': ('dict', 'h'),
+    'anger_level': ('int', 'b'),
+    'provider': ('dict', 'h'),
+    'conversation_id': ('text', None),
+    'text': ('text', None),
+    'response_text': ('text', None)
+}
+NUMPY_DTYPES = {'d': '<f8', 'f': '<f4', 'h': '<i2', 'b': 'i1', 'q': '<i8'}
+# Missing integers in the raw format; Parquet uses real nulls
+NULL_INT = -1
+
+def slug(value: str) -> str:
+    return re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-') or UNCATEGORIZED
+
+def capture_segments(directory: str) -> list:
+    """Capture files, oldest first (highest rotation number first, live file last)"""
+    names = [name for name in os.listdir(directory) if name == CAPTURE_FILE or name.startswith(CAPTURE_FILE + '.')]
+    def rotation(name):
+        suffix = name[len(CAPTURE_FILE) + 1:]
+        return -int(suffix) if suffix.isdigit() else 0
+    return [os.path.join(directory, name) for name in sorted(names, key=rotation)]
+
+def segment_id(path: str):
+    """Stable id of a capture file across renames: hash of its first line"""
+    with open(path, 'rb') as f:
+        first = f.readline()
+    if not first.endswith(b'\n'):
+        return None
+    return hashlib.sha1(first).hexdigest()[:16]
+
+def first_value(payload: dict, fields: tuple):
+    for field in fields:
+        value = payload.get(field)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+def flatten(record: dict) -> dict:
+    """One capture record as a row of SCHEMA columns"""
+    request = record.get('request') or {}
+    response = record.get('response') or {}
+    anger = request.get('angerLevel', request.get('anger_level'))
+    try:
+        anger = int(anger) if anger is not None else None
+    except (TypeError, ValueError):
+        anger = None
+    return {
+        'ts': float(record.get('ts') or 0.0),
+        'endpoint': record.get('endpoint') or 'unknown',
+        'method': record.get('method') or 'POST',
+        'status': int(record.get('status') or 0),
+        'latency_ms': float(record.get('latency_ms') or 0.0),
+        'category': request.get('category') or UNCATEGORIZED,
+        'anger_level': anger,
+        'provider': response.get('provider') or 'unknown',
+        'conversation_id': request.get('conversation_id'),
+        'text': first_value(request, TEXT_FIELDS),
+        'response_text': first_value(response, RESPONSE_FIELDS)
+    }
+
+def read_new_rows(path: str, offset: int, stats: dict) -> tuple:
+    """Rows from complete lines after offset, and the offset after the last complete line"""
+    rows = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b'\n'):
+                break  # Still being written; pick it up next run
+            offset += len(line)
+            try:
+                rows.append(flatten(json.loads(line)))
+            except (ValueError, AttributeError, TypeError):
+                stats["bad_lines"] += 1
+    return rows, offset
+
+def partition_key(row: dict) -> tuple:
+    day = datetime.fromtimestamp(row['ts'], timezone.utc).strftime('%Y-%m-%d')
+    return day, slug(row['category'])
+
+def _replace_atomically(temp_path: str, path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    os.replace(temp_path, path)
+
+def write_parquet(rows: list, path: str):
+    columns = {}
+    for name, (kind, _) in SCHEMA.items():
+        values = [row[name] for row in rows]
+        if kind == 'dict':
+            columns[name] = pyarrow.array(values, pyarrow.string()).dictionary_encode()
+        elif kind == 'float':
+            columns[name] = pyarrow.array(values, pyarrow.float64() if name == 'ts' else pyarrow.float32())
+        elif kind == 'int':
+            columns[name] = pyarrow.array(values, pyarrow.int16() if name == 'status' else pyarrow.int8())
+        else:
+            columns[name] = pyarrow.array(values, pyarrow.string())
+    temp_path = path + '.tmp'
+    pyarrow.parquet.write_table(pyarrow.table(columns), temp_path, compression='zstd')
+    _replace_atomically(temp_path, path)
+
+def _write_array(path: str, values: array.array):
+    if sys.byteorder != 'little':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    with open(path, 'wb') as f:
+        values.tofile(f)
+
+def write_columns(rows: list, path: str):
+    """Raw column files: <name>.bin (plus <name>.offsets for text) and meta.json"""
+    temp_path = path + '.tmp'
+    if os.path.isdir(temp_path):
+        shutil.rmtree(temp_path)
+    os.makedirs(temp_path)
+    meta = {"rows": len(rows), "columns": {}}
+    for name, (kind, typecode) in SCHEMA.items():
+        values = [row[name] for row in rows]
+        column = {"kind": kind}
+        if kind == 'dict':
+            dictionary = sorted(set(values))
+            codes = {value: code for code, value in enumerate(dictionary)}
+            _write_array(os.path.join(temp_path, f'{name}.bin'), array.array(typecode, [codes[value] for value in values]))
+            column.update(dtype=NUMPY_DTYPES[typecode], dictionary=dictionary)
+        elif kind == 'text':
+            encoded = [(value or '').encode('utf-8') for value in values]
+            offsets = array.array('q', [0])
+            for item in encoded:
+                offsets.append(offsets[-1] + len(item))
+            with open(os.path.join(temp_path, f'{name}.bin'), 'wb') as f:
+                f.write(b''.join(encoded))
+            _write_array(os.path.join(temp_path, f'{name}.offsets'), offsets)
+            column.update(dtype='utf8', offsets_dtype=NUMPY_DTYPES['q'])
+        else:
+            if kind == 'int':
+                values = [NULL_INT if value is None else value for value in values]
+                column["null"] = NULL_INT
+            _write_array(os.path.join(temp_path, f'{name}.bin'), array.array(typecode, values))
+            column["dtype"] = NUMPY_DTYPES[typecode]
+        meta["columns"][name] = column
+    with open(os.path.join(temp_path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    _replace_atomically(temp_path, path)
+
+def read_meta(part: str) -> dict:
+    with open(os.path.join(part, 'meta.json')) as f:
+        return json.load(f)
+
+def read_column(part: str, name: str, meta: dict = None) -> tuple:
+    """(values, dictionary) from a raw-format part; dictionary is None unless dictionary-encoded"""
+    meta = meta or read_meta(part)
+    column = meta["columns"][name]
+    if column["kind"] == 'text':
+        offsets = _read_array(os.path.join(part, f'{name}.offsets'), 'q')
+        with open(os.path.join(part, f'{name}.bin'), 'rb') as f:
+            blob = f.read()
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)], None
+    typecode = SCHEMA[name][1]
+    return _read_array(os.path.join(part, f'{name}.bin'), typecode), column.get("dictionary")
+
+def _read_array(path: str, typecode: str) -> array.array:
+    values = array.array(typecode)
+    with open(path, 'rb') as f:
+        values.frombytes(f.read())
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+def load_state(output: str) -> dict:
+    try:
+        with open(os.path.join(output, STATE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"segments": {}}
+
+def save_state(output: str, state: dict):
+    path = os.path.join(output, STATE_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+def export(capture_dir: str, output: str, output_format: str = 'auto') -> dict:
+    """Convert everything new since the last run; returns a summary"""
+    if output_format == 'auto':
+        output_format = 'parquet' if pyarrow else 'columns'
+    if output_format == 'parquet' and not pyarrow:
+        raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+    write = write_parquet if output_format == 'parquet' else write_columns
+    extension = '.parquet' if output_format == 'parquet' else ''
+
+    os.makedirs(output, exist_ok=True)
+    state = load_state(output)
+    if state.get("format", output_format) != output_format:
+        raise RuntimeError(f"{output} holds {state['format']} exports; use a new output directory to switch formats")
+    stats = {"segments": 0, "rows": 0, "parts": 0, "bad_lines": 0, "bytes_read": 0}
+    started = time.perf_counter()
+    seen = {}
+
+    for path in capture_segments(capture_dir):
+        segment = segment_id(path)
+        if segment is None:
+            continue
+        entry = state["segments"].get(segment, {"offset": 0})
+        seen[segment] = entry
+        size = os.path.getsize(path)
+        if size <= entry["offset"]:
+            continue
+        rows, offset = read_new_rows(path, entry["offset"], stats)
+        partitions = defaultdict(list)
+        for row in rows:
+            partitions[partition_key(row)].append(row)
+        for (day, category), part_rows in sorted(partitions.items()):
+            directory = os.path.join(output, f'day={day}', f'category={category}')
+            os.makedirs(directory, exist_ok=True)
+            write(part_rows, os.path.join(directory, f'part-{segment}-{entry["offset"]:012d}{extension}'))
+            stats["parts"] += 1
+        stats["segments"] += 1
+        stats["rows"] += len(rows)
+        stats["bytes_read"] += offset - entry["offset"]
+        entry.update(offset=offset, file=os.path.basename(path))
+
+    # Segments that rotated out of the capture directory will not come back
+    state = {"format": output_format, "segments": seen, "updated": time.time()}
+    save_state(output, state)
+    stats["format"] = output_format
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Export captured traffic to partitioned columnar files")
+    parser.add_argument('capture_dir', nargs='?', default=os.getenv('WHINE_CAPTURE_DIR'))
+    parser.add_argument('--output', required=True)
+    parser.add_argument('--format', choices=('auto', 'parquet', 'columns'), default='auto')
+    args = parser.parse_args()
+    if not args.capture_dir:
+        parser.error("capture directory required (or set WHINE_CAPTURE_DIR)")
+
+    print(json.dumps(export(args.capture_dir, args.output, args.format), indent=2))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""
+Re-score stored complaints into the submission categories in bulk.
+
+The category picked in the submit form is often wrong. This job predicts
+one of CATEGORIES for every complaint from hashed word and word-pair
+features, using the battle-commentary keyword lexicon (CATEGORY_KEYWORDS)
+mapped onto the form's categories plus WORK_KEYWORDS, so /api/battle-commentary
+and the stored categories stop disagreeing. Complaints with no evidence
+keep the category they were submitted with.
+
+Sources are capture files or directories (WHINE_CAPTURE_DIR; only
+submit-complaint records are read), JSON-lines files of
+{"complaint", "category"} records, and the complaint store (--db).
+Files are memory-mapped and read --chunk-mb at a time on line
+boundaries; the store is read --chunk-rows at a time, so memory stays
+bounded however large the input.
+
+With NumPy each chunk is scored at once: token hashes, a sparse
+document x feature matrix (SciPy CSR when installed, numpy.bincount
+otherwise) times the dense feature x category weights, then argmax.
+Without NumPy, or with --engine python, the same model runs as a plain
+per-complaint loop. --baseline runs both and reports complaints/sec for
+each and whether they agree.
+
+    python scripts/recategorize.py /var/log/whine-captures [--db whine-complaints.sqlite3 --apply] [--changes changes.jsonl] [--baseline]
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from collections import Counter, defaultdict
+from itertools import count
+try:
+    import numpy
+except ImportError:
+    numpy = None
+try:
+    import scipy.sparse
+except ImportError:
+    scipy = None
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib.endpoints import load_endpoint
+
+import export_columnar
+
+CATEGORIES = ("Smart Home Fails", "Chatbot Chaos", "Autocorrect Anarchy", "Navigation Nightmares", "Work AI Woes")
+
+# battle-commentary lexicon category -> submission category
+LEXICON_CATEGORIES = {
+    'autocorrect': "Autocorrect Anarchy",
+    'voice_assistant': "Smart Home Fails",
+    'chatbot': "Chatbot Chaos",
+    'smart_home': "Smart Home Fails",
+    'navigation': "Navigation Nightmares"
+}
+# battle-commentary has no work category; same weighting, brands 3 and generic words 1
+WORK_KEYWORDS = {
+    'copilot': 3, 'excel': 3, 'spreadsheet': 3, 'slack': 3, 'zoom': 3, 'outlook': 3, 'resume': 3,
+    'meeting': 2, 'boss': 2, 'office': 2, 'coworker': 2, 'calendar': 2, 'interview': 2, 'hr': 2,
+    'work': 1, 'email': 1, 'job': 1, 'report': 1
+}
+
+DIMENSIONS = 1 << 18
+# Word-pair hashes combine the two word hashes; the same arithmetic in both engines
+PAIR_MULTIPLIER = 0x9E3779B1
+MASK32 = 0xFFFFFFFF
+
+_words = re.compile(r"[a-z0-9']+")
+SEPARATOR = '\x00'
+_chunk_words = re.compile(r"[a-z0-9']+|\x00")
+
+def word_hash(word: str) -> int:
+    return zlib.crc32(word.encode('utf-8'))
+
+def pair_hash(first: int, second: int) -> int:
+    return (first * PAIR_MULTIPLIER + second + 1) & MASK32
+
+def keyword_weights() -> dict:
+    """keyword -> {category index: weight} from the battle lexicon and WORK_KEYWORDS"""
+    battle = load_endpoint('battle-commentary')
+    weights = {}
+    for lexicon, keywords in battle.CATEGORY_KEYWORDS.items():
+        for keyword, weight in keywords.items():
+            weights.setdefault(keyword, {})[CATEGORIES.index(LEXICON_CATEGORIES[lexicon])] = weight
+    for keyword, weight in WORK_KEYWORDS.items():
+        weights.setdefault(keyword, {})[CATEGORIES.index("Work AI Woes")] = weight
+    return weights
+
+def keyword_bucket(keyword: str, mask: int) -> int:
+    words = _words.findall(keyword)
+    if len(words) == 1:
+        return word_hash(words[0]) & mask
+    return pair_hash(word_hash(words[0]), word_hash(words[1])) & mask
+
+class PythonModel:
+    """Bucket -> [(category, weight)] and a per-complaint scoring loop"""
+
+    def __init__(self, weights: dict, dimensions: int = DIMENSIONS):
+        self.mask = dimensions - 1
+        self.buckets = {}
+        for keyword, categories in weights.items():
+            bucket = self.buckets.setdefault(keyword_bucket(keyword, self.mask), {})
+            for category, weight in categories.items():
+                bucket[category] = bucket.get(category, 0.0) + weight
+
+    def predict_one(self, text: str) -> int:
+        """Category index, or -1 when nothing in the text is evidence"""
+        scores = [0.0] * len(CATEGORIES)
+        previous = None
+        for word in _words.findall(text.lower()):
+            current = word_hash(word)
+            features = [current & self.mask]
+            if previous is not None:
+                features.append(pair_hash(previous, current) & self.mask)
+            for feature in features:
+                for category, weight in self.buckets.get(feature, {}).items():
+                    scores[category] += weight
+            previous = current
+        best = max(range(len(scores)), key=scores.__getitem__)
+        return best if scores[best] > 0 else -1
+
+    def predict(self, texts: list) -> list:
+        return [self.predict_one(text) for text in texts]
+
+class NumpyModel:
+    """Dense feature x category weights; a chunk is one sparse matrix product"""
+
+    def __init__(self, weights: dict, dimensions: int = DIMENSIONS):
+        self.dimensions = dimensions
+        self.mask = dimensions - 1
+        self.weights = numpy.zeros((dimensions, len(CATEGORIES)), dtype=numpy.float32)
+        for keyword, categories in weights.items():
+            for category, weight in categories.items():
+                self.weights[keyword_bucket(keyword, self.mask), category] += weight
+        # Most hashed features carry no weight; they are dropped before the product
+        self.useful = self.weights.any(axis=1)
+
+    def features(self, texts: list) -> tuple:
+        """(row, feature) pairs for every word and adjacent word pair in texts"""
+        # One regex pass over the whole chunk; NUL separates the texts
+        joined = SEPARATOR.join(texts)
+        if joined.count(SEPARATOR) != len(texts) - 1:
+            joined = SEPARATOR.join(text.replace(SEPARATOR, ' ') for text in texts)
+        tokens = _chunk_words.findall(joined.lower())
+        # Hash each distinct word once instead of every occurrence
+        vocabulary = defaultdict(count().__next__)
+        ids = numpy.fromiter(map(vocabulary.__getitem__, tokens), dtype=numpy.int64, count=len(tokens))
+        vocabulary_hashes = numpy.fromiter(map(zlib.crc32, map(str.encode, vocabulary)), dtype=numpy.uint64,
+                                           count=len(vocabulary))
+        separator = vocabulary.get(SEPARATOR, -1)
+        is_separator = ids == separator
+        hashes = vocabulary_hashes[ids]
+        rows = numpy.cumsum(is_separator)
+        words = ~is_separator
+        pairs_valid = words[:-1] & words[1:]
+        pairs = (hashes[:-1][pairs_valid] * PAIR_MULTIPLIER + hashes[1:][pairs_valid] + 1) & MASK32
+        features = numpy.concatenate((hashes[words], pairs)) & self.mask
+        rows = numpy.concatenate((rows[words], rows[1:][pairs_valid]))
+        keep = self.useful[features]
+        return rows[keep], features[keep].astype(numpy.int64)
+
+    def scores(self, texts: list):
+        rows, features = self.features(texts)
+        if scipy is not None:
+            matrix = scipy.sparse.csr_matrix(
+                (numpy.ones(len(rows), dtype=numpy.float32), (rows, features)),
+                shape=(len(texts), self.dimensions)
+            )
+            return numpy.asarray(matrix @ self.weights)
+        scores = numpy.empty((len(texts), len(CATEGORIES)), dtype=numpy.float64)
+        for category in range(len(CATEGORIES)):
+            scores[:, category] = numpy.bincount(rows, weights=self.weights[features, category], minlength=len(texts))
+        return scores
+
+    def predict(self, texts: list) -> list:
+        if not texts:
+            return []
+        scores = self.scores(texts)
+        best = scores.argmax(axis=1)
+        return numpy.where(scores.max(axis=1) > 0, best, -1).tolist()
+
+def _record_fields(record: dict):
+    """(complaint, category) of a capture or plain record, None for other endpoints"""
+    if 'request' in record:
+        if record.get('endpoint') != 'submit-complaint':
+            return None
+        record = record.get('request') or {}
+    complaint = record.get('complaint')
+    if not isinstance(complaint, str) or not complaint.strip():
+        return None
+    return complaint, record.get('category') or export_columnar.UNCATEGORIZED
+
+def file_chunks(path: str, chunk_bytes: int):
+    """Memory-map path and yield lists of (key, complaint, category), chunk_bytes of lines at a time"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start, size = 0, len(mapped)
+            while start < size:
+                end = min(size, start + chunk_bytes)
+                if end < size:
+                    newline = mapped.rfind(b'\n', start, end)
+                    end = newline + 1 if newline >= start else (mapped.find(b'\n', end) + 1 or size)
+                chunk, offset = [], start
+                for line in mapped[start:end].split(b'\n'):
+                    if line.strip():
+                        try:
+                            fields = _record_fields(json.loads(line))
+                        except ValueError:
+                            fields = None
+                        if fields:
+                            chunk.append((f"{path}:{offset}", *fields))
+                    offset += len(line) + 1
+                yield chunk
+                start = end
+
+def db_chunks(path: str, chunk_rows: int):
+    """Yield lists of (seq, complaint, category) from the complaint store, chunk_rows at a time"""
+    connection = sqlite3.connect(path)
+    try:
+        last = 0
+        while True:
+            rows = connection.execute(
+                'SELECT seq, complaint, category FROM complaints WHERE seq > ? ORDER BY seq LIMIT ?', (last, chunk_rows)
+            ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield rows
+    finally:
+        connection.close()
+
+def source_files(sources: list) -> list:
+    files = []
+    for source in sources:
+        files.extend(export_columnar.capture_segments(source) if os.path.isdir(source) else [source])
+    return files
+
+def chunks(files: list, db: str, chunk_bytes: int, chunk_rows: int):
+    for path in files:
+        yield from file_chunks(path, chunk_bytes)
+    if db:
+        yield from db_chunks(db, chunk_rows)
+
+def run(model, files: list, db: str, chunk_bytes: int, chunk_rows: int, on_chunk=None) -> dict:
+    """Predict every complaint; returns counts, timing and a checksum of the predictions"""
+    counts = Counter()
+    moves = Counter()
+    checksum = 0
+    complaints = 0
+    scoring = 0.0
+    started = time.perf_counter()
+    for chunk in chunks(files, db, chunk_bytes, chunk_rows):
+        scored = time.perf_counter()
+        predicted = model.predict([complaint for _, complaint, _ in chunk])
+        scoring += time.perf_counter() - scored
+        complaints += len(chunk)
+        checksum = zlib.crc32(bytes(index + 1 for index in predicted), checksum)
+        for (key, _, category), index in zip(chunk, predicted):
+            new = CATEGORIES[index] if index >= 0 else None
+            if new is None:
+                counts["undecided"] += 1
+            elif new == category:
+                counts["agreed"] += 1
+            else:
+                counts["changed"] += 1
+                moves[f"{category} -> {new}"] += 1
+        if on_chunk:
+            on_chunk(chunk, predicted)
+    elapsed = time.perf_counter() - started
+    return {
+        "engine": type(model).__name__,
+        "complaints": complaints,
+        **{name: counts[name] for name in ("agreed", "changed", "undecided")},
+        "seconds": round(elapsed, 3),
+        "scoring_seconds": round(scoring, 3),
+        "complaints_per_second": round(complaints / elapsed, 1) if elapsed else None,
+        "scoring_complaints_per_second": round(complaints / scoring, 1) if scoring else None,
+        "top_changes": dict(moves.most_common(10)),
+        "checksum": f"{checksum:08x}"
+    }
+
+class ChangeWriter:
+    """Write disagreements to --changes and, with --apply, into the complaint store"""
+
+    def __init__(self, changes_path: str, db: str, apply: bool):
+        self.changes = open(changes_path, 'w', encoding='utf-8') if changes_path else None
+        self.connection = sqlite3.connect(db) if db and apply else None
+        self.applied = 0
+
+    def __call__(self, chunk: list, predicted: list):
+        updates = []
+        for (key, _, category), index in zip(chunk, predicted):
+            if index < 0 or CATEGORIES[index] == category:
+                continue
+            if self.changes:
+                self.changes.write(json.dumps({"key": key, "category": category, "predicted": CATEGORIES[index]}) + '\n')
+            if self.connection is not None and isinstance(key, int):
+                updates.append((CATEGORIES[index], time.time(), key))
+        if updates:
+            # Bumping updated re-renders the permalink pages
+            with self.connection:
+                self.connection.executemany('UPDATE complaints SET category = ?, updated = ? WHERE seq = ?', updates)
+            self.applied += len(updates)
+
+    def close(self):
+        if self.changes:
+            self.changes.close()
+        if self.connection is not None:
+            self.connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored complaints into the submission categories")
+    parser.add_argument('sources', nargs='*', help="Capture directories or JSON-lines files")
+    parser.add_argument('--db', help="Complaint store (WHINE_COMPLAINT_DB) to read as well")
+    parser.add_argument('--apply', action='store_true', help="Write new categories back to --db")
+    parser.add_argument('--changes', help="Write one JSON line per changed complaint here")
+    parser.add_argument('--engine', choices=('auto', 'numpy', 'python'), default='auto')
+    parser.add_argument('--baseline', action='store_true', help="Also run the pure-Python loop and compare")
+    parser.add_argument('--chunk-mb', type=float, default=32.0)
+    parser.add_argument('--chunk-rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    if not args.sources and not args.db:
+        parser.error("give capture directories, JSON-lines files or --db")
+    if args.engine == 'numpy' and numpy is None:
+        parser.error("--engine numpy needs numpy installed")
+
+    weights = keyword_weights()
+    use_numpy = numpy is not None and args.engine != 'python'
+    model = NumpyModel(weights) if use_numpy else PythonModel(weights)
+    files = source_files(args.sources)
+    chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+
+    writer = ChangeWriter(args.changes, args.db, args.apply)
+    try:
+        result = run(model, files, args.db, chunk_bytes, args.chunk_rows, writer)
+    finally:
+        writer.close()
+    report = {"backend": ("numpy+scipy" if scipy is not None else "numpy") if use_numpy else "python", **result,
+              "applied": writer.applied}
+
+    if args.baseline and use_numpy:
+        baseline = run(PythonModel(weights), files, args.db, chunk_bytes, args.chunk_rows)
+        report["baseline"] = {**baseline, "matches": baseline["checksum"] == result["checksum"]}
+        if baseline["scoring_seconds"] and result["scoring_seconds"]:
+            report["scoring_speedup"] = round(baseline["scoring_seconds"] / result["scoring_seconds"], 2)
+        if baseline["seconds"] and result["seconds"]:
+            report["end_to_end_speedup"] = round(baseline["seconds"] / result["seconds"], 2)
+    print(json.dumps(report, indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
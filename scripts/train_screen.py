@@ -0,0 +1,82 @@
+"""
+Train the hashed n-gram spam model used by api/_lib/screen.py.
+
+Reads a JSON-lines sample of {"text": ..., "label": "ok" | "spam"}, fits a
+logistic regression with plain SGD and writes api/_lib/screen_weights.json.
+Every --holdout'th record is left out so bench/screen_bench.py can report
+on text the model has not seen.
+
+    python scripts/train_screen.py [--sample bench/data/screen_sample.jsonl]
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import screen
+
+DEFAULT_SAMPLE = os.path.join(ROOT_DIR, 'bench', 'data', 'screen_sample.jsonl')
+
+def load_sample(path: str) -> list:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def split(records: list, holdout: int) -> tuple:
+    """(train, test) with every holdout'th record in test; holdout 0 trains on everything"""
+    if holdout <= 0:
+        return records, []
+    train = [record for index, record in enumerate(records) if index % holdout]
+    test = [record for index, record in enumerate(records) if not index % holdout]
+    return train, test
+
+def train(records: list, dimensions: int, epochs: int, rate: float, l2: float, seed: int) -> screen.LinearModel:
+    rng = random.Random(seed)
+    examples = [(screen.features(record['text'], dimensions), 1.0 if record['label'] == 'spam' else 0.0) for record in records]
+    weights = {}
+    bias = 0.0
+    for epoch in range(epochs):
+        rng.shuffle(examples)
+        step = rate / (1 + epoch)
+        for vector, label in examples:
+            z = bias + sum(weights.get(index, 0.0) * value for index, value in vector.items())
+            error = 1.0 / (1.0 + math.exp(-max(-30.0, min(30.0, z)))) - label
+            bias -= step * error
+            for index, value in vector.items():
+                weight = weights.get(index, 0.0)
+                weights[index] = weight - step * (error * value + l2 * weight)
+    return screen.LinearModel(dimensions, bias, weights)
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local spam screening model")
+    parser.add_argument('--sample', default=DEFAULT_SAMPLE)
+    parser.add_argument('--output', default=screen.WEIGHTS_PATH)
+    parser.add_argument('--dimensions', type=int, default=1 << 14, help="Hash buckets, a power of two")
+    parser.add_argument('--epochs', type=int, default=60)
+    parser.add_argument('--rate', type=float, default=2.0)
+    parser.add_argument('--l2', type=float, default=1e-6)
+    parser.add_argument('--holdout', type=int, default=5, help="Keep every Nth record out of training (0 = none)")
+    parser.add_argument('--seed', type=int, default=38)
+    args = parser.parse_args()
+
+    if args.dimensions & (args.dimensions - 1):
+        parser.error("--dimensions must be a power of two")
+
+    train_records, test_records = split(load_sample(args.sample), args.holdout)
+    model = train(train_records, args.dimensions, args.epochs, args.rate, args.l2, args.seed)
+    model.save(args.output)
+
+    for name, records in (("train", train_records), ("holdout", test_records)):
+        if not records:
+            continue
+        correct = sum((model.probability(r['text']) >= 0.5) == (r['label'] == 'spam') for r in records)
+        print(f"{name}: {correct}/{len(records)} correct at p=0.5")
+    print(f"Wrote {len(model.weights)} weights to {args.output} ({os.path.getsize(args.output)} bytes)")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
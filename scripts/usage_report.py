@@ -0,0 +1,63 @@
+"""
+Daily OpenAI usage report from the usage store (api/_lib/usage.py).
+
+    python scripts/usage_report.py                 # today (UTC)
+    python scripts/usage_report.py --days 7        # the last 7 days
+    python scripts/usage_report.py --day 2024-01-01 --json
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib import usage
+
+def report_days(store: usage.UsageStore, days: list) -> dict:
+    return {day: store.daily_report(day) for day in days}
+
+def print_day(day: str, rows: list):
+    print(f"\n{day}")
+    if not rows:
+        print("  no completions recorded")
+        return
+    print(f"  {'endpoint':<20} {'model':<14} {'calls':>6} {'prompt':>9} {'output':>9} {'avg out':>8} "
+          f"{'max out':>8} {'avg limit':>9} {'cut off':>8} {'cost $':>9}")
+    for row in rows:
+        print(
+            f"  {row['endpoint']:<20} {row['model']:<14} {row['completions']:>6} {row['prompt_tokens']:>9} "
+            f"{row['completion_tokens']:>9} {row['avg_completion_tokens']:>8.1f} {row['max_completion_tokens']:>8} "
+            f"{(row['avg_max_tokens'] or 0):>9.1f} {row['truncated']:>8} {row['cost']:>9.4f}"
+        )
+    print(f"  {'total':<20} {'':<14} {sum(r['completions'] for r in rows):>6} "
+          f"{sum(r['prompt_tokens'] for r in rows):>9} {sum(r['completion_tokens'] for r in rows):>9} "
+          f"{'':>8} {'':>8} {'':>9} {sum(r['truncated'] for r in rows):>8} {sum(r['cost'] for r in rows):>9.4f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize recorded OpenAI usage per day, endpoint and model")
+    parser.add_argument('--db', default=usage.DB_PATH, help="Usage database (default: WHINE_USAGE_DB)")
+    parser.add_argument('--day', help="UTC day, YYYY-MM-DD (default: today)")
+    parser.add_argument('--days', type=int, default=1, help="Number of days ending at --day")
+    parser.add_argument('--json', action='store_true', help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No usage database at {args.db}")
+        return 1
+
+    end = datetime.strptime(args.day, '%Y-%m-%d') if args.day else datetime.now(timezone.utc)
+    days = [(end - timedelta(days=offset)).strftime('%Y-%m-%d') for offset in reversed(range(max(1, args.days)))]
+    report = report_days(usage.UsageStore(args.db), days)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for day in days:
+            print_day(day, report[day])
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
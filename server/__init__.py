@@ -0,0 +1,5 @@
+"""
+Self-hosted server for WhineAboutAI.
+Serves the static pages and mounts every api/*.py handler in one process,
+mirroring the routes and rewrites Vercel provides in production.
+"""
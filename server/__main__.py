@@ -0,0 +1,40 @@
+"""
+Run the self-hosted server: python -m server --port 3000
+Use every core with pre-forked workers: python -m server --workers 0
+"""
+
+import argparse
+import sys
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve WhineAboutAI pages and API handlers")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3000)
+    parser.add_argument('--quiet', action='store_true', help="Disable per-request access logs")
+    parser.add_argument('--static-dir', default=None,
+                        help="Directory of static files (default: dist/ when built, else the repository root)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Pre-forked worker processes (0 = one per CPU); SIGHUP reloads them gracefully")
+    parser.add_argument('--preload', action='store_true',
+                        help="With --workers, import handlers before forking (faster start, no code reload)")
+    parser.add_argument('--shared-cache', action='store_true',
+                        help="With --workers, back in-process caches with shared memory")
+    args = parser.parse_args()
+
+    if args.workers is not None:
+        # Imported here so workers, not this process, load the handlers
+        from .prefork import serve
+        sys.exit(serve(args.host, args.port, args.workers, args.quiet, args.static_dir, args.preload, args.shared_cache))
+
+    from .app import make_server
+    server = make_server(args.host, args.port, quiet=args.quiet, static_dir=args.static_dir)
+    print(f"Serving WhineAboutAI on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+"""
+HTTP server that routes /api/<name> to the matching api/<name>.py handler
+and serves everything else as static files with the vercel.json rewrites.
+WebSocket upgrades on /ws/chat are handed to server/chat_socket.py.
+
+Static files come from dist/ once scripts/build_static.py has built it,
+the repository root otherwise. Either way only public file types are
+served: never dotfiles, source directories, Python or capture files.
+"""
+
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import re
+import socket
+import sys
+import threading
+from urllib.parse import quote, unquote, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIST_DIR = os.path.join(ROOT_DIR, 'dist')
+
+sys.path.insert(0, os.path.join(ROOT_DIR, 'api'))
+from _lib.compression import negotiate
+from _lib.endpoints import endpoint_names, load_endpoint
+
+from . import chat_socket, websocket
+
+# Precompressed siblings written by scripts/build_static.py, best first
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+FINGERPRINTED = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+
+# What the static server may hand out; everything else in the tree is source
+PUBLIC_SUFFIXES = ('.html', '.css', '.js', '.xml', '.ico', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.webp')
+PUBLIC_FILES = ('robots.txt', 'ads.txt')
+PRIVATE_DIRS = ('api', 'bench', 'scripts', 'server')
+
+def default_static_dir() -> str:
+    """dist/ when a build exists, the repository root otherwise"""
+    return DIST_DIR if os.path.isfile(os.path.join(DIST_DIR, 'index.html')) else ROOT_DIR
+
+def is_public(path: str) -> bool:
+    """True when the static server may serve this URL path"""
+    parts = [part for part in path.split('/') if part]
+    if any(part.startswith('.') for part in parts):
+        return False
+    if parts and parts[0] in PRIVATE_DIRS:
+        return False
+    if not parts or path.endswith('/'):
+        # Directories are only served through their index.html
+        return True
+    name = parts[-1].lower()
+    return name in PUBLIC_FILES or name.endswith(PUBLIC_SUFFIXES)
+
+def load_rewrites(root: str = ROOT_DIR) -> dict:
+    """Read the rewrites from vercel.json, source -> destination"""
+    try:
+        with open(os.path.join(root, 'vercel.json')) as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {rule['source']: rule['destination'] for rule in config.get('rewrites', [])}
+
+def compile_rewrites(rewrites: dict) -> list:
+    """(pattern, destination) for sources with :name segments, e.g. /complaint/:id"""
+    patterns = []
+    for source, destination in rewrites.items():
+        if ':' not in source:
+            continue
+        regex = re.sub(r':(\w+)', r'(?P<\1>[^/]+)', re.escape(source).replace('\\:', ':'))
+        patterns.append((re.compile(f"^{regex}$"), destination))
+    return patterns
+
+def rewrite_path(rewrites: dict, patterns: list, path: str):
+    """Destination for path, with :name parameters substituted; None when no rule matches"""
+    destination = rewrites.get(path.rstrip('/') or '/')
+    if destination and ':' not in destination:
+        return destination
+    for pattern, destination in patterns:
+        match = pattern.match(path)
+        if match:
+            return re.sub(r':(\w+)', lambda name: quote(match.group(name.group(1)), safe=''), destination)
+    return None
+
+class AppHandler(SimpleHTTPRequestHandler):
+    """Dispatch API calls to the serverless handlers, serve the rest statically"""
+
+    rewrites = {}
+    rewrite_patterns = []
+    static_dir = DIST_DIR
+    server_version = "WhineAboutAI"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, directory=self.static_dir, **kwargs)
+
+    def log_message(self, format, *args):
+        if not getattr(self.server, 'quiet', False):
+            super().log_message(format, *args)
+
+    def _endpoint_handler(self, method: str):
+        """Return a handler instance for /api/<name>, None for non-API paths, False if already answered"""
+        path = urlsplit(self.path).path
+        if not path.startswith('/api/'):
+            return None
+        name = path[len('/api/'):].strip('/')
+        try:
+            endpoint = load_endpoint(name)
+        except KeyError:
+            self.send_error(404, "Unknown endpoint")
+            return False
+        if not hasattr(endpoint.handler, method):
+            self.send_error(405, "Method not allowed")
+            return False
+        # The serverless handler class is a BaseHTTPRequestHandler too; give it
+        # this request's state (sockets, headers, path) instead of re-parsing
+        endpoint_handler = endpoint.handler.__new__(endpoint.handler)
+        endpoint_handler.__dict__ = self.__dict__
+        endpoint_handler.log_message = self.log_message
+        return endpoint_handler
+
+    def _dispatch(self, method: str) -> bool:
+        endpoint_handler = self._endpoint_handler(method)
+        if endpoint_handler is None:
+            return False
+        if endpoint_handler is not False:
+            getattr(endpoint_handler, method)()
+        return True
+
+    def _precompressed(self, path: str):
+        """Pick a .br/.gz sibling the client accepts, if the build wrote one"""
+        suffixes = {encoding: suffix for encoding, suffix in PRECOMPRESSED if os.path.isfile(path + suffix)}
+        if not suffixes:
+            return None
+        # q-values count: "gzip;q=0" refuses gzip
+        encoding = negotiate(self.headers.get('Accept-Encoding', ''), list(suffixes))
+        return (encoding, path + suffixes[encoding]) if encoding else None
+
+    def list_directory(self, path):
+        self.send_error(404, "File not found")
+        return None
+
+    def send_head(self):
+        if not is_public(unquote(urlsplit(self.path).path)):
+            self.send_error(404, "File not found")
+            return None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            path = os.path.join(path, 'index.html')
+        precompressed = self._precompressed(path) if os.path.isfile(path) else None
+        if not precompressed:
+            return super().send_head()
+        encoding, encoded_path = precompressed
+        f = open(encoded_path, 'rb')
+        stat = os.fstat(f.fileno())
+        self.send_response(200)
+        self.send_header('Content-type', self.guess_type(path))
+        self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(stat.st_size))
+        self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('Last-Modified', self.date_time_string(stat.st_mtime))
+        self.end_headers()
+        return f
+
+    def end_headers(self):
+        if FINGERPRINTED.search(urlsplit(self.path).path):
+            self.send_header('Cache-Control', 'public, max-age=31536000, immutable')
+        super().end_headers()
+
+    def _apply_rewrite(self):
+        parts = urlsplit(self.path)
+        destination = rewrite_path(self.rewrites, self.rewrite_patterns, unquote(parts.path))
+        if destination:
+            separator = '&' if '?' in destination else '?'
+            self.path = destination + (f"{separator}{parts.query}" if parts.query else '')
+
+    def _upgrade(self) -> bool:
+        if urlsplit(self.path).path != chat_socket.PATH or not websocket.is_upgrade(self.headers):
+            return False
+        if chat_socket.serve(self):
+            self.server.detach(self.connection)
+        self.close_connection = True
+        return True
+
+    def do_GET(self):
+        if self._upgrade():
+            return
+        # Rewrites may point at API routes (/sitemap.xml -> /api/sitemap)
+        self._apply_rewrite()
+        if not self._dispatch('do_GET'):
+            super().do_GET()
+
+    def do_HEAD(self):
+        self._apply_rewrite()
+        if not self._dispatch('do_HEAD'):
+            super().do_HEAD()
+
+    def do_POST(self):
+        if not self._dispatch('do_POST'):
+            self.send_error(405, "Method not allowed")
+
+    def do_OPTIONS(self):
+        if not self._dispatch('do_OPTIONS'):
+            self.send_error(405, "Method not allowed")
+
+class AppServer(ThreadingHTTPServer):
+    daemon_threads = True
+    quiet = False
+    reuse_port = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._detached = set()
+        self._detached_lock = threading.Lock()
+
+    def server_bind(self):
+        # socketserver's allow_reuse_port only exists from Python 3.11
+        if self.reuse_port:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+    def detach(self, request):
+        """Keep an upgraded connection open after its request handler returns"""
+        with self._detached_lock:
+            self._detached.add(request)
+
+    def shutdown_request(self, request):
+        with self._detached_lock:
+            if request in self._detached:
+                self._detached.discard(request)
+                return
+        super().shutdown_request(request)
+
+def make_server(host: str = '127.0.0.1', port: int = 3000, quiet: bool = False, preload: bool = True,
+                static_dir: str = None, reuse_port: bool = False, listen_socket=None):
+    """Build a threaded server; preload imports every handler up front.
+
+    reuse_port binds with SO_REUSEPORT so several processes can listen on
+    one port; listen_socket serves an already listening socket instead of
+    binding (both used by server/prefork.py). static_dir defaults to
+    default_static_dir().
+    """
+    if preload:
+        for name in endpoint_names():
+            load_endpoint(name)
+
+    rewrites = load_rewrites()
+    handler_class = type('Handler', (AppHandler,), {
+        'rewrites': rewrites,
+        'rewrite_patterns': compile_rewrites(rewrites),
+        'static_dir': os.path.abspath(static_dir or default_static_dir())
+    })
+    if listen_socket is not None:
+        server = AppServer((host, port), handler_class, bind_and_activate=False)
+        server.socket.close()
+        server.socket = listen_socket
+        server.server_address = listen_socket.getsockname()
+    else:
+        server_class = type('ReusePortServer', (AppServer,), {'reuse_port': True}) if reuse_port else AppServer
+        server = server_class((host, port), handler_class)
+    server.quiet = quiet
+    return server
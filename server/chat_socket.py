@@ -0,0 +1,145 @@
+"""
+WhineBot chat over a WebSocket: /ws/chat[?conversation_id=<id>]
+
+Conversation ids are issued by the server in the "ready" frame and are
+unguessable. A new connection that presents the id of a live conversation
+replaces the older connection and keeps its history; any other id is
+ignored and the connection starts a fresh conversation under a new id.
+Earlier turns are kept in process memory while the connection is open and
+sent with each message, and replies are streamed.
+
+Client messages are JSON ({"message": "..."}) or plain text. The server
+answers with JSON frames:
+
+    {"type": "ready", "conversation_id": "..."}
+    {"type": "token", "text": "..."}       zero or more per reply
+    {"type": "done", "response": "...", "provider": "...", "response_time": ..., "timestamp": "..."}
+    {"type": "error", "error": "..."}
+
+"done" always carries the whole reply, which is what to keep if a stream
+was cut short and answered from the fallback; it then has "replace": true.
+"""
+
+import json
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from _lib import capture, metrics
+from _lib.endpoints import load_endpoint
+
+from . import websocket
+
+PATH = '/ws/chat'
+# Earlier messages sent back to the model (user and assistant each count one)
+MAX_HISTORY_MESSAGES = 12
+
+WORKERS = int(os.getenv('WHINE_WS_WORKERS', '32'))
+IDLE_SECONDS = float(os.getenv('WHINE_WS_IDLE_SECONDS', '900'))
+
+class ChatSession:
+    __slots__ = ('conversation_id', 'ws', 'history', 'last_active')
+
+    def __init__(self, conversation_id: str, ws: websocket.WebSocket):
+        self.conversation_id = conversation_id
+        self.ws = ws
+        self.history = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.last_active = time.monotonic()
+
+    def send(self, payload: dict):
+        self.ws.send(json.dumps(payload))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_hub = None
+_hub_lock = threading.Lock()
+
+def get_hub() -> websocket.SessionHub:
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = websocket.SessionHub(handle_message, forget, workers=WORKERS, idle_timeout=IDLE_SECONDS)
+        return _hub
+
+def serve(handler) -> bool:
+    """
+    Take over an upgrade request from the HTTP handler. Returns True when the
+    socket now belongs to the hub and the server must not close it.
+    """
+    query = parse_qs(urlsplit(handler.path).query)
+    requested = query.get('conversation_id', [''])[0].strip()
+    if not websocket.handshake(handler):
+        return False
+
+    ws = websocket.WebSocket(handler.connection)
+    with _sessions_lock:
+        # Only ids this server issued and still holds can be resumed; anything
+        # else gets a fresh id so a client cannot pick another session's id
+        previous = _sessions.get(requested) if requested else None
+        conversation_id = requested if previous is not None else new_conversation_id()
+        session = ChatSession(conversation_id, ws)
+        _sessions[conversation_id] = session
+    if previous is not None:
+        # The old connection's history carries over to the new one
+        session.history.extend(previous.history)
+        previous.ws.close(4000, 'replaced by a newer connection')
+
+    hub = get_hub()
+    session.send({"type": "ready", "conversation_id": conversation_id})
+    hub.add(session)
+    return True
+
+def new_conversation_id() -> str:
+    """Unguessable id; caller holds _sessions_lock"""
+    while True:
+        conversation_id = secrets.token_urlsafe(24)
+        if conversation_id not in _sessions:
+            return conversation_id
+
+def forget(session: ChatSession):
+    with _sessions_lock:
+        if _sessions.get(session.conversation_id) is session:
+            del _sessions[session.conversation_id]
+
+def parse_message(message) -> str:
+    if isinstance(message, bytes):
+        message = message.decode('utf-8', 'replace')
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return message.strip()
+    if isinstance(data, dict):
+        return str(data.get('message', '')).strip()
+    return message.strip()
+
+def handle_message(session: ChatSession, message):
+    started = time.time()
+    text = parse_message(message)
+    if not text:
+        session.send({"type": "error", "error": "I need something to be sarcastic about! Try again with an actual message. 🙄"})
+        return
+
+    chat = load_endpoint('chat')
+    result = chat.get_whinebot_response(
+        text,
+        session.conversation_id,
+        history=list(session.history),
+        on_token=lambda piece: session.send({"type": "token", "text": piece})
+    )
+    session.send({"type": "done", **result})
+    session.history.append({"role": "user", "content": text})
+    session.history.append({"role": "assistant", "content": result["response"]})
+    capture.record('chat', {"message": text, "conversation_id": session.conversation_id}, result,
+                   time.time() - started, method='WS')
+
+def _stats() -> dict:
+    with _hub_lock:
+        hub = _hub
+    with _sessions_lock:
+        conversations = len(_sessions)
+    return {**(hub.stats() if hub else {}), "conversations": conversations}
+
+metrics.register('websocket', _stats)
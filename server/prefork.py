@@ -0,0 +1,273 @@
+"""
+Pre-forked multi-process mode: python -m server --workers N
+
+Each worker is a forked process running its own AppServer, so fallback
+work (classification, templates, rendering, JSON encoding) is no longer
+limited to one core by the GIL. With SO_REUSEPORT (Linux, the BSDs) every
+worker binds its own listening socket on the port and the kernel spreads
+connections across them; elsewhere the master listens once and the
+workers accept from the inherited socket.
+
+Handler modules are imported by each worker after the fork unless
+--preload, so SIGHUP is a graceful reload: a new generation of workers
+starts with freshly imported code, and once all of them are listening the
+old generation stops accepting, finishes its in-flight requests (up to
+WHINE_PREFORK_GRACE seconds) and exits. Workers that die are replaced.
+SIGTERM and SIGINT drain every worker the same way and exit.
+
+With SO_REUSEPORT each worker has its own accept queue, and closing a
+listening socket resets the connections still queued on it. A stopping
+worker therefore keeps accepting from its queue until it has stayed empty
+for DRAIN_QUIET seconds, and only then closes. The kernel keeps hashing
+new connections to the socket until close(), so one arriving in that last
+instant can still be reset; on Linux 5.14+ setting
+net.ipv4.tcp_migrate_req=1 makes the kernel hand those to a live worker.
+
+In-process caches stay per worker. --shared-cache points
+WHINE_SHARED_CACHE_DIR into /dev/shm so every LRUCache is also backed by
+a shared-memory DiskLRU, and a value one worker computes is a hit in the
+others. WebSocket chat sessions live in the worker that accepted them.
+"""
+
+import os
+import select
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Seconds a stopping worker may spend finishing in-flight requests
+GRACE = float(os.getenv('WHINE_PREFORK_GRACE', '30'))
+READY_TIMEOUT = 60
+# Workers that die sooner than this after starting are restarted with a delay
+MIN_LIFETIME = 1.0
+REUSE_PORT = hasattr(socket, 'SO_REUSEPORT')
+LISTEN_BACKLOG = 1024
+# A stopping worker closes its own listening socket once its queue stays empty this long
+DRAIN_QUIET = 0.2
+
+def default_workers() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+class Worker:
+    __slots__ = ('pid', 'generation', 'ready_fd', 'started')
+
+    def __init__(self, pid: int, generation: int, ready_fd: int):
+        self.pid = pid
+        self.generation = generation
+        self.ready_fd = ready_fd
+        self.started = time.monotonic()
+
+class Master:
+    """Fork, supervise and reload the worker processes"""
+
+    def __init__(self, host: str, port: int, workers: int, quiet: bool = False, static_dir: str = None,
+                 preload: bool = False, shared_cache: bool = False):
+        self.host = host
+        self.workers = max(1, workers)
+        self.quiet = quiet
+        self.static_dir = static_dir
+        self.preload = preload
+        self.shared_dir = None
+        self.generation = 0
+        self.children = {}
+        self._reload = False
+        self._stop = False
+
+        # Each worker sizes its render pool to its share of the CPUs
+        os.environ['WHINE_SERVER_WORKERS'] = str(self.workers)
+
+        if shared_cache:
+            base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            self.shared_dir = tempfile.mkdtemp(prefix='whine-cache-', dir=base)
+            os.environ['WHINE_SHARED_CACHE_DIR'] = self.shared_dir
+
+        # With SO_REUSEPORT this socket only reserves the port (port 0 resolves
+        # here, once); it never listens, so the kernel never hands it connections
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if REUSE_PORT:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self.socket.bind((host, port))
+        self.port = self.socket.getsockname()[1]
+        if not REUSE_PORT:
+            self.socket.listen(LISTEN_BACKLOG)
+
+        if preload:
+            from .app import endpoint_names, load_endpoint
+            for name in endpoint_names():
+                load_endpoint(name)
+
+    def spawn(self) -> Worker:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 1
+            try:
+                code = run_worker(self, write_fd)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(code)
+        os.close(write_fd)
+        worker = Worker(pid, self.generation, read_fd)
+        self.children[pid] = worker
+        return worker
+
+    def wait_ready(self, workers: list) -> bool:
+        """True once every worker reported it is listening"""
+        pending = {worker.ready_fd: worker for worker in workers}
+        deadline = time.monotonic() + READY_TIMEOUT
+        ready = True
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                ready = False
+                break
+            readable, _, _ = select.select(list(pending), [], [], remaining)
+            for fd in readable:
+                if not os.read(fd, 1):
+                    ready = False
+                os.close(fd)
+                pending[fd].ready_fd = None
+                del pending[fd]
+        for fd in pending:
+            os.close(fd)
+            pending[fd].ready_fd = None
+        return ready
+
+    def signal_workers(self, workers, signum: int):
+        for worker in workers:
+            try:
+                os.kill(worker.pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def reload(self):
+        """Start a new generation and retire the old one once it is listening"""
+        old = list(self.children.values())
+        self.generation += 1
+        new = [self.spawn() for _ in range(self.workers)]
+        if not self.wait_ready(new):
+            print("Reload failed: new workers did not start; keeping the running ones", file=sys.stderr)
+            self.generation -= 1
+            self.signal_workers(new, signal.SIGKILL)
+            return
+        self.signal_workers(old, signal.SIGTERM)
+        print(f"Reloaded: generation {self.generation}, {len(new)} workers", file=sys.stderr)
+
+    def reap(self):
+        """Collect exited workers and replace those of the current generation"""
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = self.children.pop(pid, None)
+            if worker is None or worker.generation != self.generation or self._stop:
+                continue
+            if time.monotonic() - worker.started < MIN_LIFETIME:
+                time.sleep(MIN_LIFETIME)
+            self.wait_ready([self.spawn()])
+
+    def stop(self):
+        self.signal_workers(list(self.children.values()), signal.SIGTERM)
+        deadline = time.monotonic() + GRACE + 5
+        while self.children and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.05)
+        self.signal_workers(list(self.children.values()), signal.SIGKILL)
+        self.socket.close()
+        if self.shared_dir:
+            shutil.rmtree(self.shared_dir, ignore_errors=True)
+
+    def _on_reload(self, signum, frame):
+        self._reload = True
+
+    def _on_stop(self, signum, frame):
+        self._stop = True
+
+    def run(self):
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        if not self.wait_ready([self.spawn() for _ in range(self.workers)]):
+            print("Workers failed to start", file=sys.stderr)
+            self.stop()
+            return 1
+        print(f"Serving WhineAboutAI with {self.workers} workers on http://{self.host}:{self.port}", flush=True)
+        try:
+            while not self._stop:
+                if self._reload:
+                    self._reload = False
+                    self.reload()
+                self.reap()
+                time.sleep(0.2)
+        finally:
+            self.stop()
+        return 0
+
+def run_worker(master: Master, ready_fd: int) -> int:
+    """Body of a forked worker: serve until SIGTERM, then drain and exit"""
+    # Ctrl-C reaches the whole process group; let the master decide
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    from .app import make_server
+
+    if REUSE_PORT:
+        master.socket.close()
+        server = make_server(master.host, master.port, quiet=master.quiet, static_dir=master.static_dir,
+                             reuse_port=True)
+    else:
+        server = make_server(master.host, master.port, quiet=master.quiet, static_dir=master.static_dir,
+                             listen_socket=master.socket)
+    # server_close() then waits for in-flight requests instead of abandoning them
+    server.daemon_threads = False
+
+    from _lib import metrics
+    started = time.time()
+    metrics.register('worker', lambda: {
+        "pid": os.getpid(),
+        "generation": master.generation,
+        "workers": master.workers,
+        "uptime_seconds": round(time.time() - started, 1),
+        "shared_cache": master.shared_dir
+    })
+
+    def drain(signum, frame):
+        # shutdown() blocks until serve_forever returns, so it cannot run on this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+        threading.Timer(GRACE, os._exit, (0,)).start()
+
+    signal.signal(signal.SIGTERM, drain)
+    os.write(ready_fd, b'1')
+    os.close(ready_fd)
+    try:
+        server.serve_forever()
+        if REUSE_PORT:
+            drain_backlog(server)
+    finally:
+        server.server_close()
+        # The pool's processes come from a forkserver, not this one; stop them before exiting
+        from _lib import render
+        render.shutdown()
+    return 0
+
+def drain_backlog(server):
+    """Serve the connections queued on this worker's own socket before it is closed"""
+    while select.select([server.socket], [], [], DRAIN_QUIET)[0]:
+        server.handle_request()
+
+def serve(host: str, port: int, workers: int, quiet: bool = False, static_dir: str = None,
+          preload: bool = False, shared_cache: bool = False) -> int:
+    return Master(host, port, workers or default_workers(), quiet, static_dir, preload, shared_cache).run()
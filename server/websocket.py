@@ -0,0 +1,345 @@
+"""
+Minimal RFC 6455 WebSocket support for the self-hosted server (stdlib only).
+
+Covers what the chat transport needs: the opening handshake, text and
+binary messages with fragmentation, ping/pong and the closing handshake.
+No extensions (such as permessage-deflate) are negotiated.
+
+SessionHub parks idle connections in a single selector thread and reads
+and answers messages on a small worker pool, so an idle session costs a
+socket and a few objects rather than a thread.
+"""
+
+import base64
+import hashlib
+import selectors
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_INVALID_DATA = 1007
+CLOSE_TOO_BIG = 1009
+CLOSE_INTERNAL_ERROR = 1011
+# Reported locally when the connection drops; never sent in a close frame
+CLOSE_ABNORMAL = 1006
+
+MAX_MESSAGE_BYTES = 64 * 1024
+# A frame that has started arriving must finish within this many seconds
+FRAME_TIMEOUT = 30
+
+class ConnectionClosed(Exception):
+    def __init__(self, code: int = CLOSE_ABNORMAL, reason: str = ''):
+        super().__init__(f"{code} {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+class ProtocolError(Exception):
+    def __init__(self, message: str, code: int = CLOSE_PROTOCOL_ERROR):
+        super().__init__(message)
+        self.code = code
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + GUID).encode('ascii')).digest()).decode('ascii')
+
+def is_upgrade(headers) -> bool:
+    return (headers.get('Upgrade', '').lower() == 'websocket'
+            and 'upgrade' in headers.get('Connection', '').lower())
+
+def handshake(handler) -> bool:
+    """Answer an upgrade request on a BaseHTTPRequestHandler; False if it was refused"""
+    key = handler.headers.get('Sec-WebSocket-Key', '')
+    if handler.command != 'GET' or not key or handler.headers.get('Sec-WebSocket-Version') != '13':
+        handler.send_response(426, 'Upgrade Required')
+        handler.send_header('Sec-WebSocket-Version', '13')
+        handler.send_header('Content-Length', '0')
+        handler.end_headers()
+        return False
+    handler.send_response(101, 'Switching Protocols')
+    handler.send_header('Upgrade', 'websocket')
+    handler.send_header('Connection', 'Upgrade')
+    handler.send_header('Sec-WebSocket-Accept', accept_key(key))
+    handler.end_headers()
+    handler.wfile.flush()
+    return True
+
+def _unmask(payload: bytes, mask: bytes) -> bytes:
+    if not payload:
+        return payload
+    # XOR as one big integer; far faster than a per-byte loop
+    repeated = (mask * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')
+
+def encode_frame(opcode: int, payload: bytes, mask: bytes = None) -> bytes:
+    """One final frame; clients must pass a 4-byte mask, servers must not"""
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, mask_bit | length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, length)
+    if mask:
+        return header + mask + _unmask(payload, mask)
+    return header + payload
+
+class WebSocket:
+    """Server side of one upgraded connection"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self._fragments = []
+        self._fragment_opcode = None
+
+    def fileno(self) -> int:
+        return self.sock.fileno()
+
+    def _recv_exact(self, count: int) -> bytes:
+        data = b''
+        while len(data) < count:
+            chunk = self.sock.recv(count - len(data))
+            if not chunk:
+                raise ConnectionClosed(CLOSE_ABNORMAL, 'connection lost')
+            data += chunk
+        return data
+
+    def read_frame(self) -> tuple:
+        """(fin, opcode, payload) of the next frame"""
+        first, second = self._recv_exact(2)
+        fin, opcode = bool(first & 0x80), first & 0x0F
+        if first & 0x70:
+            raise ProtocolError("reserved bits set without an extension")
+        if not second & 0x80:
+            raise ProtocolError("client frames must be masked")
+        length = second & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self._recv_exact(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self._recv_exact(8))[0]
+        if opcode >= OP_CLOSE and (length > 125 or not fin):
+            raise ProtocolError("control frames must be short and unfragmented")
+        if length > MAX_MESSAGE_BYTES:
+            raise ProtocolError("message too big", CLOSE_TOO_BIG)
+        mask = self._recv_exact(4)
+        return fin, opcode, _unmask(self._recv_exact(length), mask)
+
+    def read_message(self):
+        """
+        Read one frame and return the completed message (str or bytes), or
+        None if the frame was a control frame or a non-final fragment.
+        Raises ConnectionClosed once the peer has closed.
+        """
+        fin, opcode, payload = self.read_frame()
+        if opcode == OP_PING:
+            self._send_frame(OP_PONG, payload)
+            return None
+        if opcode == OP_PONG:
+            return None
+        if opcode == OP_CLOSE:
+            code = struct.unpack('!H', payload[:2])[0] if len(payload) >= 2 else CLOSE_NORMAL
+            self.close(code)
+            raise ConnectionClosed(code, payload[2:].decode('utf-8', 'replace'))
+        if opcode in (OP_TEXT, OP_BINARY):
+            if self._fragment_opcode is not None:
+                raise ProtocolError("new message before the previous one finished")
+            self._fragment_opcode = opcode
+        elif opcode != OP_CONTINUATION or self._fragment_opcode is None:
+            raise ProtocolError(f"unexpected opcode {opcode}")
+
+        self._fragments.append(payload)
+        if sum(map(len, self._fragments)) > MAX_MESSAGE_BYTES:
+            raise ProtocolError("message too big", CLOSE_TOO_BIG)
+        if not fin:
+            return None
+        data, opcode = b''.join(self._fragments), self._fragment_opcode
+        self._fragments, self._fragment_opcode = [], None
+        if opcode == OP_BINARY:
+            return data
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            raise ProtocolError("text message is not valid UTF-8", CLOSE_INVALID_DATA)
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        with self._send_lock:
+            if self.closed:
+                raise ConnectionClosed(CLOSE_ABNORMAL, 'already closed')
+            self.sock.sendall(encode_frame(opcode, payload))
+
+    def send(self, data):
+        if isinstance(data, str):
+            self._send_frame(OP_TEXT, data.encode('utf-8'))
+        else:
+            self._send_frame(OP_BINARY, data)
+
+    def ping(self, payload: bytes = b''):
+        self._send_frame(OP_PING, payload)
+
+    def close(self, code: int = CLOSE_NORMAL, reason: str = ''):
+        """
+        Send a close frame and shut the socket down. The descriptor stays open
+        until dispose(), so a selector watching it sees EOF instead of a stale fd.
+        """
+        with self._send_lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self.sock.sendall(encode_frame(OP_CLOSE, struct.pack('!H', code) + reason.encode('utf-8')[:120]))
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def dispose(self):
+        self.close(CLOSE_GOING_AWAY)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+class SessionHub:
+    """
+    Owns upgraded connections. Each session needs a .ws (WebSocket) and
+    .last_active attribute; on_message(session, message) runs on a worker
+    thread, on_close(session) once the connection is gone.
+    """
+
+    def __init__(self, on_message, on_close, workers: int = 32, idle_timeout: float = 900.0,
+                 sweep_seconds: float = 15.0):
+        self.on_message = on_message
+        self.on_close = on_close
+        self.idle_timeout = idle_timeout
+        self.sweep_seconds = sweep_seconds
+        self._selector = selectors.DefaultSelector()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ws-worker')
+        self._pending = deque()
+        self._wake_read, self._wake_write = socket.socketpair()
+        self._wake_read.setblocking(False)
+        self._selector.register(self._wake_read, selectors.EVENT_READ, None)
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self.counters = {"opened": 0, "closed": 0, "messages": 0, "idle_closed": 0, "errors": 0}
+        threading.Thread(target=self._run, name='ws-selector', daemon=True).start()
+
+    def add(self, session):
+        """Start watching a session's connection for messages"""
+        session.ws.sock.settimeout(FRAME_TIMEOUT)
+        session.last_active = time.monotonic()
+        with self._lock:
+            self._sessions.add(session)
+            self.counters["opened"] += 1
+        self._watch(session)
+
+    def _watch(self, session):
+        # Only the selector thread touches the selector; hand registrations over
+        self._pending.append(session)
+        try:
+            self._wake_write.send(b'\0')
+        except OSError:
+            pass
+
+    def _run(self):
+        last_sweep = time.monotonic()
+        while True:
+            for key, _ in self._selector.select(timeout=self.sweep_seconds):
+                if key.data is None:
+                    try:
+                        self._wake_read.recv(4096)
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._selector.unregister(key.fileobj)
+                self._pool.submit(self._handle, key.data)
+            while self._pending:
+                session = self._pending.popleft()
+                try:
+                    self._selector.register(session.ws.sock, selectors.EVENT_READ, session)
+                except (ValueError, OSError):
+                    self._finish(session)
+            now = time.monotonic()
+            if now - last_sweep >= self.sweep_seconds:
+                last_sweep = now
+                self._sweep(now)
+
+    def _sweep(self, now: float):
+        for key in list(self._selector.get_map().values()):
+            session = key.data
+            if session is not None and now - session.last_active > self.idle_timeout:
+                self._selector.unregister(key.fileobj)
+                self._count("idle_closed")
+                session.ws.close(CLOSE_GOING_AWAY, 'idle')
+                self._finish(session)
+
+    def _handle(self, session):
+        ws = session.ws
+        try:
+            message = ws.read_message()
+            if message is not None:
+                session.last_active = time.monotonic()
+                self._count("messages")
+                self.on_message(session, message)
+        except ConnectionClosed:
+            self._finish(session)
+            return
+        except ProtocolError as e:
+            ws.close(e.code, str(e))
+            self._finish(session)
+            return
+        except Exception as e:
+            print(f"WebSocket session error: {e}", file=sys.stderr)
+            self._count("errors")
+            ws.close(CLOSE_INTERNAL_ERROR)
+            self._finish(session)
+            return
+        if ws.closed:
+            self._finish(session)
+        else:
+            self._watch(session)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _finish(self, session):
+        with self._lock:
+            if session not in self._sessions:
+                return
+            self._sessions.discard(session)
+            self.counters["closed"] += 1
+        session.ws.dispose()
+        try:
+            self.on_close(session)
+        except Exception as e:
+            print(f"WebSocket close handler error: {e}", file=sys.stderr)
+
+    def open_sessions(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, "open": len(self._sessions)}
+
+    def close_all(self, code: int = CLOSE_GOING_AWAY):
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            session.ws.close(code, 'server shutting down')